@@ -24,13 +24,14 @@ from src.brain.sprite_brain import SpriteBrain
 class BrainThread(QThread):
     """在独立线程中运行大脑"""
     
-    def __init__(self, parent=None):
+    def __init__(self, ws_server=None, parent=None):
         super().__init__(parent)
+        self.ws_server = ws_server  # 同进程服务器：大脑走进程内直连
         self.brain = None
         
     def run(self):
         """线程入口"""
-        self.brain = SpriteBrain()
+        self.brain = SpriteBrain(local_server=self.ws_server)
         try:
             asyncio.run(self.brain.start())
         except Exception as e:
@@ -41,6 +42,15 @@ class BrainThread(QThread):
         if self.brain:
             self.brain.stop()
 
+def parse_extra_sprites(spec: str) -> list:
+    """SHERRY_SPRITES="kuro=/path/to/model,mimi" -> [("kuro", "/path/to/model"), ("mimi", None)]"""
+    sprites = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, model_path = item.partition("=")
+        sprites.append((name.strip(), os.path.expanduser(model_path.strip()) or None))
+    return sprites
+
+
 def setup_signal_handlers(app):
     """Setup graceful shutdown handlers"""
     def signal_handler(signum, frame):
@@ -91,6 +101,9 @@ def main():
     
     logger.info("🐱💜 Starting Sherry Desktop Sprite...")
     
+    # 🚨 多精灵共享 GL 资源：所有 QOpenGLWidget 使用同一共享组（必须在创建 QApplication 之前设置）
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
+
     # Create Qt Application
     app = SherryApplication(sys.argv)
     
@@ -102,36 +115,69 @@ def main():
     window.show()
     
     # Start WebSocket server in background
-    ws_server = WebSocketServer(window)
+    # SHERRY_METRICS_PORT: 可选的本地 Prometheus 指标端口（如 9765）
+    metrics_port = os.environ.get("SHERRY_METRICS_PORT")
+    # SHERRY_RECORD: 可选的会话录制路径（如 ~/.sherry/session.slog），用于回放与回归
+    # SHERRY_UDP_PORT: 可选的动捕 UDP 输入端口（如 9000，OSC / 打包参数帧）
+    udp_port = os.environ.get("SHERRY_UDP_PORT")
+    # SHERRY_VTS_PORT: 可选的 VTube Studio 兼容 API 端口（如 8001，供只能配置端口的追踪软件使用）
+    vts_port = os.environ.get("SHERRY_VTS_PORT")
+    # SHERRY_TTS_WARMUP_WORKERS: 后台预合成已知台词的并发数（默认 2，0 = 关闭）
+    warmup_workers = os.environ.get("SHERRY_TTS_WARMUP_WORKERS")
+    ws_server = WebSocketServer(window, metrics_port=int(metrics_port) if metrics_port else None,
+                                record_path=os.environ.get("SHERRY_RECORD") or None,
+                                udp_port=int(udp_port) if udp_port else None,
+                                vts_port=int(vts_port) if vts_port else None,
+                                **({"tts_warmup_workers": int(warmup_workers)} if warmup_workers else {}))
     ws_server.start()
     
     # 🚨 【触觉反馈】连接触摸事件到 WebSocket 广播
     def on_touch_event(action, part):
         """当雪莉被触摸时，广播到大脑（线程安全）"""
         logger.info(f"🔄 转发触摸事件: {action} on {part}")
-        # 使用线程安全的广播方法
+        # 使用线程安全的非阻塞广播（立即返回，不等待网络 I/O）
         ws_server.broadcast_sync("touch_event", {
             "action": action,
             "part": part
         })
     
     window.touch_event.connect(on_touch_event)
+
+    # SHERRY_SPRITES: 同一进程中的额外精灵（共享事件循环、TTS 与 GL 资源），路由为 /sprite/<name>
+    extra_windows = []
+    for slot, (name, model_path) in enumerate(parse_extra_sprites(os.environ.get("SHERRY_SPRITES", "")), start=1):
+        extra = SherrySpriteWindow(name=name, model_path=model_path, slot=slot, show_tray=False)
+        try:
+            sprite_server = ws_server.add_sprite(name, extra)
+        except ValueError as e:
+            logger.error(f"❌ Cannot add sprite {name}: {e}")
+            extra.deleteLater()
+            continue
+        extra.touch_event.connect(
+            lambda action, part, server=sprite_server: server.broadcast_sync("touch_event", {
+                "action": action, "part": part
+            })
+        )
+        extra.show()
+        extra_windows.append(extra)
     
     logger.info("✅ Sherry Desktop Sprite started successfully!")
     logger.info("   WebSocket: ws://127.0.0.1:8765/sprite")
+    for extra in extra_windows:
+        logger.info(f"   WebSocket: ws://127.0.0.1:8765/sprite/{extra.name}")
     
     # Start Brain thread (精灵大脑)
-    brain_thread = BrainThread()
+    brain_thread = BrainThread(ws_server)
     brain_thread.start()
     logger.info("🧠 大脑已启动 (鼠标跟随激活)")
     
     # Run Qt event loop
     exit_code = app.exec()
     
-    # Cleanup
-    ws_server.stop()
+    # Cleanup：先通知大脑停止（事件唤醒，立即断开），再停服务器
     brain_thread.stop()
-    brain_thread.wait(2000)  # 等待2秒让大脑优雅退出
+    ws_server.stop()
+    brain_thread.wait(2000)  # 最多等待2秒让大脑优雅退出
     logger.info("👋 Sherry Desktop Sprite stopped.")
     
     return exit_code
@@ -37,20 +37,35 @@ class SherrySoul:
             "主人加油！雪莉感觉大家（CPU）都在努力运转呢！"
         ]
     }
+    TIRED_LINE = "主人... 雪莉有点困了... 可以在您的桌面角角睡一会儿吗？😴"
 
     def get_quote(self, category):
         if category in self.QUOTES:
             return random.choice(self.QUOTES[category])
         return "喵～"
 
-    def get_dynamic_greeting(self):
-        hour = datetime.now().hour
+    @staticmethod
+    def greeting_category(hour=None):
+        """当前时段的问候台词类别"""
+        hour = datetime.now().hour if hour is None else hour
         if 5 <= hour < 11:
-            return self.get_quote("greeting_morning")
+            return "greeting_morning"
         elif 22 <= hour or hour < 5:
-            return self.get_quote("greeting_night")
-        else:
-            return self.get_quote("idle_happy")
+            return "greeting_night"
+        return "idle_happy"
+
+    def get_dynamic_greeting(self):
+        return self.get_quote(self.greeting_category())
+
+    def all_lines(self):
+        """全部固定台词（问候类别排在最前，供 TTS 预合成）"""
+        first = self.greeting_category()
+        lines = list(self.QUOTES[first])
+        for category, quotes in self.QUOTES.items():
+            if category != first:
+                lines.extend(quotes)
+        lines.append(self.TIRED_LINE)
+        return lines
 
     def get_soulful_response(self, mood, event=None):
         """根据心情和事件生成有灵魂的回复"""
@@ -62,6 +77,6 @@ class SherrySoul:
         elif mood == "lonely":
             return self.get_quote("idle_lonely")
         elif mood == "tired":
-            return "主人... 雪莉有点困了... 可以在您的桌面角角睡一会儿吗？😴"
+            return self.TIRED_LINE
         
         return self.get_dynamic_greeting()
@@ -11,10 +11,21 @@ import random
 import time
 import psutil
 from datetime import datetime
-import AppKit
-from pynput.mouse import Controller
 import websockets
 
+# 鼠标跟随依赖 macOS 的 AppKit 和 pynput；缺失时大脑照常运行，只是不跟随鼠标
+try:
+    import AppKit
+    HAS_APPKIT = True
+except ImportError:
+    HAS_APPKIT = False
+
+try:
+    from pynput.mouse import Controller
+    HAS_PYNPUT = True
+except ImportError:
+    HAS_PYNPUT = False
+
 from src.brain.mood_engine import MoodEngine
 from src.brain.soul import SherrySoul
 
@@ -25,11 +36,142 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SpriteBrain")
 
+# 🚨 重连退避：从 0.25 秒开始指数翻倍，最长 30 秒
+INITIAL_RETRY_DELAY = 0.25
+MAX_RETRY_DELAY = 30
+# 等待同进程服务器绑定 socket 的最长时间
+SERVER_READY_TIMEOUT = 10
+# 🚨 鼠标跟随：低频发送目标值，由服务器渲染线程每帧弹簧插值（60fps 平滑）
+MOUSE_TARGET_RATE = 5      # 目标值发送频率 (Hz)
+MOUSE_TARGET_EPSILON = 0.01  # 目标变化小于此值不发送
+# 触摸反应结束后恢复表情的等待时间（毫秒）
+TOUCH_EXPRESSION_HOLD_MS = 3000
+
+# 🚨 分区触摸反馈：部位 -> 表情、动作与台词（台词同时用于 TTS 预合成）
+TOUCH_REACTIONS = {
+    "头顶": {
+        "expression": "happy",
+        "motion": "Tap",
+        "responses": [
+            "被主人摸头了...好幸福...",
+            "主人的手好温柔，雪莉要融化啦～",
+            "喵～主人的摸摸最棒了！",
+            "头顶被主人抚摸了，好舒服～",
+        ]
+    },
+    "脸颊": {
+        "expression": "blush",
+        "motion": "Tap",  # 使用存在的动作
+        "responses": [
+            "主、主人...捏雪莉的脸...",
+            "雪莉的脸颊被主人捏了，好害羞...",
+            "呀！主人真是的...",
+            "雪莉会变胖的啦...",
+        ]
+    },
+    "左耳": {
+        "expression": "happy",
+        "motion": "Tap",
+        "responses": [
+            "耳朵是敏感部位啦...",
+            "喵～主人摸耳朵好舒服...",
+            "左耳被主人抚摸了～",
+        ]
+    },
+    "右耳": {
+        "expression": "happy",
+        "motion": "Tap",
+        "responses": [
+            "耳朵是敏感部位啦...",
+            "喵～主人摸耳朵好舒服...",
+            "右耳被主人抚摸了～",
+        ]
+    },
+    "身体": {
+        "expression": "blush",
+        "motion": "Idle",
+        "responses": [
+            "呀！那里好敏感...",
+            "主人真是的...摸那里...",
+            "雪莉的身体被主人抱住了...",
+            "主人的怀抱好温暖...",
+        ]
+    },
+    "左手": {
+        "expression": "love",
+        "motion": "Tap",  # 使用存在的动作
+        "responses": [
+            "主人握住了雪莉的手...",
+            "手拉手～好开心～",
+            "雪莉的手被主人温暖的大手握住了...",
+        ]
+    },
+    "右手": {
+        "expression": "love",
+        "motion": "Idle",  # 使用存在的动作
+        "responses": [
+            "主人握住了雪莉的手...",
+            "手拉手～好开心～",
+            "雪莉的爪子被主人握住了～",
+        ]
+    },
+    "尾巴": {
+        "expression": "happy",
+        "motion": "Idle",
+        "responses": [
+            "尾巴被抓住了！",
+            "喵～不要拉尾巴啦...",
+            "雪莉的尾巴敏感啦...",
+        ]
+    },
+}
+DEFAULT_TOUCH_PART = "身体"
+# 触摸时按心情追加的台词
+MOOD_TOUCH_RESPONSES = {
+    "excited": [
+        "心跳得好快...",
+        "被主人触碰的感觉太棒了...",
+    ],
+    "happy": [
+        "好喜欢被主人摸...",
+        "还要更多...",
+    ],
+}
+# 好感度提示台词（每 60 秒检查：低于 30 / 高于 80）
+AFFECTION_LOW_LINES = [
+    "哼...主人都不理雪莉...",
+    "雪莉生气了啦...",
+    "再不理我，我就要黑化了...",
+]
+AFFECTION_HIGH_LINES = [
+    "主人～雪莉最喜欢你了！",
+    "好想一直和主人在一起～",
+    "主人摸摸～",
+]
+
+
+def dialogue_corpus(soul: SherrySoul) -> list:
+    """🚨 全部已知台词，按首次出现的先后排序：当前时段问候 → 触摸反应 → 心情 / 好感度 → 其余语录"""
+    greetings = soul.QUOTES[soul.greeting_category()]
+    lines = list(greetings)
+    for reaction in TOUCH_REACTIONS.values():
+        lines.extend(reaction["responses"])
+    for responses in MOOD_TOUCH_RESPONSES.values():
+        lines.extend(responses)
+    lines.extend(AFFECTION_LOW_LINES + AFFECTION_HIGH_LINES)
+    lines.extend(line for line in soul.all_lines() if line not in greetings)
+    return list(dict.fromkeys(lines))  # 去重，保持顺序
+
+
 class SpriteBrain:
-    def __init__(self, ws_uri="ws://127.0.0.1:8765/sprite"):
+    def __init__(self, ws_uri="ws://127.0.0.1:8765/sprite", local_server=None):
         self.ws_uri = ws_uri
+        # 🚨 同进程的 WebSocketServer：有则走进程内直连（dict 直接入队，无 socket / JSON）
+        self.local_server = local_server
         self.ws = None
         self.running = False
+        self._loop = None
+        self._stop_event = None  # stop() 通过事件立即唤醒，不等待睡眠结束
         
         # 核心引擎
         self.mood = MoodEngine()
@@ -40,11 +182,12 @@ class SpriteBrain:
             "enabled": True,
             "head_sensitivity": 0.5,
             "eye_sensitivity": 1.0,
-            "smooth_factor": 0.15,
+            "target_duration_ms": 400,  # 弹簧稳定时间
+            "target_easing": "spring",
             "dead_zone": 0.1,
         }
         
-        self.current_params = {
+        self.current_params = {  # 最近一次发送的目标值
             "ParamAngleX": 0.0, "ParamAngleY": 0.0,
             "ParamEyeBallX": 0.0, "ParamEyeBallY": 0.0,
         }
@@ -53,6 +196,10 @@ class SpriteBrain:
             "ParamEyeBallX": 0.0, "ParamEyeBallY": 0.0,
         }
         
+        if not (HAS_APPKIT and HAS_PYNPUT):
+            logger.warning("⚠️ AppKit / pynput 不可用，鼠标跟随已禁用")
+            self.mouse_config["enabled"] = False
+            return
         try:
             self.screen = AppKit.NSScreen.mainScreen()
             self.screen_width = self.screen.frame().size.width
@@ -65,15 +212,31 @@ class SpriteBrain:
 
     async def connect(self):
         retry_count = 0
-        max_retry_delay = 30  # 最大重连间隔 30 秒
         
         while self.running:
+            # 🚨 同进程服务器：等 socket 绑定完成的信号后立即连接，不靠固定延时重试
+            if self.local_server is not None and not self.local_server.is_ready:
+                ready = await asyncio.to_thread(self.local_server.wait_ready, SERVER_READY_TIMEOUT)
+                if not ready:
+                    if self.local_server.startup_failed:
+                        # 🚨 启动已失败（如端口被占用）：wait_ready 会立刻返回，不能空转重试
+                        logger.error("❌ 同进程服务器启动失败，大脑停止连接")
+                        self.running = False
+                        return
+                    retry_count += 1
+                    delay = self._retry_delay(retry_count)
+                    logger.warning(f"⏳ 服务器尚未就绪，{delay}秒后继续等待...")
+                    await asyncio.sleep(delay)
+                    continue
             try:
                 logger.info(f"🔄 正在连接精灵大脑... (第 {retry_count + 1} 次尝试)")
-                async with websockets.connect(self.ws_uri) as ws:
+                async with self._open_connection() as ws:
                     self.ws = ws
                     retry_count = 0  # 重置重连计数
-                    logger.info("✅ 已连接到精灵大脑神经中枢！")
+                    logger.info(f"✅ 已连接到精灵大脑神经中枢！({'进程内直连' if self._is_local else 'WebSocket'})")
+                    await self.send_command("subscribe", {"topics": ["touch", "state"]})
+                    # 🚨 已知台词交给服务器后台预合成（低优先级，已缓存的直接跳过）
+                    await self.send_command("tts_warmup", {"lines": dialogue_corpus(self.soul)})
                     
                     # 创建任务
                     brain_task = asyncio.create_task(self._brain_loop())
@@ -105,27 +268,51 @@ class SpriteBrain:
                     except Exception as e:
                         logger.error(f"❌ 任务执行错误: {e}")
                     finally:
-                        # 清理连接状态
+                        # 清理连接状态（被 stop() 取消时也要停掉子任务）
+                        for task in (brain_task, mouse_task, receive_task):
+                            task.cancel()
                         self.ws = None
                         
             except websockets.exceptions.ConnectionClosed as e:
                 retry_count += 1
-                delay = min(5 * retry_count, max_retry_delay)
+                delay = self._retry_delay(retry_count)
                 logger.warning(f"🔌 连接断开 (code: {e.code}), {delay}秒后第 {retry_count} 次重试...")
                 await asyncio.sleep(delay)
             except Exception as e:
                 retry_count += 1
-                delay = min(5 * retry_count, max_retry_delay)
+                delay = self._retry_delay(retry_count)
                 logger.error(f"❌ 连接错误: {e}, {delay}秒后第 {retry_count} 次重试...")
                 await asyncio.sleep(delay)
 
+    @staticmethod
+    def _retry_delay(retry_count: int) -> float:
+        """指数退避：0.25, 0.5, 1, 2 ... 最长 30 秒"""
+        return min(INITIAL_RETRY_DELAY * 2 ** (retry_count - 1), MAX_RETRY_DELAY)
+
+    def _open_connection(self):
+        """进程内直连（有本地服务器时）或远程 WebSocket"""
+        if self.local_server is not None:
+            return self.local_server.connect_local()
+        return websockets.connect(self.ws_uri)
+
+    @property
+    def _is_local(self) -> bool:
+        return getattr(self.ws, "is_local", False)
+
     async def send_command(self, cmd_type: str, data: dict):
         if not self.ws: return False
         try:
-            await self.ws.send(json.dumps({"type": cmd_type, "data": data}))
+            message = {"type": cmd_type, "data": data}
+            await self.ws.send(message if self._is_local else json.dumps(message))
             return True
         except: return False
 
+    async def send_parameter_targets(self, params: dict, duration_ms: int, easing: str = "ease_out"):
+        """发送参数目标值：服务器在 duration_ms 内逐帧插值"""
+        return await self.send_command("parameter_target", {
+            "params": params, "duration": duration_ms, "easing": easing
+        })
+
     async def set_expression(self, expression_name: str):
         return await self.send_command("expression", {"name": expression_name})
 
@@ -134,6 +321,13 @@ class SpriteBrain:
 
     async def trigger_motion(self, group: str):
         return await self.send_command("motion", {"group": group})
+
+    async def run_sequence(self, steps: list, name: str = None):
+        """一条消息发送多步反应，由服务器按精确时间执行（同名序列会被替换）"""
+        data = {"steps": steps}
+        if name:
+            data["name"] = name
+        return await self.send_command("sequence", data)
     
     # === 🚨 【触觉反馈】接收消息循环 ===
     async def _receive_loop(self):
@@ -143,8 +337,13 @@ class SpriteBrain:
             try:
                 # 接收消息
                 message = await self.ws.recv()
-                logger.debug(f"📨 收到消息: {message[:200]}")
-                data = json.loads(message)
+                if isinstance(message, bytes):
+                    continue  # 二进制帧（如 lip_sync）大脑不处理
+                if isinstance(message, dict):
+                    data = message  # 进程内直连：已是 dict
+                else:
+                    logger.debug(f"📨 收到消息: {message[:200]}")
+                    data = json.loads(message)
                 msg_type = data.get("type")
                 msg_data = data.get("data", {})
                 
@@ -154,6 +353,12 @@ class SpriteBrain:
                     part = msg_data.get("part", "default")
                     logger.info(f"🎯 收到触摸事件: {action} on {part}")
                     await self._handle_touch(action, part)
+                
+                # 连接时的状态快照：记录服务器当前参数，避免重复发送相同目标
+                elif msg_type == "snapshot":
+                    for k, v in msg_data.get("parameters", {}).items():
+                        if k in self.current_params:
+                            self.current_params[k] = v
                     
             except websockets.exceptions.ConnectionClosed:
                 logger.debug("接收循环：连接已关闭")
@@ -177,89 +382,8 @@ class SpriteBrain:
         
         logger.info(f"💕 当前好感度: {affection}，心情: {current_mood}")
         
-        # 🚨 【分区触摸反馈】根据部位产生不同的反应
-        
-        # 定义分区反馈
-        part_reactions = {
-            "头顶": {
-                "expression": "happy",
-                "motion": "Tap",
-                "responses": [
-                    "被主人摸头了...好幸福...",
-                    "主人的手好温柔，雪莉要融化啦～",
-                    "喵～主人的摸摸最棒了！",
-                    "头顶被主人抚摸了，好舒服～",
-                ]
-            },
-            "脸颊": {
-                "expression": "blush",
-                "motion": "Tap",  # 使用存在的动作
-                "responses": [
-                    "主、主人...捏雪莉的脸...",
-                    "雪莉的脸颊被主人捏了，好害羞...",
-                    "呀！主人真是的...",
-                    "雪莉会变胖的啦...",
-                ]
-            },
-            "左耳": {
-                "expression": "happy",
-                "motion": "Tap",
-                "responses": [
-                    "耳朵是敏感部位啦...",
-                    "喵～主人摸耳朵好舒服...",
-                    "左耳被主人抚摸了～",
-                ]
-            },
-            "右耳": {
-                "expression": "happy",
-                "motion": "Tap",
-                "responses": [
-                    "耳朵是敏感部位啦...",
-                    "喵～主人摸耳朵好舒服...",
-                    "右耳被主人抚摸了～",
-                ]
-            },
-            "身体": {
-                "expression": "blush",
-                "motion": "Idle",
-                "responses": [
-                    "呀！那里好敏感...",
-                    "主人真是的...摸那里...",
-                    "雪莉的身体被主人抱住了...",
-                    "主人的怀抱好温暖...",
-                ]
-            },
-            "左手": {
-                "expression": "love",
-                "motion": "Tap",  # 使用存在的动作
-                "responses": [
-                    "主人握住了雪莉的手...",
-                    "手拉手～好开心～",
-                    "雪莉的手被主人温暖的大手握住了...",
-                ]
-            },
-            "右手": {
-                "expression": "love",
-                "motion": "Idle",  # 使用存在的动作
-                "responses": [
-                    "主人握住了雪莉的手...",
-                    "手拉手～好开心～",
-                    "雪莉的爪子被主人握住了～",
-                ]
-            },
-            "尾巴": {
-                "expression": "happy",
-                "motion": "Idle",
-                "responses": [
-                    "尾巴被抓住了！",
-                    "喵～不要拉尾巴啦...",
-                    "雪莉的尾巴敏感啦...",
-                ]
-            },
-        }
-        
-        # 获取对应部位的反应，默认为身体
-        reaction = part_reactions.get(part, part_reactions["身体"])
+        # 🚨 【分区触摸反馈】根据部位产生不同的反应，默认为身体
+        reaction = TOUCH_REACTIONS.get(part, TOUCH_REACTIONS[DEFAULT_TOUCH_PART])
         
         # 🚨 【好感度解锁表情系统】根据好感度选择可用表情
         tier = self.mood.get_affection_tier()
@@ -288,36 +412,19 @@ class SpriteBrain:
             else:
                 expression = random.choice(["love", "cat_mouth", "q_style"])
         
-        # 设置表情和动作
-        await self.set_expression(expression)
-        
-        # 🚨 尝试触发动画（可选，失败不阻断流程）
-        try:
-            await self.trigger_motion(reaction["motion"])
-        except Exception as e:
-            logger.debug(f"Motion trigger failed (optional): {e}")
-        
-        # 根据心情添加额外语音
-        mood_responses = []
-        if current_mood == "excited":
-            mood_responses = [
-                "心跳得好快...",
-                "被主人触碰的感觉太棒了...",
-            ]
-        elif current_mood == "happy":
-            mood_responses = [
-                "好喜欢被主人摸...",
-                "还要更多...",
-            ]
-        
-        # 合并语音列表并随机选择
-        all_responses = reaction["responses"] + mood_responses
+        # 根据心情添加额外语音，合并后随机选择
+        all_responses = reaction["responses"] + MOOD_TOUCH_RESPONSES.get(current_mood, [])
         response = random.choice(all_responses)
-        await self.speak(response)
-        
-        # 3秒后恢复普通表情
-        await asyncio.sleep(3)
-        await self.set_expression(self.mood.get_current_expression())
+
+        # 🚨 整个反应作为一个 sequence 发送：表情、动作、语音，3 秒后恢复表情
+        # 服务器按绝对时间执行，新的触摸会替换仍在进行的反应
+        await self.run_sequence([
+            {"type": "expression", "data": {"name": expression}},
+            {"type": "motion", "data": {"group": reaction["motion"]}},
+            {"type": "speak", "data": {"text": response}},
+            {"type": "wait", "data": {"ms": TOUCH_EXPRESSION_HOLD_MS}},
+            {"type": "expression", "data": {"name": self.mood.get_current_expression()}},
+        ], name="touch_reaction")
 
     # === 鼠标跟随逻辑 (略，保持原有逻辑) ===
     def get_mouse_position(self):
@@ -327,7 +434,7 @@ class SpriteBrain:
         return norm_x, norm_y
 
     async def _mouse_follow_loop(self):
-        """鼠标跟随主循环 - 15fps，批量发送参数"""
+        """鼠标跟随主循环 - 低频发送目标值（服务器每帧插值）"""
         while self.running and self.ws:
             if not self.mouse_config["enabled"]:
                 await asyncio.sleep(1)
@@ -344,18 +451,18 @@ class SpriteBrain:
             self.target_params["ParamEyeBallX"] = mx * 1.0 * self.mouse_config["eye_sensitivity"]
             self.target_params["ParamEyeBallY"] = my * 1.0 * self.mouse_config["eye_sensitivity"]
             
-            # 平滑更新
-            sf = self.mouse_config["smooth_factor"]
-            params_batch = {}
-            for k in self.current_params:
-                self.current_params[k] += (self.target_params[k] - self.current_params[k]) * sf
-                params_batch[k] = round(self.current_params[k], 3)
-            
-            # 批量发送所有参数
-            await self.send_command("parameter_batch", {"params": params_batch})
-            
-            # 15fps = 66ms 间隔
-            await asyncio.sleep(1/15)
+            # 只发送变化了的目标值，插值交给服务器渲染线程
+            changed = {
+                k: round(v, 3) for k, v in self.target_params.items()
+                if abs(v - self.current_params[k]) >= MOUSE_TARGET_EPSILON
+            }
+            if changed:
+                self.current_params.update(changed)
+                await self.send_parameter_targets(
+                    changed, self.mouse_config["target_duration_ms"], self.mouse_config["target_easing"]
+                )
+
+            await asyncio.sleep(1 / MOUSE_TARGET_RATE)
 
     # === 核心灵魂循环 ===
     async def _brain_loop(self):
@@ -395,17 +502,9 @@ class SpriteBrain:
                 
                 # 根据好感度给主人提示
                 if affection < 30:
-                    await self.speak(random.choice([
-                        "哼...主人都不理雪莉...",
-                        "雪莉生气了啦...",
-                        "再不理我，我就要黑化了...",
-                    ]))
+                    await self.speak(random.choice(AFFECTION_LOW_LINES))
                 elif affection > 80:
-                    await self.speak(random.choice([
-                        "主人～雪莉最喜欢你了！",
-                        "好想一直和主人在一起～",
-                        "主人摸摸～",
-                    ]))
+                    await self.speak(random.choice(AFFECTION_HIGH_LINES))
             
             # 2. 随机自主行为
             if random.random() < 0.15: # 15% 概率说话或做动作
@@ -431,10 +530,28 @@ class SpriteBrain:
 
     async def start(self):
         self.running = True
-        await self.connect()
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        
+        connect_task = asyncio.create_task(self.connect())
+        stop_task = asyncio.create_task(self._stop_event.wait())
+        await asyncio.wait([connect_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
+        
+        # 🚨 收到停止信号：立即取消连接任务（关闭连接、打断所有睡眠）
+        for task in (connect_task, stop_task):
+            task.cancel()
+        await asyncio.gather(connect_task, stop_task, return_exceptions=True)
+        logger.info("👋 大脑已停止")
 
     def stop(self):
+        """停止大脑（线程安全，可从 Qt 线程调用）"""
         self.running = False
+        loop, stop_event = self._loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass  # 事件循环已结束
 
 if __name__ == "__main__":
     asyncio.run(SpriteBrain().start())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Audio Sink - In-process PCM playback with a playback-position clock
+
+Playing speech by spawning afplay / ffplay costs a process start per
+utterance, and the lip sync used to advance on its own 33 ms QTimer, so
+the mouth drifted away from what was actually audible. A sink plays mono
+s16le PCM written from memory and reports how much of it has really been
+played; the lip sync looks its frame up from ``position()``.
+
+    DeviceSink   sound card through PortAudio (sounddevice, in requirements.txt)
+    FileSink     writes a WAV file at real-time pace (headless recording)
+    NullSink     discards PCM at real-time pace (headless tests, benchmarks)
+
+All sinks share the player interface used by the TTS stream pipeline:
+``start(sample_rate)``, ``write(pcm)``, ``finish()``, ``close()``, plus
+``position()`` (seconds played, safe to call from any thread). A device
+that stops taking audio raises SinkStalledError instead of blocking.
+
+``default_sink()`` picks one from SHERRY_AUDIO_SINK (device / ffplay /
+null / file:<path>), else the sound card, else an ffplay pipe.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import wave
+from typing import Optional
+
+from loguru import logger
+
+from src.core.tts_stream import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH, FfplayStreamPlayer
+
+try:
+    import sounddevice
+    HAS_SOUNDDEVICE = True
+except (ImportError, OSError):  # OSError: PortAudio library missing
+    HAS_SOUNDDEVICE = False
+
+DEFAULT_BUFFER_AHEAD = 0.2   # Seconds of audio a write may run ahead of playback
+STALL_MARGIN = 0.5           # Seconds past the buffered audio before a silent device counts as stalled
+
+
+class SinkStalledError(RuntimeError):
+    """The device stopped taking audio (unplugged, stream aborted)"""
+
+
+class NullSink:
+    """Headless sink: consumes PCM at real-time speed (like a device buffer) and records timings"""
+
+    def __init__(self, buffer_ahead: float = DEFAULT_BUFFER_AHEAD, realtime: bool = True):
+        self.buffer_ahead = buffer_ahead
+        self.realtime = realtime
+        self.sample_rate = PCM_SAMPLE_RATE
+        self.started_at: Optional[float] = None     # monotonic time of the first write (first sound)
+        self.bytes_written = 0
+        self.underruns = 0                          # Writes that arrived after the buffer ran dry
+        self._end = 0.0                             # monotonic time the written audio finishes
+
+    async def start(self, sample_rate: int = PCM_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+
+    async def write(self, pcm: bytes):
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = self._end = now
+        elif now > self._end:
+            self.underruns += 1
+            self._end = now
+        self._end += len(pcm) / (self.sample_rate * PCM_SAMPLE_WIDTH)
+        self.bytes_written += len(pcm)
+        if self.realtime:
+            delay = self._end - self.buffer_ahead - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def position(self) -> float:
+        """Seconds of audio played so far (an underrun pauses the clock)"""
+        if self.started_at is None:
+            return 0.0
+        written = self.bytes_written / (self.sample_rate * PCM_SAMPLE_WIDTH)
+        if not self.realtime:
+            return written
+        return max(0.0, written - max(0.0, self._end - time.monotonic()))
+
+    async def finish(self):
+        if self.realtime:
+            delay = self._end - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        pass
+
+
+class FileSink(NullSink):
+    """Writes the played PCM to a WAV file, with the same real-time clock as NullSink"""
+
+    def __init__(self, path: str, buffer_ahead: float = DEFAULT_BUFFER_AHEAD, realtime: bool = True):
+        super().__init__(buffer_ahead, realtime)
+        self.path = path
+        self._wav: Optional[wave.Wave_write] = None
+
+    async def start(self, sample_rate: int = PCM_SAMPLE_RATE):
+        await super().start(sample_rate)
+        self._wav = wave.open(self.path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(PCM_SAMPLE_WIDTH)
+        self._wav.setframerate(sample_rate)
+
+    async def write(self, pcm: bytes):
+        self._wav.writeframes(pcm)
+        await super().write(pcm)
+
+    async def close(self):
+        if self._wav is not None:
+            self._wav.close()  # Patches the header lengths
+            self._wav = None
+
+
+class DeviceSink:
+    """Plays PCM on the default output device from an in-memory buffer (PortAudio callback)"""
+
+    def __init__(self, buffer_ahead: float = DEFAULT_BUFFER_AHEAD, device=None):
+        self.buffer_ahead = buffer_ahead
+        self.device = device
+        self.sample_rate = PCM_SAMPLE_RATE
+        self.started_at: Optional[float] = None
+        self.bytes_written = 0
+        self.underruns = 0
+        self._stream = None
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._played = 0              # Frames handed to the device
+        self._block = 0               # Frames in the last callback
+        self._dry = False             # Buffer ran out after playback started
+        self._callback_at = 0.0       # monotonic time of the last callback
+        self._latency = 0.0           # Seconds between a callback and its samples reaching the DAC
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._drained: Optional[asyncio.Event] = None   # Set by the callback while a writer waits
+        self._waiting = False
+
+    @staticmethod
+    def available() -> bool:
+        if not HAS_SOUNDDEVICE:
+            return False
+        try:
+            return sounddevice.query_devices(kind="output") is not None
+        except Exception:
+            return False
+
+    async def start(self, sample_rate: int = PCM_SAMPLE_RATE):
+        """Open the device (PortAudioError if it is busy or gone); blocking calls run off the event loop"""
+        self.sample_rate = sample_rate
+        self._loop = asyncio.get_running_loop()
+        self._drained = asyncio.Event()
+        self._stream = await asyncio.to_thread(self._open, sample_rate)
+
+    def _open(self, sample_rate: int):
+        stream = sounddevice.RawOutputStream(
+            samplerate=sample_rate, channels=1, dtype="int16", device=self.device,
+            latency="low", callback=self._callback)
+        try:
+            stream.start()
+        except Exception:
+            stream.close()
+            raise
+        return stream
+
+    def _callback(self, outdata, frames, time_info, status):
+        """PortAudio thread: copy buffered PCM out, pad with silence when the buffer is dry"""
+        wanted = frames * PCM_SAMPLE_WIDTH
+        with self._lock:
+            chunk = bytes(self._buffer[:wanted])
+            del self._buffer[:wanted]
+            self._dry = self._dry or (self._played > 0 and len(chunk) < wanted)
+            self._block = len(chunk) // PCM_SAMPLE_WIDTH
+            self._played += self._block
+            self._callback_at = time.monotonic()
+            self._latency = max(0.0, time_info.outputBufferDacTime - time_info.currentTime)
+        outdata[:len(chunk)] = chunk
+        outdata[len(chunk):] = b"\x00" * (wanted - len(chunk))
+        if self._waiting:
+            try:
+                self._loop.call_soon_threadsafe(self._drained.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    async def write(self, pcm: bytes):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        with self._lock:
+            if self._dry:
+                self.underruns += 1
+                self._dry = False
+            self._buffer += pcm
+        self.bytes_written += len(pcm)
+        await self._wait_buffered(int(self.buffer_ahead * self.sample_rate * PCM_SAMPLE_WIDTH))
+
+    async def _wait_buffered(self, target: int):
+        """
+        Wait until the callback has drained the buffer to ``target`` bytes
+
+        🚨 由回调唤醒（不再 10 ms 轮询）；设备停止取数据时，超过缓冲时长 + STALL_MARGIN
+        抛 SinkStalledError，让 TTS 退回播放进程而不是永远卡在 speak()
+        """
+        excess = len(self._buffer) - target
+        if excess <= 0:
+            return
+        deadline = self._loop.time() + excess / (self.sample_rate * PCM_SAMPLE_WIDTH) + STALL_MARGIN
+        self._waiting = True
+        try:
+            while True:
+                self._drained.clear()
+                if len(self._buffer) <= target:
+                    return
+                remaining = deadline - self._loop.time()
+                try:
+                    await asyncio.wait_for(self._drained.wait(), max(remaining, 0.0))
+                except asyncio.TimeoutError:
+                    raise SinkStalledError(f"Audio device stopped playing ({len(self._buffer)} bytes unplayed)")
+        finally:
+            self._waiting = False
+
+    def position(self) -> float:
+        """Seconds audible so far: blocks the device took (the last one interpolated) minus output latency"""
+        with self._lock:
+            if not self._played:
+                return 0.0
+            block = self._block / self.sample_rate
+            since = min(time.monotonic() - self._callback_at, block)
+            played = self._played / self.sample_rate - block + since
+            latency = self._latency
+        return max(0.0, played - latency)
+
+    async def finish(self):
+        await self._wait_buffered(0)
+        await asyncio.sleep(self._latency)  # Last callback's samples still in the device buffer
+
+    async def close(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            await asyncio.to_thread(self._shutdown, stream)
+
+    @staticmethod
+    def _shutdown(stream):
+        stream.stop()
+        stream.close()
+
+
+def default_sink():
+    """Sink for speech playback, or None (then speech falls back to the player process per file)"""
+    choice = os.environ.get("SHERRY_AUDIO_SINK", "").strip()
+    if choice == "null":
+        return NullSink()
+    if choice.startswith("file:"):
+        return FileSink(choice[len("file:"):])
+    if choice in ("", "device") and DeviceSink.available():
+        return DeviceSink()
+    if choice in ("", "ffplay") and FfplayStreamPlayer.available():
+        return FfplayStreamPlayer()
+    logger.debug(f"No audio sink available ({choice or 'auto'}): using the player process per file")
+    return None
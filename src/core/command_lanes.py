@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Command Lanes - Per-connection concurrent command processing
+
+Each WebSocket connection gets three lanes so that long-running commands
+never block low-latency traffic arriving on the same socket:
+
+- realtime: parameter / parameter_batch / parameter_target / timeline_upload / timeline_play /
+  timeline_stop / look_at / subscribe / binary frames.
+  Handled inline on the reader task (they only stage values; a timeline
+  compile is bounded by MAX_KEYFRAMES), strictly in arrival order, so
+  "upload, then play" sent back to back always finds the timeline.
+- control:  expression / motion / message / window / get_status / ...
+  FIFO, one at a time, on its own worker task.
+- speech:   speak. FIFO, one utterance at a time, on its own worker task.
+
+Ordering is guaranteed within a lane, not across lanes. Server-side
+sequence steps are queued on the lanes of the connection that started the
+sequence (``schedule``), so they are ordered with its other commands.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Set
+
+from loguru import logger
+
+LANE_REALTIME = "realtime"
+LANE_CONTROL = "control"
+LANE_SPEECH = "speech"
+
+REALTIME_TYPES = {
+    "parameter", "parameter_batch", "parameter_target", "look_at", "binary_negotiate",
+    "timeline_upload", "timeline_play", "timeline_stop",
+    "subscribe", "unsubscribe",
+}
+SPEECH_TYPES = {"speak"}
+
+# Bounded so a flooding client gets errors instead of unbounded memory growth
+LANE_MAXSIZE = {
+    LANE_CONTROL: 256,
+    LANE_SPEECH: 32,
+}
+
+_CLOSE = object()
+
+# Strong references to lane workers that are draining after disconnect
+_draining_tasks: Set[asyncio.Task] = set()
+
+
+def lane_for(msg_type: str) -> str:
+    """Return the lane a message type is processed on"""
+    if msg_type in REALTIME_TYPES:
+        return LANE_REALTIME
+    if msg_type in SPEECH_TYPES:
+        return LANE_SPEECH
+    return LANE_CONTROL
+
+
+class LaneFullError(Exception):
+    """Raised when a lane queue is full"""
+
+
+class LaneClosedError(Exception):
+    """Raised when scheduling on lanes whose connection has closed"""
+
+
+class CommandLanes:
+    """Realtime / control / speech lanes for one connection"""
+
+    def __init__(self, handler: Callable[[str, dict], Awaitable[None]], name: str = ""):
+        """
+        Args:
+            handler: Coroutine function (msg_type, msg_data) that processes one command
+            name: Label used in log messages (usually the remote address)
+        """
+        self.handler = handler
+        self.name = name
+        self._queues: Dict[str, asyncio.Queue] = {
+            lane: asyncio.Queue(maxsize=size) for lane, size in LANE_MAXSIZE.items()
+        }
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._closed = False
+
+    def start(self):
+        """Start worker tasks (must be called on the event loop)"""
+        for lane, queue in self._queues.items():
+            self._workers[lane] = asyncio.create_task(self._worker(lane, queue))
+
+    async def submit(self, msg_type: str, msg_data: dict):
+        """Route a command to its lane; realtime commands run inline"""
+        lane = lane_for(msg_type)
+        if lane == LANE_REALTIME:
+            await self.handler(msg_type, msg_data)
+            return
+
+        if self._closed:
+            return
+        self._put(lane, (msg_type, msg_data, self.handler, None))
+
+    def schedule(self, msg_type: str, msg_data: dict,
+                 handler: Callable[[str, dict], Awaitable[None]]) -> asyncio.Future:
+        """
+        Queue a command on its lane behind this connection's pending ones, run by ``handler``
+
+        Returns a future that resolves once the command has run; cancelling it
+        before then skips the command. Realtime commands are not queued: call
+        the handler directly for those.
+        """
+        lane = lane_for(msg_type)
+        if lane == LANE_REALTIME:
+            raise ValueError(f"{msg_type} is not queued (realtime lane)")
+        if self._closed:
+            raise LaneClosedError(f"{self.name} lanes are closed")
+        done = asyncio.get_running_loop().create_future()
+        self._put(lane, (msg_type, msg_data, handler, done))
+        return done
+
+    def _put(self, lane: str, item: tuple):
+        try:
+            self._queues[lane].put_nowait(item)
+        except asyncio.QueueFull:
+            raise LaneFullError(f"{lane} lane is full ({self._queues[lane].maxsize} pending)")
+
+    def depth(self) -> Dict[str, int]:
+        """Pending commands per lane"""
+        return {lane: queue.qsize() for lane, queue in self._queues.items()}
+
+    def close(self):
+        """Stop accepting commands; queued commands still run, then workers exit"""
+        if self._closed:
+            return
+        self._closed = True
+        for lane, queue in self._queues.items():
+            task = self._workers.get(lane)
+            if task is None or task.done():
+                continue
+            _draining_tasks.add(task)
+            task.add_done_callback(_draining_tasks.discard)
+            try:
+                queue.put_nowait(_CLOSE)
+            except asyncio.QueueFull:
+                # Disconnected with a full backlog: drop it
+                task.cancel()
+
+    def cancel(self):
+        """Cancel all workers immediately (scheduled commands that never ran are cancelled too)"""
+        self._closed = True
+        for task in self._workers.values():
+            task.cancel()
+        for queue in self._queues.values():
+            while not queue.empty():
+                item = queue.get_nowait()
+                if item is not _CLOSE and item[3] is not None:
+                    item[3].cancel()
+
+    async def _worker(self, lane: str, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is _CLOSE:
+                return
+            msg_type, msg_data, handler, done = item
+            if done is not None and done.cancelled():
+                continue  # Its sequence was cancelled before the step started
+            try:
+                await handler(msg_type, msg_data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{lane} lane error ({self.name}, {msg_type}): {e}")
+            finally:
+                if done is not None and not done.done():
+                    done.set_result(None)
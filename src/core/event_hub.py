@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Event Hub - Single owner of client membership and server-pushed state
+
+Lives inside the WebSocket server's event loop. Every join/leave, topic
+subscription and broadcast goes through the hub, so the client registry is
+never mutated from other threads (other threads hand events over to the loop
+first).
+
+The hub also keeps a last-value cache of the sprite state (expression,
+background, window, speaking) and of every parameter value written through
+the server (up to MAX_CACHED_PARAMETERS ids, since clients can send any id).
+A client that subscribes to the "state" topic immediately gets a compact
+``snapshot`` message instead of having to poll ``get_status``; subsequent
+changes arrive as ``state`` events.
+
+Must be used from the asyncio event loop thread.
+"""
+
+from typing import Dict, Iterable, Mapping, Optional, Set
+
+from src.core.fanout import BroadcastFanout, TOPIC_STATE
+
+MAX_CACHED_PARAMETERS = 1024  # Live2D models have a few hundred at most
+
+
+class EventHub:
+    """Pub/sub hub: membership, topic routing and last-known state"""
+
+    def __init__(self, fanout: BroadcastFanout):
+        self.fanout = fanout
+
+        # Last-value caches
+        self._state: Dict[str, object] = {
+            "expression": "normal",
+            "background": "transparent",
+            "speaking": False,
+        }
+        self._parameters: Dict[str, float] = {}
+
+        self.joined = 0
+        self.snapshots_sent = 0
+        self.parameters_dropped = 0  # Values of new ids not cached because the cache was full
+
+    def __len__(self) -> int:
+        return len(self.fanout)
+
+    # === Membership ===
+    def join(self, websocket):
+        """Register a newly connected client"""
+        self.fanout.add(websocket)
+        self.joined += 1
+        if TOPIC_STATE in self.fanout.default_topics:
+            self._send_snapshot(websocket)
+
+    def leave(self, websocket):
+        """Unregister a disconnected client"""
+        self.fanout.remove(websocket)
+
+    def set_binary(self, websocket, enabled: bool = True):
+        self.fanout.set_binary(websocket, enabled)
+
+    # === Subscriptions ===
+    def subscribe(self, websocket, topics: Iterable[str]) -> Set[str]:
+        """Subscribe to topics; subscribing to "state" replays a snapshot"""
+        before = self.fanout.topics_of(websocket)
+        current = self.fanout.subscribe(websocket, topics)
+        if TOPIC_STATE in current and TOPIC_STATE not in before:
+            self._send_snapshot(websocket)
+        return current
+
+    def unsubscribe(self, websocket, topics: Iterable[str]) -> Set[str]:
+        return self.fanout.unsubscribe(websocket, topics)
+
+    def subscriber_count(self, topic: str) -> int:
+        return self.fanout.subscriber_count(topic)
+
+    # === Publishing ===
+    def publish(self, message: dict, topic: str = TOPIC_STATE, key: Optional[str] = None,
+                binary: Optional[bytes] = None):
+        """Publish an event to the topic's subscribers"""
+        self.fanout.publish(message, topic=topic, key=key, binary=binary)
+
+    def update_state(self, **fields):
+        """Record state changes and publish them as a ``state`` event"""
+        changed = {k: v for k, v in fields.items() if self._state.get(k) != v}
+        if not changed:
+            return
+        self._state.update(changed)
+        self.fanout.publish({"type": "state", "data": changed}, topic=TOPIC_STATE)
+
+    def update_parameters(self, params: Mapping[str, float]):
+        """Record parameter values (cached for snapshots, not broadcast)"""
+        cache = self._parameters
+        if len(cache) + len(params) <= MAX_CACHED_PARAMETERS:
+            cache.update(params)
+            return
+        # 🚨 缓存已满：已知 id 照常更新，新 id 不再缓存（防止客户端用随机 id 撑爆内存）
+        for param_id, value in params.items():
+            if param_id in cache or len(cache) < MAX_CACHED_PARAMETERS:
+                cache[param_id] = value
+            else:
+                self.parameters_dropped += 1
+
+    def get_parameter(self, param_id: str, default: Optional[float] = None) -> Optional[float]:
+        return self._parameters.get(param_id, default)
+
+    def get_state(self, name: str, default=None):
+        return self._state.get(name, default)
+
+    # === Snapshot ===
+    def snapshot(self) -> dict:
+        """Compact last-known state"""
+        return {
+            **self._state,
+            "parameters": dict(self._parameters),
+            "connected_clients": len(self.fanout),
+        }
+
+    def _send_snapshot(self, websocket):
+        message = {"type": "snapshot", "data": self.snapshot()}
+        if self.fanout.send_to(websocket, message):
+            self.snapshots_sent += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.fanout.stats(),
+            "joined": self.joined,
+            "snapshots_sent": self.snapshots_sent,
+            "cached_parameters": len(self._parameters),
+            "parameters_dropped": self.parameters_dropped,
+        }
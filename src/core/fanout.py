@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Broadcast Fan-out - Encode once, deliver through per-client bounded queues
+
+Every broadcast is serialized exactly once and appended to a bounded outbox
+per client. Each outbox is drained by its own writer task, so one slow or
+half-dead client never delays the others (or the lip-sync stream).
+
+Slow-consumer policies (applied when an outbox is full):
+- drop_oldest: discard the oldest pending message
+- coalesce:    keyed messages (e.g. lip_sync) replace their pending
+               predecessor in place (latest wins); overflow drops oldest
+- disconnect:  close the slow client's connection
+
+Topics: each outbox holds the set of topics its client subscribed to, and a
+broadcast is only serialized if at least one client wants its topic.
+
+In-process clients (``websocket.is_local``) get the message dict itself and
+are never serialized for.
+
+Must be used from the asyncio event loop thread.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import websockets
+from loguru import logger
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_COALESCE = "coalesce"
+POLICY_DISCONNECT = "disconnect"
+POLICIES = (POLICY_DROP_OLDEST, POLICY_COALESCE, POLICY_DISCONNECT)
+
+TOPIC_LIP_SYNC = "lip_sync"
+TOPIC_TOUCH = "touch"
+TOPIC_STATE = "state"
+TOPIC_METRICS = "metrics"
+TOPICS = (TOPIC_LIP_SYNC, TOPIC_TOUCH, TOPIC_STATE, TOPIC_METRICS)
+
+# Topics every client gets until it changes its subscriptions. state
+# (snapshot + change events) and the high-rate topics are opt-in.
+DEFAULT_TOPICS = (TOPIC_TOUCH,)
+
+# Broadcast message type -> topic (anything else is "state")
+TOPIC_BY_TYPE = {
+    "lip_sync": TOPIC_LIP_SYNC,
+    "touch_event": TOPIC_TOUCH,
+    "metrics": TOPIC_METRICS,
+}
+
+
+def topic_for(msg_type: str) -> str:
+    return TOPIC_BY_TYPE.get(msg_type, TOPIC_STATE)
+
+
+def parse_topics(topics: Iterable[str]) -> Set[str]:
+    """Validate a topic filter list; "*" selects every topic"""
+    if isinstance(topics, str):
+        topics = [topics]
+    result = set()
+    for topic in topics:
+        if topic == "*":
+            result.update(TOPICS)
+        elif topic in TOPICS:
+            result.add(topic)
+        else:
+            raise ValueError(f"Unknown topic: {topic} (expected one of {TOPICS} or '*')")
+    return result
+
+
+class ClientOutbox:
+    """Bounded outbound queue + writer task for one client"""
+
+    def __init__(self, websocket, maxsize: int = 64, policy: str = POLICY_COALESCE,
+                 topics: Iterable[str] = DEFAULT_TOPICS):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.topics: Set[str] = set(topics)
+        self.prefers_binary = False
+        self.prefers_objects = getattr(websocket, "is_local", False)
+
+        # Entries are [key, message] lists so coalescing can replace in place
+        self._queue = deque()
+        self._keyed: Dict[str, list] = {}
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._close_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Counters
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.high_water = 0
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def stop(self):
+        self._closing = True
+        if self._writer:
+            self._writer.cancel()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def put(self, message, key: Optional[str] = None):
+        """Queue an encoded message (never blocks)"""
+        if self._closing:
+            return
+
+        if key is not None and self.policy == POLICY_COALESCE:
+            entry = self._keyed.get(key)
+            if entry is not None:
+                entry[1] = message
+                self.coalesced += 1
+                return
+
+        if len(self._queue) >= self.maxsize:
+            if self.policy == POLICY_DISCONNECT:
+                self._disconnect_slow_consumer()
+                return
+            old_key, _ = self._queue.popleft()
+            if old_key is not None:
+                self._keyed.pop(old_key, None)
+            self.dropped += 1
+
+        entry = [key, message]
+        self._queue.append(entry)
+        if key is not None and self.policy == POLICY_COALESCE:
+            self._keyed[key] = entry
+        if len(self._queue) > self.high_water:
+            self.high_water = len(self._queue)
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._queue),
+            "high_water": self.high_water,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+    def _disconnect_slow_consumer(self):
+        self._closing = True
+        self.dropped += len(self._queue) + 1
+        self._queue.clear()
+        self._keyed.clear()
+        logger.warning(f"🐢 Disconnecting slow consumer: {self.websocket.remote_address}")
+        if self._writer:
+            self._writer.cancel()
+        self._close_task = asyncio.create_task(self.websocket.close(code=1013, reason="slow consumer"))
+
+    async def _write_loop(self):
+        queue = self._queue
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while queue:
+                key, message = queue.popleft()
+                if key is not None:
+                    self._keyed.pop(key, None)
+                try:
+                    await self.websocket.send(message)
+                    self.sent += 1
+                except websockets.exceptions.ConnectionClosed:
+                    self._closing = True
+                    queue.clear()
+                    self._keyed.clear()
+                    return
+                except Exception as e:
+                    logger.debug(f"Outbox send error ({self.websocket.remote_address}): {e}")
+
+
+class BroadcastFanout:
+    """Registry of client outboxes; serializes each broadcast once"""
+
+    def __init__(self, maxsize: int = 64, policy: str = POLICY_COALESCE,
+                 default_topics: Iterable[str] = DEFAULT_TOPICS):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy: {policy} (expected one of {POLICIES})")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.default_topics = parse_topics(default_topics)
+        self._outboxes: Dict[object, ClientOutbox] = {}
+        self._subscribers: Dict[str, int] = {topic: 0 for topic in TOPICS}
+        self.published_by_topic: Dict[str, int] = {topic: 0 for topic in TOPICS}
+
+        # Counters for clients that are already gone
+        self._retired = {"sent": 0, "dropped": 0, "coalesced": 0}
+        self.published = 0
+
+        # Optional observers: per publish (topic, message, seconds spent encoding + queueing)
+        # and per single-client send (websocket, message)
+        self.on_publish: Optional[Callable[[str, dict, float], None]] = None
+        self.on_send: Optional[Callable[[object, object], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._outboxes)
+
+    def add(self, websocket) -> ClientOutbox:
+        outbox = ClientOutbox(websocket, self.maxsize, self.policy, self.default_topics)
+        outbox.start()
+        self._outboxes[websocket] = outbox
+        self._count_topics(outbox.topics, 1)
+        return outbox
+
+    def remove(self, websocket):
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox:
+            outbox.stop()
+            self._count_topics(outbox.topics, -1)
+            for name in self._retired:
+                self._retired[name] += getattr(outbox, name)
+
+    def set_binary(self, websocket, enabled: bool = True):
+        """Mark a client as preferring binary frames where one is provided"""
+        outbox = self._outboxes.get(websocket)
+        if outbox:
+            outbox.prefers_binary = enabled
+
+    def subscribe(self, websocket, topics: Iterable[str]) -> Set[str]:
+        """Add topics to a client's subscriptions; returns the new set"""
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return set()
+        added = parse_topics(topics) - outbox.topics
+        outbox.topics |= added
+        self._count_topics(added, 1)
+        return set(outbox.topics)
+
+    def unsubscribe(self, websocket, topics: Iterable[str]) -> Set[str]:
+        """Remove topics from a client's subscriptions; returns the new set"""
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return set()
+        removed = parse_topics(topics) & outbox.topics
+        outbox.topics -= removed
+        self._count_topics(removed, -1)
+        return set(outbox.topics)
+
+    def topics_of(self, websocket) -> Set[str]:
+        outbox = self._outboxes.get(websocket)
+        return set(outbox.topics) if outbox else set()
+
+    def send_to(self, websocket, message) -> bool:
+        """Queue a message for a single client (dicts are encoded unless the client is local)"""
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return False
+        if isinstance(message, dict) and not outbox.prefers_objects:
+            message = json.dumps(message)
+        outbox.put(message)
+        if self.on_send:
+            self.on_send(websocket, message)
+        return True
+
+    def subscriber_count(self, topic: str) -> int:
+        return self._subscribers.get(topic, 0)
+
+    def publish(self, message: dict, topic: str = TOPIC_STATE, key: Optional[str] = None,
+                binary: Optional[bytes] = None):
+        """
+        Serialize once and queue for every client subscribed to ``topic``.
+
+        Args:
+            message: JSON-serializable message dict
+            topic: Topic the message belongs to (see TOPICS)
+            key: Coalescing key (latest wins under the coalesce policy)
+            binary: Optional pre-encoded binary frame for binary-negotiated clients
+        """
+        if not self._subscribers.get(topic):
+            return
+        started = time.perf_counter()
+        text = None
+        self.published += 1
+        self.published_by_topic[topic] += 1
+        for outbox in self._outboxes.values():
+            if topic not in outbox.topics:
+                continue
+            if outbox.prefers_objects:
+                outbox.put(message, key)
+            elif binary is not None and outbox.prefers_binary:
+                outbox.put(binary, key)
+            else:
+                if text is None:
+                    text = json.dumps(message)
+                outbox.put(text, key)
+        if self.on_publish:
+            self.on_publish(topic, message, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        """Queue-depth and delivery counters"""
+        outboxes = list(self._outboxes.values())
+        totals = dict(self._retired)
+        for outbox in outboxes:
+            for name in totals:
+                totals[name] += getattr(outbox, name)
+        depths = [o.depth() for o in outboxes]
+        return {
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "clients": len(outboxes),
+            "published": self.published,
+            "total_depth": sum(depths),
+            "max_depth": max(depths, default=0),
+            **totals,
+            "subscribers": dict(self._subscribers),
+            "published_by_topic": dict(self.published_by_topic),
+        }
+
+    def _count_topics(self, topics: Iterable[str], delta: int):
+        for topic in topics:
+            self._subscribers[topic] += delta
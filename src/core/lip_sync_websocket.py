@@ -9,18 +9,19 @@ Usage:
     from src.core.lip_sync_websocket import LipSyncWebSocketBroadcaster
     
     # In your WebSocketServer.__init__:
-    self.lip_sync = LipSyncWebSocketBroadcaster(self.tts_manager, self.clients, self.loop)
+    self.lip_sync = LipSyncWebSocketBroadcaster(self.tts_manager, self.hub, self.handoff)
     self.lip_sync.start()
 """
 
-import asyncio
-import json
 import time
-from typing import Optional, Set, Callable
+from typing import Optional, Callable
 from dataclasses import dataclass
 
 from loguru import logger
 
+from src.core.fanout import TOPIC_LIP_SYNC
+from src.core.wire_format import encode_lip_sync
+
 try:
     from src.core.tts_manager import TTSManager
     HAS_TTS = True
@@ -44,7 +45,8 @@ class LipSyncWebSocketBroadcaster:
     
     Features:
     - Connects to TTSManager's lip_sync_frame signal
-    - Broadcasts ParamMouthOpenY values to all connected WebSocket clients
+    - Broadcasts ParamMouthOpenY values to clients subscribed to the "lip_sync"
+      topic through the server's EventHub (coalesced latest-wins per client)
     - Configurable smoothing and frame rate
     - Can disable local Live2D lip sync when client wants to handle it
     """
@@ -52,8 +54,8 @@ class LipSyncWebSocketBroadcaster:
     def __init__(
         self,
         tts_manager: TTSManager,
-        clients: Set,
-        loop: asyncio.AbstractEventLoop,
+        hub,
+        handoff,
         param_id: str = "ParamMouthOpenY",
         smoothing: float = 0.3
     ):
@@ -62,14 +64,14 @@ class LipSyncWebSocketBroadcaster:
         
         Args:
             tts_manager: The TTSManager instance to connect to
-            clients: Set of connected WebSocket clients (shared with main server)
-            loop: The asyncio event loop to use for broadcasting
+            hub: The server's EventHub (owns client membership and outbound queues)
+            handoff: The server's ThreadHandoff into its asyncio event loop
             param_id: The Live2D parameter ID for mouth opening (default: ParamMouthOpenY)
             smoothing: Smoothing factor for mouth movement (0.0 - 1.0, higher = more responsive)
         """
         self.tts_manager = tts_manager
-        self.clients = clients
-        self.loop = loop
+        self.hub = hub
+        self.handoff = handoff
         self.param_id = param_id
         self.smoothing = smoothing
         
@@ -78,6 +80,13 @@ class LipSyncWebSocketBroadcaster:
         self._smoothed_value = 0.0
         self._last_broadcast_time = 0.0
         self._min_broadcast_interval = 0.016  # ~60fps max
+
+        # Frame counters (see stats())
+        self.frames_received = 0
+        self.frames_rate_limited = 0
+        self.frames_unsubscribed = 0
+        self.frames_posted = 0
+        self.frames_dropped = 0
         
     def start(self):
         """Start listening to TTS lip sync signals"""
@@ -117,6 +126,7 @@ class LipSyncWebSocketBroadcaster:
             mouth_open: Normalized mouth opening value (0.0 = closed, 1.0 = fully open)
         """
         self._current_value = mouth_open
+        self.frames_received += 1
         
         # Apply smoothing
         self._smoothed_value += (mouth_open - self._smoothed_value) * self.smoothing
@@ -124,22 +134,21 @@ class LipSyncWebSocketBroadcaster:
         # Rate limiting - don't broadcast too frequently
         current_time = time.time()
         if current_time - self._last_broadcast_time < self._min_broadcast_interval:
+            self.frames_rate_limited += 1
             return
         self._last_broadcast_time = current_time
         
-        # Schedule broadcast in the event loop (thread-safe)
-        if self.loop and self.clients:
-            try:
-                asyncio.run_coroutine_threadsafe(
-                    self._broadcast_frame(),
-                    self.loop
-                )
-            except Exception as e:
-                logger.debug(f"Failed to schedule lip sync broadcast: {e}")
+        # Hand the frame to the event loop (never blocks the emitting thread)
+        if not self.hub.subscriber_count(TOPIC_LIP_SYNC):
+            self.frames_unsubscribed += 1
+        elif self.handoff.post(self._broadcast_frame):
+            self.frames_posted += 1
+        else:
+            self.frames_dropped += 1
     
-    async def _broadcast_frame(self):
+    def _broadcast_frame(self):
         """Broadcast the current lip sync frame to all connected clients"""
-        if not self.clients:
+        if not self.hub.subscriber_count(TOPIC_LIP_SYNC):
             return
         
         # Build the lip sync message
@@ -155,20 +164,13 @@ class LipSyncWebSocketBroadcaster:
             "success": True
         }
         
-        json_message = json.dumps(message)
-        disconnected = set()
-        
-        # Send to all connected clients
-        for client in self.clients:
-            try:
-                await client.send(json_message)
-            except Exception as e:
-                # Client disconnected or error
-                disconnected.add(client)
-        
-        # Remove disconnected clients
-        if disconnected:
-            self.clients -= disconnected
+        # Encoded once; slow clients only ever hold the latest frame
+        self.hub.publish(
+            message,
+            topic=TOPIC_LIP_SYNC,
+            key="lip_sync",
+            binary=encode_lip_sync(self._smoothed_value, self._current_value)
+        )
     
     def set_smoothing(self, smoothing: float):
         """Update the smoothing factor (0.0 - 1.0)"""
@@ -178,6 +180,16 @@ class LipSyncWebSocketBroadcaster:
         """Get the current smoothed lip sync value"""
         return self._smoothed_value
 
+    def stats(self) -> dict:
+        """Frame counters: received from TTS, rate-limited, skipped (no subscribers), posted, dropped"""
+        return {
+            "received": self.frames_received,
+            "rate_limited": self.frames_rate_limited,
+            "unsubscribed": self.frames_unsubscribed,
+            "posted": self.frames_posted,
+            "dropped": self.frames_dropped,
+        }
+
 
 class LipSyncController:
     """
@@ -253,8 +265,8 @@ def integrate_lip_sync(websocket_server, tts_manager, live2d_view=None):
         if hasattr(websocket_server, 'loop') and websocket_server.loop:
             broadcaster = LipSyncWebSocketBroadcaster(
                 tts_manager=tts_manager,
-                clients=websocket_server.clients,
-                loop=websocket_server.loop
+                hub=websocket_server.hub,
+                handoff=websocket_server.handoff
             )
             broadcaster.start()
             
@@ -11,6 +11,7 @@ Uses live2d-py for Python bindings to Live2D Cubism SDK
 
 import os
 import platform
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Dict, List
 
@@ -22,6 +23,10 @@ from PyQt6.QtCore import Qt, QTimer, pyqtSlot, pyqtSignal, QThread
 from PyQt6.QtGui import QMouseEvent, QSurfaceFormat
 from loguru import logger
 
+from src.core.parameter_animator import ParameterAnimator
+from src.core.parameter_table import ParameterTable
+from src.core.timeline import TimelinePlayer
+
 # Try to import live2d
 try:
     import live2d.v3 as live2d
@@ -31,6 +36,34 @@ except ImportError as e:
     HAS_LIVE2D = False
     logger.warning(f"live2d-py not installed: {e}")
 
+# 🚨 多精灵共享：live2d.init() 每进程只做一次，按视图引用计数，最后一个视图释放时 dispose()
+_live2d_users = 0
+
+
+def _acquire_live2d():
+    """Initialize the Live2D SDK for one more view (GL context must be current)"""
+    global _live2d_users
+    live2d.glInit()  # Per context: loads GL entry points for the current context
+    if _live2d_users == 0:
+        live2d.init()
+    _live2d_users += 1
+
+
+def _release_live2d():
+    global _live2d_users
+    _live2d_users = max(0, _live2d_users - 1)
+    if _live2d_users == 0:
+        live2d.dispose()
+
+
+@lru_cache(maxsize=16)
+def _scan_model_dir(model_dir: str):
+    """(model3.json, motion files) of a model directory, shared by every view using it"""
+    directory = Path(model_dir)
+    model_json = next(iter(sorted(directory.glob("*.model3.json"))), None)
+    return model_json, tuple(sorted(directory.glob("*.motion3.json")))
+
+
 # Import TTS Manager for lip sync
 try:
     from src.core.tts_manager import TTSManager, get_tts_manager
@@ -113,6 +146,7 @@ class Live2DView(QOpenGLWidget):
 
         self.model_path = model_path
         self.model = None
+        self._parameter_info = None  # [(id, min, max, default)], read once per loaded model
         self._live2d_initialized = False
         self._gl_initialized = False
         self._pending_model_path = None
@@ -135,6 +169,13 @@ class Live2DView(QOpenGLWidget):
         self.is_big_head = False
         self.big_head_y_offset = -1.2  # 调整为对齐头部
 
+        # 🚨 跨线程参数暂存表：WebSocket 线程写入，paintGL 每帧取一次
+        self.parameter_table = ParameterTable()
+        # 🚨 参数目标插值：客户端低频发送目标值，每帧在此插值（直接写入会取消对应动画）
+        self.parameter_animator = ParameterAnimator()
+        # 🚨 时间线：上传一次关键帧曲线，按名字触发，每帧从预编译数组求值
+        self.timeline_player = TimelinePlayer()
+
         # Mouse tracking
         self.setMouseTracking(True)
         self.mouse_x = 0.0
@@ -219,8 +260,7 @@ class Live2DView(QOpenGLWidget):
         
         try:
             self.makeCurrent()
-            live2d.glInit()
-            live2d.init()
+            _acquire_live2d()
             self._live2d_initialized = True
             logger.info("✅ Live2D SDK initialized successfully")
             
@@ -250,19 +290,15 @@ class Live2DView(QOpenGLWidget):
         try:
             self.makeCurrent()
             self.model = live2d.LAppModel()
-            model_dir = Path(model_path)
-            
-            model_json = None
-            all_json_files = list(model_dir.glob("*.model3.json"))
-            for f in all_json_files:
-                model_json = f
-                break
+            model_dir = Path(model_path).resolve()
+            model_json, _ = _scan_model_dir(str(model_dir))
             
             if not model_json:
                 return False
             
             self.model.LoadModelJson(str(model_json))
             self.model_path = model_path
+            self._parameter_info = None
             
             # 🚨 预加载动作文件
             self._preload_motions(model_dir)
@@ -285,7 +321,7 @@ class Live2DView(QOpenGLWidget):
         if not self.model or not HAS_LIVE2D:
             return
         
-        motion_files = list(model_dir.glob("*.motion3.json"))
+        _, motion_files = _scan_model_dir(str(model_dir))
         logger.info(f"🔍 Found {len(motion_files)} motion files")
         
         for motion_file in motion_files:
@@ -337,6 +373,10 @@ class Live2DView(QOpenGLWidget):
             glEnable(GL_BLEND)
             glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
   
+            # 应用远程暂存的参数（每帧一次，最新值优先）
+            self._apply_staged_parameters()
+            self._apply_parameter_animations()
+
             # 嘴型同步
             if getattr(self, '_lip_sync_enabled', False):
                 self._update_lip_sync()
@@ -360,6 +400,36 @@ class Live2DView(QOpenGLWidget):
     
     def _on_update(self):
         self.update()
+
+    def _apply_staged_parameters(self):
+        """Apply all parameter values staged since the last frame"""
+        staged = self.parameter_table.drain()
+        if not staged:
+            return
+        for param_id, value in staged.items():
+            try:
+                self.model.SetParameterValue(param_id, value)
+            except Exception as e:
+                logger.debug(f"Failed to apply staged parameter {param_id}: {e}")
+
+    def _apply_parameter_animations(self):
+        """Apply this frame's interpolated target and timeline values"""
+        values = self.parameter_animator.evaluate(self.get_parameter)
+        values.update(self.timeline_player.evaluate())  # Playing timelines win
+        for param_id, value in values.items():
+            try:
+                self.model.SetParameterValue(param_id, value)
+            except Exception as e:
+                logger.debug(f"Failed to apply animated parameter {param_id}: {e}")
+
+    def stage_parameters(self, params: Dict[str, float]):
+        """线程安全：暂存参数，在下一帧 paintGL 中统一应用"""
+        self.parameter_table.stage_many(params)
+        self.parameter_animator.cancel(params)
+
+    def set_parameter_targets(self, targets: Dict[str, float], duration: float, easing: str):
+        """线程安全：设置参数目标值，由 paintGL 每帧插值（duration 单位为秒）"""
+        self.parameter_animator.set_targets(targets, duration, easing)
     
     def set_expression(self, name: str) -> bool:
         """
@@ -464,6 +534,31 @@ class Live2DView(QOpenGLWidget):
             logger.error(f"Failed to list parameters: {e}")
             return []
     
+    def describe_parameters(self) -> List[dict]:
+        """
+        所有参数的当前值与范围：[{"id", "value", "min", "max", "default"}]
+        范围只在模型加载后读取一次，之后只读当前值
+        """
+        if not self.model or not HAS_LIVE2D:
+            return []
+
+        if self._parameter_info is None:
+            info = []
+            try:
+                for i in range(self.model.GetParameterCount()):
+                    param = self.model.GetParameter(i)
+                    info.append((str(param.id), float(param.min), float(param.max), float(param.default)))
+            except Exception as e:
+                # 旧版 live2d-py 没有 GetParameter：只有参数名，范围未知
+                logger.debug(f"Parameter ranges unavailable: {e}")
+                info = [(param_id, None, None, None) for param_id in self.list_parameters()]
+            self._parameter_info = info
+
+        return [
+            {"id": param_id, "value": self.get_parameter(param_id), "min": lo, "max": hi, "default": default}
+            for param_id, lo, hi, default in self._parameter_info
+        ]
+
     def trigger_motion(self, group: str, index: int = 0):
         """🚨 【触觉反馈】触发动画/动作"""
         if not self.model or not HAS_LIVE2D:
@@ -559,7 +654,7 @@ class Live2DView(QOpenGLWidget):
         self._lip_sync_timer.stop()
         if HAS_LIVE2D and self._live2d_initialized:
             try:
-                live2d.dispose()
                 self._live2d_initialized = False
+                _release_live2d()
             except:
                 pass
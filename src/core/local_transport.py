@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Local Transport - In-process connection between a co-located client and the server
+
+The embedded SpriteBrain runs its own event loop in a QThread inside the same
+process as the WebSocketServer. Instead of going through loopback TCP it gets
+a LocalConnection: commands are handed to the server loop as plain dicts
+(no json, no framing, no kernel round-trip) and server messages come back the
+same way.
+
+The server sees a LocalPeer, which looks like a websocket to the existing
+handlers (``send``, ``remote_address``, async iteration), so the dispatch
+code and the command API are identical for local and remote clients.
+
+Each direction goes through a ThreadHandoff into the receiving loop, so a
+sender never blocks on the other loop's thread; like a socket, ``send`` waits
+once the reader falls a full inbox behind, and the reader wakes it as soon as
+it takes a message.
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Callable, List, Tuple, Union
+
+from websockets.exceptions import ConnectionClosedOK
+
+from src.core.thread_handoff import ThreadHandoff
+
+Message = Union[dict, str, bytes]
+
+_CLOSED = object()
+_peer_ids = itertools.count(1)
+
+
+class _Inbox:
+    """asyncio.Queue on one loop, fed from any thread through a handoff"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.maxsize = maxsize
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.handoff = ThreadHandoff(maxsize=maxsize, loop=loop)
+        # 🚨 背压等待者：(发送方 loop, future)，读取方取走消息或连接关闭时唤醒，不再 1ms 轮询
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._waiters_lock = threading.Lock()
+
+    def pending(self) -> int:
+        return self.handoff.depth() + self.queue.qsize()
+
+    async def put(self, message, is_closed: Callable[[], bool]):
+        """Wait while the reader is ``maxsize`` messages behind (like socket backpressure)"""
+        while True:
+            if is_closed():
+                raise ConnectionClosedOK(None, None)
+            if self.pending() < self.maxsize:
+                break
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            with self._waiters_lock:
+                self._waiters.append(waiter)
+            try:
+                # Re-check after registering: the reader may have taken a message in between
+                if self.pending() >= self.maxsize and not is_closed():
+                    await waiter[1]
+            finally:
+                with self._waiters_lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+        if not self.handoff.post(self.queue.put_nowait, message):
+            raise ConnectionClosedOK(None, None)  # Reader loop is gone
+
+    def _wake(self):
+        """Wake every waiting sender on its own loop (they re-check the inbox depth)"""
+        if not self._waiters:
+            return
+        with self._waiters_lock:
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # Sender loop already closed
+
+    def close(self):
+        # The close marker bypasses the handoff bound so it is never dropped
+        loop = self.handoff.loop
+        try:
+            loop.call_soon_threadsafe(self.queue.put_nowait, _CLOSED)
+        except RuntimeError:
+            pass  # Loop already closed
+        self._wake()
+
+    async def get(self):
+        message = await self.queue.get()
+        if message is _CLOSED:
+            self.queue.put_nowait(_CLOSED)  # Keep later readers from blocking
+        else:
+            self._wake()
+        return message
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LocalPeer:
+    """Server-side end of a local connection (duck-types a websocket)"""
+
+    is_local = True
+
+    def __init__(self, connection: "LocalConnection", peer_id: int):
+        self._connection = connection
+        self.remote_address = ("local", peer_id)
+
+    async def send(self, message: Message):
+        """Deliver a message to the client (dicts are passed through as-is)"""
+        connection = self._connection
+        if connection.closed:
+            raise ConnectionClosedOK(None, None)
+        await connection._client_inbox.put(message, lambda: connection.closed)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self._connection.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Message:
+        message = await self._connection._server_inbox.get()
+        if message is _CLOSED:
+            raise StopAsyncIteration
+        return message
+
+
+class LocalConnection:
+    """Client-side end of a local connection (send / recv / close like a websocket)"""
+
+    is_local = True
+
+    def __init__(self, server_loop: asyncio.AbstractEventLoop,
+                 client_loop: asyncio.AbstractEventLoop, maxsize: int = 256):
+        self.closed = False
+        self._server_inbox = _Inbox(server_loop, maxsize)
+        self._client_inbox = _Inbox(client_loop, maxsize)
+        self.peer = LocalPeer(self, next(_peer_ids))
+
+    @property
+    def remote_address(self):
+        return self.peer.remote_address
+
+    async def send(self, message: Message):
+        """Hand a command (dict, JSON text or binary frame) to the server loop"""
+        if self.closed:
+            raise ConnectionClosedOK(None, None)
+        await self._server_inbox.put(message, lambda: self.closed)
+
+    async def recv(self) -> Message:
+        message = await self._client_inbox.get()
+        if message is _CLOSED:
+            raise ConnectionClosedOK(None, None)
+        return message
+
+    def close(self):
+        """Close both directions (safe to call from either side, more than once)"""
+        if self.closed:
+            return
+        self.closed = True
+        self._server_inbox.close()
+        self._client_inbox.close()
+
+    def stats(self) -> dict:
+        return {
+            "to_server": self._server_inbox.handoff.stats(),
+            "to_client": self._client_inbox.handoff.stats(),
+        }
+
+    async def __aenter__(self) -> "LocalConnection":
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
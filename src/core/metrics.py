@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Metrics - Counters, gauges and HDR-style latency histograms for the server
+
+All metrics live in one MetricsRegistry owned by the WebSocket server and are
+recorded and read on its asyncio event loop thread (other threads hand their
+observations over first, see ThreadHandoff). Each metric has a name and an
+optional set of labels, e.g. ``sprite_command_seconds{type="parameter_batch"}``.
+
+Histograms use log-linear buckets (a power-of-two range split into 32
+linear sub-buckets, ~3% relative error) over integer microseconds, so
+recording is one integer op + dict increment and percentiles stay accurate
+from microseconds to seconds without configuring bucket bounds.
+
+Exposed as a JSON snapshot (``get_metrics`` / the "metrics" topic) and as
+Prometheus text through an optional local HTTP endpoint.
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _bucket_index(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_high(index: int) -> int:
+    """Highest value that maps to bucket ``index``"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class Counter:
+    """Monotonic counter (or a callback read at collection time)"""
+
+    kind = "counter"
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None):
+        self.value = 0
+        self._fn = fn
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def get(self) -> float:
+        return self._fn() if self._fn else self.value
+
+
+class Gauge:
+    """Current value (set directly or read from a callback)"""
+
+    kind = "gauge"
+
+    def __init__(self, fn: Optional[Callable[[], float]] = None):
+        self.value = 0.0
+        self._fn = fn
+
+    def set(self, value: float):
+        self.value = value
+
+    def get(self) -> float:
+        return self._fn() if self._fn else self.value
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations (seconds in, microsecond resolution)"""
+
+    kind = "histogram"
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        micros = int(seconds * 1e6) if seconds > 0 else 0
+        index = _bucket_index(micros)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if self.count == 0 or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add another histogram's samples to this one"""
+        if not other.count:
+            return
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.min = min(self.min, other.min) if self.count else other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.sum += other.sum
+
+    def percentile(self, q: float) -> float:
+        """Value (seconds) at quantile ``q`` (0..1), within one bucket's precision"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(max(_bucket_high(index) / 1e6, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """count / sum / min / max / percentiles in milliseconds"""
+        result = {
+            "count": self.count,
+            "sum_ms": round(self.sum * 1000, 3),
+            "min_ms": round(self.min * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+        for q in PERCENTILES:
+            result[f"p{q * 100:g}_ms"] = round(self.percentile(q) * 1000, 3)
+        return result
+
+
+class MetricsRegistry:
+    """Named, labelled counters / gauges / histograms (event loop thread only)"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[LabelKey, object]] = {}
+        self._kinds: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+        self.started_at = time.time()
+
+    def counter(self, name: str, description: str = "", fn: Optional[Callable[[], float]] = None,
+                **labels) -> Counter:
+        return self._get(name, Counter, description, labels, fn)
+
+    def gauge(self, name: str, description: str = "", fn: Optional[Callable[[], float]] = None,
+              **labels) -> Gauge:
+        return self._get(name, Gauge, description, labels, fn)
+
+    def histogram(self, name: str, description: str = "", **labels) -> LatencyHistogram:
+        return self._get(name, LatencyHistogram, description, labels, None)
+
+    def _get(self, name: str, cls, description: str, labels: dict, fn):
+        kind = self._kinds.setdefault(name, cls.kind)
+        if kind != cls.kind:
+            raise ValueError(f"Metric {name} is a {kind}, not a {cls.kind}")
+        if description:
+            self._help.setdefault(name, description)
+        series = self._metrics.setdefault(name, {})
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        metric = series.get(key)
+        if metric is None:
+            metric = cls(fn) if fn is not None else cls()
+            series[key] = metric
+        return metric
+
+    def _collect(self) -> Iterable[Tuple[str, str, LabelKey, object]]:
+        for name, series in self._metrics.items():
+            for key, metric in series.items():
+                yield name, self._kinds[name], key, metric
+
+    def snapshot(self) -> dict:
+        """JSON-friendly view of every metric"""
+        result: Dict[str, dict] = {}
+        for name, kind, key, metric in self._collect():
+            entry = result.setdefault(name, {"type": kind, "series": []})
+            item = {"labels": dict(key)} if key else {}
+            if kind == "histogram":
+                item.update(metric.summary())
+            else:
+                try:
+                    item["value"] = metric.get()
+                except Exception as e:
+                    logger.debug(f"Metric {name} collection failed: {e}")
+                    continue
+            entry["series"].append(item)
+        return {"uptime_s": round(time.time() - self.started_at, 1), "metrics": result}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (histograms as summaries)"""
+        lines: List[str] = []
+        for name, series in self._metrics.items():
+            kind = self._kinds[name]
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {'summary' if kind == 'histogram' else kind}")
+            for key, metric in series.items():
+                if kind == "histogram":
+                    for q in PERCENTILES:
+                        labels = _format_labels(key + (("quantile", f"{q:g}"),))
+                        lines.append(f"{name}{labels} {metric.percentile(q):.6f}")
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_sum{labels} {metric.sum:.6f}")
+                    lines.append(f"{name}_count{labels} {metric.count}")
+                else:
+                    try:
+                        value = metric.get()
+                    except Exception:
+                        continue
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in key)
+    return "{" + body + "}"
+
+
+async def start_prometheus_endpoint(registry: MetricsRegistry, host: str = "127.0.0.1",
+                                    port: int = 9765) -> asyncio.AbstractServer:
+    """Serve ``GET /metrics`` in Prometheus text format on the running loop"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Skip headers
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                body = registry.render_prometheus().encode()
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+                content_type = "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Metrics endpoint client error: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"📈 Prometheus metrics on http://{host}:{port}/metrics")
+    return server
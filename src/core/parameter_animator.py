@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Parameter Animator - Per-frame interpolation towards low-rate parameter targets
+
+Clients send a target value, an easing and a duration (``parameter_target``)
+a few times per second; the render thread calls ``evaluate()`` once per frame
+and gets smooth intermediate values at the full frame rate.
+
+- Tween easings ("linear", "ease_in", "ease_out", "ease_in_out") go from the
+  value at retarget time to the target in exactly ``duration`` seconds.
+- "spring" is a critically damped spring that keeps its velocity across
+  retargets, so a stream of moving targets (mouse follow) never jerks.
+  ``duration`` is the settle time (~99% of the way there).
+
+A direct write to a parameter (``cancel()``) stops its animation, so the
+latest command always wins regardless of which kind it was.
+
+Targets are set from any thread; evaluate() runs on the render thread only.
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Mapping, NamedTuple, Optional
+
+EASING_LINEAR = "linear"
+EASING_EASE_IN = "ease_in"
+EASING_EASE_OUT = "ease_out"
+EASING_EASE_IN_OUT = "ease_in_out"
+EASING_SPRING = "spring"
+
+EASING_FUNCTIONS: Dict[str, Callable[[float], float]] = {
+    EASING_LINEAR: lambda t: t,
+    EASING_EASE_IN: lambda t: t * t * t,
+    EASING_EASE_OUT: lambda t: 1 - (1 - t) ** 3,
+    EASING_EASE_IN_OUT: lambda t: 4 * t * t * t if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2,
+}
+EASINGS = set(EASING_FUNCTIONS) | {EASING_SPRING}
+
+# Critically damped spring: remaining distance is (1 + wt) e^-wt, ~1% at wt = 6.6
+SPRING_SETTLE = 6.6
+SPRING_EPSILON = 1e-3
+MAX_DURATION = 60.0  # Seconds; longer durations are clamped (an endless tween would pin the parameter)
+
+
+class _Target(NamedTuple):
+    value: float
+    duration: float
+    easing: str
+
+
+class _Animation:
+    __slots__ = ("start", "target", "duration", "easing", "started", "velocity")
+
+    def __init__(self, start: float, target: _Target, started: float, velocity: float = 0.0):
+        self.start = start
+        self.target = target.value
+        self.duration = target.duration
+        self.easing = target.easing
+        self.started = started
+        self.velocity = velocity  # Spring velocity at ``started`` (units / s)
+
+    def sample(self, now: float):
+        """(value, velocity, finished) at ``now``"""
+        elapsed = max(0.0, now - self.started)
+        if self.easing == EASING_SPRING:
+            omega = SPRING_SETTLE / self.duration
+            offset = self.start - self.target
+            decay = math.exp(-omega * elapsed)
+            slope = self.velocity + omega * offset
+            value = self.target + (offset + slope * elapsed) * decay
+            velocity = (self.velocity - omega * slope * elapsed) * decay
+            settled = abs(value - self.target) < SPRING_EPSILON and abs(velocity) < SPRING_EPSILON * omega
+            return (self.target, 0.0, True) if settled else (value, velocity, False)
+
+        progress = elapsed / self.duration
+        if progress >= 1.0:
+            return self.target, 0.0, True
+        eased = EASING_FUNCTIONS[self.easing](progress)
+        return self.start + (self.target - self.start) * eased, 0.0, False
+
+
+class ParameterAnimator:
+    """Thread-safe target staging + render-thread interpolation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Target] = {}
+        self._cancelled = set()
+        self._animations: Dict[str, _Animation] = {}  # Render thread only
+
+        # Statistics (read without lock, approximate is fine)
+        self.targets = 0       # Targets received
+        self.cancelled = 0     # Animations stopped by direct writes
+        self.completed = 0     # Animations that reached their target
+
+    def set_targets(self, targets: Mapping[str, float], duration: float,
+                    easing: str = EASING_EASE_OUT):
+        """
+        Animate parameters to ``targets`` over ``duration`` seconds (any thread)
+
+        ValueError for an unknown easing or a non-finite value / duration;
+        the duration is clamped to [0, MAX_DURATION].
+        """
+        if easing not in EASINGS:
+            raise ValueError(f"Unknown easing: {easing}")
+        duration = float(duration)
+        values = {param_id: float(value) for param_id, value in targets.items()}
+        if not math.isfinite(duration) or not all(math.isfinite(value) for value in values.values()):
+            raise ValueError("Parameter targets and duration must be finite")
+        duration = min(max(0.0, duration), MAX_DURATION)
+        with self._lock:
+            for param_id, value in values.items():
+                self._pending[param_id] = _Target(value, duration, easing)
+                self._cancelled.discard(param_id)
+            self.targets += len(values)
+
+    def cancel(self, param_ids: Iterable[str]):
+        """Stop animating parameters that were just written directly (any thread)"""
+        if not self._pending and not self._animations:
+            return  # Nothing animating: direct writes stay lock-free here
+        with self._lock:
+            for param_id in param_ids:
+                self._pending.pop(param_id, None)
+                self._cancelled.add(param_id)
+
+    def evaluate(self, get_value: Callable[[str], float], now: Optional[float] = None) -> Dict[str, float]:
+        """Values for this frame (render thread); ``get_value`` reads a parameter's current value"""
+        if not self._pending and not self._animations and not self._cancelled:
+            return {}
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            cancelled, self._cancelled = self._cancelled, set()
+
+        for param_id in cancelled:
+            if self._animations.pop(param_id, None) is not None:
+                self.cancelled += 1
+
+        values = {}
+        for param_id, target in pending.items():
+            running = self._animations.pop(param_id, None)
+            if target.duration <= 0:
+                values[param_id] = target.value  # Zero duration: jump
+                continue
+            if running is not None:
+                start, velocity, _ = running.sample(now)  # Retarget mid-flight
+            else:
+                start, velocity = get_value(param_id), 0.0
+            self._animations[param_id] = _Animation(start, target, now, velocity)
+
+        for param_id, animation in list(self._animations.items()):
+            value, _, finished = animation.sample(now)
+            values[param_id] = value
+            if finished:
+                del self._animations[param_id]
+                self.completed += 1
+        return values
+
+    def active_count(self) -> int:
+        """Parameters currently animating"""
+        return len(self._animations)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._animations),
+            "targets": self.targets,
+            "cancelled": self.cancelled,
+            "completed": self.completed,
+        }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Parameter Table - Thread-safe latest-value staging for Live2D parameters
+
+The asyncio (WebSocket) thread writes parameter values into the table at any
+rate; the Qt render thread drains it exactly once per frame in paintGL.
+Multiple writes to the same parameter between two frames collapse into one
+(latest wins), so the cost per frame is a single lock + dict swap no matter
+how many messages arrived.
+"""
+
+import threading
+import time
+from typing import Dict, Mapping
+
+
+class ParameterTable:
+    """Latest-wins parameter staging table shared between threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}
+
+        # Statistics (read without lock, approximate is fine)
+        self.writes = 0          # Total values staged
+        self.coalesced = 0       # Values overwritten before a frame applied them
+        self.drains = 0          # Frames that applied at least one value
+        self.last_drain_time = 0.0
+        self._pending_since = 0.0  # When the oldest pending value was staged
+
+    def stage(self, param_id: str, value: float):
+        """Stage a single parameter value (any thread)"""
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            if param_id in self._pending:
+                self.coalesced += 1
+            self._pending[param_id] = float(value)
+            self.writes += 1
+
+    def stage_many(self, params: Mapping[str, float]):
+        """Stage a batch of parameter values under one lock (any thread)
+
+        All values are converted before the lock is taken, so a bad value
+        raises without staging any part of the batch.
+        """
+        if not params:
+            return
+        values = {param_id: float(value) for param_id, value in params.items()}
+        with self._lock:
+            pending = self._pending
+            if not pending:
+                self._pending_since = time.monotonic()
+            for param_id, value in values.items():
+                if param_id in pending:
+                    self.coalesced += 1
+                pending[param_id] = value
+            self.writes += len(values)
+
+    def drain(self) -> Dict[str, float]:
+        """Take all pending values (render thread, once per frame)"""
+        with self._lock:
+            if not self._pending:
+                return {}
+            pending = self._pending
+            self._pending = {}
+        self.drains += 1
+        self.last_drain_time = time.monotonic()
+        return pending
+
+    def pending_count(self) -> int:
+        """Number of parameters waiting for the next frame"""
+        return len(self._pending)
+
+    def pending_age(self) -> float:
+        """Seconds the oldest pending value has waited for the render thread (0 if none)"""
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - self._pending_since
+
+    def clear(self):
+        """Discard all pending values"""
+        with self._lock:
+            self._pending = {}
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Sequencer - Server-side command macros on absolute deadlines
+
+A ``sequence`` is an ordered list of ordinary commands (expression, motion,
+speak, message, parameter, ...) and ``wait`` steps. It runs on the server's
+event loop: every step is scheduled against an absolute deadline computed
+from the sequence start, so waits never accumulate drift and the whole
+reaction costs one message instead of one round trip per step.
+
+- Steps are dispatched like commands from a client, but responses go to an
+  internal peer (errors are counted, not sent). Non-realtime steps are
+  queued on the lanes of the connection that started the run, so a
+  ``speak`` step waits its turn behind that client's other speech.
+- ``speak`` (or any step with ``"await": true``) can either run in the
+  background or hold the schedule until it finishes.
+- Starting a sequence cancels a running sequence with the same name.
+- A client may have MAX_RUNS_PER_OWNER runs active at once; its runs are
+  cancelled when it disconnects.
+- ``on_done(run)`` is called once per run with its final status, after every
+  step (background ones included) has finished.
+
+Event loop thread only.
+"""
+
+import asyncio
+import itertools
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional
+
+from loguru import logger
+
+from src.core.command_lanes import LANE_REALTIME, LaneClosedError, LaneFullError, lane_for
+
+STEP_WAIT = "wait"
+# Commands a sequence may contain (besides "wait")
+STEP_TYPES = {
+    "expression", "motion", "speak", "message", "parameter", "parameter_batch",
+    "parameter_target", "look_at", "background", "timeline_play", "timeline_stop",
+}
+MAX_STEPS = 256
+MAX_SEQUENCES = 64
+MAX_SEQUENCE_MS = 600_000  # Sum of a sequence's waits (10 minutes)
+MAX_RUNS_PER_OWNER = 16
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+
+class SequenceError(ValueError):
+    """Invalid sequence definition or unknown sequence name"""
+
+
+class Step:
+    __slots__ = ("type", "data", "wait")
+
+    def __init__(self, step_type: str, data: dict, wait: bool):
+        self.type = step_type
+        self.data = data
+        self.wait = wait  # Hold the schedule until the step finishes
+
+
+def compile_steps(steps: List[Mapping]) -> List[Step]:
+    """Validate a step list: ``{"type": ..., "data": {...}, "await": bool}``"""
+    if not steps or not isinstance(steps, list):
+        raise SequenceError("Sequence needs at least one step")
+    if len(steps) > MAX_STEPS:
+        raise SequenceError(f"Sequence exceeds {MAX_STEPS} steps")
+    compiled = []
+    total_ms = 0.0
+    for index, step in enumerate(steps):
+        if not isinstance(step, Mapping):
+            raise SequenceError(f"Step {index} is not an object")
+        step_type = step.get("type")
+        data = step.get("data", {})
+        if not isinstance(data, Mapping):
+            raise SequenceError(f"Step {index} data is not an object")
+        if step_type == STEP_WAIT:
+            try:
+                ms = float(data.get("ms", 0))
+            except (TypeError, ValueError):
+                raise SequenceError(f"Step {index}: wait needs a numeric 'ms'") from None
+            # 🚨 Infinity / NaN（Python json 接受）会让序列永远睡下去
+            if not math.isfinite(ms) or ms < 0:
+                raise SequenceError(f"Step {index}: wait must be a finite, non-negative 'ms'")
+            total_ms += ms
+            if total_ms > MAX_SEQUENCE_MS:
+                raise SequenceError(f"Sequence waits exceed {MAX_SEQUENCE_MS} ms")
+            data = {"ms": ms}
+        elif step_type not in STEP_TYPES:
+            raise SequenceError(f"Step {index}: unsupported type {step_type!r}")
+        compiled.append(Step(step_type, dict(data), bool(step.get("await", False))))
+    return compiled
+
+
+class _SequencePeer:
+    """Stand-in client that receives the step responses of one run"""
+
+    is_local = True  # Responses stay dicts, nothing is serialized
+
+    def __init__(self, run: "SequenceRun"):
+        self.run = run
+        self.remote_address = ("sequence", run.id)
+
+    async def send(self, message):
+        if isinstance(message, dict) and message.get("type") == "error":
+            self.run.errors.append(message.get("data", {}).get("message", ""))
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+class SequenceRun:
+    """One execution of a sequence"""
+
+    def __init__(self, run_id: int, name: Optional[str], steps: List[Step], owner=None, lanes=None):
+        self.id = run_id
+        self.name = name
+        self.steps = steps
+        self.owner = owner               # Client that started it (receives sequence_completed)
+        self.lanes = lanes               # Owner's CommandLanes (None: steps are dispatched directly)
+        self.status = STATUS_RUNNING
+        self.step_index = 0
+        self.errors: List[str] = []
+        self.started = 0.0
+        self.finished = 0.0
+        self.max_lateness = 0.0          # Worst step start after its deadline (seconds)
+        self.task: Optional[asyncio.Task] = None
+        self.cancelling = False          # Cancel requested, task not finished yet
+
+    def describe(self) -> dict:
+        end = self.finished or time.monotonic()
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "steps": len(self.steps),
+            "completed_steps": self.step_index,
+            "errors": self.errors,
+            "elapsed_ms": round((end - self.started) * 1000, 1) if self.started else 0.0,
+            "max_lateness_ms": round(self.max_lateness * 1000, 3),
+        }
+
+
+class Sequencer:
+    """Registry of named sequences + scheduler of running ones"""
+
+    def __init__(self, dispatch: Callable[[object, str, dict], Awaitable[None]],
+                 on_done: Optional[Callable[[SequenceRun], None]] = None):
+        """
+        Args:
+            dispatch: ``async dispatch(peer, msg_type, data)`` (WebSocketServer._dispatch)
+            on_done: Called on the loop thread when a run completes, fails or is cancelled
+        """
+        self._dispatch = dispatch
+        self.on_done = on_done
+        self._registered: Dict[str, List[Step]] = {}
+        self._running: Dict[int, SequenceRun] = {}
+        self._by_name: Dict[str, int] = {}
+        self._ids = itertools.count(1)
+
+        self.started = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    # === Registry ===
+    def register(self, name: str, steps: List[Mapping]) -> int:
+        """Store a named sequence for later ``start(name=...)``; returns its step count"""
+        if not name:
+            raise SequenceError("Sequence name is required")
+        if name not in self._registered and len(self._registered) >= MAX_SEQUENCES:
+            raise SequenceError(f"Too many registered sequences (max {MAX_SEQUENCES})")
+        self._registered[name] = compile_steps(steps)
+        return len(self._registered[name])
+
+    def names(self) -> List[str]:
+        return sorted(self._registered)
+
+    # === Execution ===
+    def start(self, name: Optional[str] = None, steps: Optional[List[Mapping]] = None,
+              owner=None, lanes=None) -> SequenceRun:
+        """Run ``steps`` (or the registered sequence ``name``); cancels a running one of the same name"""
+        if steps is not None:
+            compiled = compile_steps(steps)
+        elif name in self._registered:
+            compiled = self._registered[name]
+        else:
+            raise SequenceError(f"Unknown sequence: {name}")
+
+        if name is not None:
+            self.cancel(name=name)
+        if owner is not None:
+            # 🚨 每个客户端同时运行的序列有上限（匿名序列不受 MAX_SEQUENCES 约束）
+            active = sum(1 for run in self._running.values() if run.owner is owner and not run.cancelling)
+            if active >= MAX_RUNS_PER_OWNER:
+                raise SequenceError(f"Too many running sequences (max {MAX_RUNS_PER_OWNER} per client)")
+        run = SequenceRun(next(self._ids), name, compiled, owner, lanes)
+        self._running[run.id] = run
+        if name is not None:
+            self._by_name[name] = run.id
+        run.task = asyncio.get_running_loop().create_task(self._execute(run))
+        run.task.add_done_callback(lambda _: self._finish(run))
+        self.started += 1
+        return run
+
+    def cancel(self, run_id: Optional[int] = None, name: Optional[str] = None) -> int:
+        """Cancel one run (by id or name) or, with neither, every run; returns how many"""
+        if run_id is None and name is None:
+            runs = list(self._running.values())
+        else:
+            if run_id is None:
+                run_id = self._by_name.get(name)
+            run = self._running.get(run_id)
+            runs = [run] if run else []
+        for run in runs:
+            run.cancelling = run.task.cancel() or run.cancelling
+        return len(runs)
+
+    def cancel_owner(self, owner) -> int:
+        """Client disconnected: cancel its runs (nobody is left for their completion events)"""
+        runs = [run for run in self._running.values() if run.owner is owner]
+        for run in runs:
+            run.owner = None
+            run.cancelling = run.task.cancel() or run.cancelling
+        return len(runs)
+
+    async def _execute(self, run: SequenceRun):
+        loop = asyncio.get_running_loop()
+        peer = _SequencePeer(run)
+        background = set()  # Unawaited step tasks / lane futures of this run (strong refs)
+        queued = set()      # Lane futures of steps that may not have started yet
+
+        def handler(msg_type: str, data: dict):
+            return self._dispatch(peer, msg_type, data)
+        run.started = time.monotonic()
+        deadline = loop.time()
+        try:
+            for index, step in enumerate(run.steps):
+                run.step_index = index
+                if step.type == STEP_WAIT:
+                    # 🚨 绝对截止时间：等待从计划时间算起，不累积误差
+                    deadline += step.data["ms"] / 1000.0
+                    delay = deadline - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    continue
+
+                run.max_lateness = max(run.max_lateness, loop.time() - deadline)
+                if run.lanes is not None and lane_for(step.type) != LANE_REALTIME:
+                    # 🚨 走发起连接的通道：speak 与该连接的其他语音按顺序排队，不绕过 CommandLanes
+                    try:
+                        pending = run.lanes.schedule(step.type, step.data, handler)
+                    except (LaneFullError, LaneClosedError) as e:
+                        run.errors.append(str(e))
+                        continue
+                    queued.add(pending)
+                    pending.add_done_callback(queued.discard)
+                else:
+                    pending = handler(step.type, step.data)
+                if step.wait:
+                    await pending
+                    deadline = loop.time()  # Later waits count from when it finished
+                else:
+                    task = asyncio.ensure_future(pending)
+                    background.add(task)
+                    task.add_done_callback(background.discard)
+            run.step_index = len(run.steps)
+            if background:
+                # 完成事件在所有步骤（含后台语音）结束后发送；取消时不打断已开始的步骤
+                await asyncio.wait(list(background))
+            run.status = STATUS_FAILED if run.errors else STATUS_COMPLETED
+        except asyncio.CancelledError:
+            run.status = STATUS_CANCELLED
+            for pending in list(queued):
+                pending.cancel()  # Skipped if still queued; a step already running is not interrupted
+            raise
+        except Exception as e:
+            logger.error(f"Sequence {run.name or run.id} failed: {e}")
+            run.errors.append(str(e))
+            run.status = STATUS_FAILED
+
+    def _finish(self, run: SequenceRun):
+        """Task done callback (also runs for tasks cancelled before their first step)"""
+        if run.status == STATUS_RUNNING:
+            run.status = STATUS_CANCELLED
+        run.finished = time.monotonic()
+        self._running.pop(run.id, None)
+        if run.name is not None and self._by_name.get(run.name) == run.id:
+            del self._by_name[run.name]
+        if run.status == STATUS_COMPLETED:
+            self.completed += 1
+        elif run.status == STATUS_CANCELLED:
+            self.cancelled += 1
+        else:
+            self.failed += 1
+        if self.on_done:
+            self.on_done(run)
+
+    def stats(self) -> dict:
+        return {
+            "registered": len(self._registered),
+            "running": len(self._running),
+            "started": self.started,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
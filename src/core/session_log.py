@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Session Log - Record and replay WebSocket command streams
+
+SessionRecorder appends every inbound command, outbound response and
+broadcast to a compact binary log with monotonic timestamps. SessionReplayer
+feeds the inbound side of a log back into WebSocketServer._process_message
+at 1x, Nx or maximum speed and compares the responses with the recorded ones,
+so a production session becomes a reproducible workload / regression fixture.
+
+File layout (little endian):
+
+    header:  8s magic b"SHRYLOG1"
+    record:  u8 event, u8 payload kind, u32 connection id, f64 t, u32 length, payload
+
+- event:        0 inbound, 1 outbound, 2 connect, 3 disconnect
+- payload kind: 0 text (UTF-8 JSON), 1 binary frame
+- connection:   per-session id (0 = broadcast to every subscriber)
+- t:            seconds since the recording started (time.monotonic)
+
+A connect record's payload is the connection's endpoint: "sprite" (command
+socket), "stream" (/sprite/stream) or "vts" (VTube Studio API); empty in
+older logs, meaning "sprite". Replay feeds each connection's traffic to
+the handler of its endpoint.
+
+Records are appended through a buffered file; a crash loses at most the
+unflushed buffer, never earlier records.
+"""
+
+import asyncio
+import json
+import struct
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+from loguru import logger
+
+MAGIC = b"SHRYLOG1"
+RECORD_HEADER = struct.Struct("<BBIdI")
+
+EVENT_INBOUND = 0
+EVENT_OUTBOUND = 1
+EVENT_CONNECT = 2
+EVENT_DISCONNECT = 3
+
+PAYLOAD_TEXT = 0
+PAYLOAD_BINARY = 1
+
+BROADCAST_CONNECTION = 0
+
+ENDPOINT_SPRITE = "sprite"
+ENDPOINT_STREAM = "stream"
+ENDPOINT_VTS = "vts"
+
+
+class SessionLogError(ValueError):
+    """Raised for files that are not session logs"""
+
+
+class LogRecord(NamedTuple):
+    event: int
+    connection: int
+    t: float
+    payload: Union[str, bytes]
+
+
+class SessionRecorder:
+    """Append-only binary session log (event loop thread only)"""
+
+    def __init__(self, path: Union[str, Path], buffer_size: int = 64 * 1024):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb", buffering=buffer_size)
+        self._file.write(MAGIC)
+        self._started = time.monotonic()
+        self.records = 0
+        self.bytes = len(MAGIC)
+
+    def _write(self, event: int, connection: int, payload):
+        if self._file is None:
+            return
+        if isinstance(payload, bytes):
+            kind, data = PAYLOAD_BINARY, payload
+        else:
+            if isinstance(payload, dict):
+                payload = json.dumps(payload)
+            kind, data = PAYLOAD_TEXT, payload.encode()
+        header = RECORD_HEADER.pack(event, kind, connection, time.monotonic() - self._started, len(data))
+        self._file.write(header)
+        self._file.write(data)
+        self.records += 1
+        self.bytes += len(header) + len(data)
+
+    def inbound(self, connection: int, message):
+        self._write(EVENT_INBOUND, connection, message)
+
+    def outbound(self, connection: int, message):
+        self._write(EVENT_OUTBOUND, connection, message)
+
+    def connect(self, connection: int, endpoint: str = ENDPOINT_SPRITE):
+        self._write(EVENT_CONNECT, connection, endpoint)
+
+    def disconnect(self, connection: int):
+        self._write(EVENT_DISCONNECT, connection, b"")
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            logger.info(f"📼 Session log closed: {self.path} ({self.records} records, {self.bytes} bytes)")
+
+    def stats(self) -> dict:
+        return {"path": str(self.path), "records": self.records, "bytes": self.bytes}
+
+
+def read_log(path: Union[str, Path]) -> Iterator[LogRecord]:
+    """Iterate over the records of a session log (a truncated tail is ignored)"""
+    with open(Path(path).expanduser(), "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SessionLogError(f"Not a session log: {path}")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            event, kind, connection, t, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return  # Recorder was interrupted mid-record
+            payload = data if kind == PAYLOAD_BINARY else data.decode()
+            yield LogRecord(event, connection, t, payload)
+
+
+def message_type(payload) -> str:
+    """Message type of a logged payload ("binary" for binary frames)"""
+    if isinstance(payload, bytes):
+        return "binary"
+    try:
+        data = payload if isinstance(payload, dict) else json.loads(payload)
+        return data.get("type") or data.get("messageType", "?")  # VTS API messages use messageType
+    except (ValueError, AttributeError):
+        return "?"
+
+
+class ReplayPeer:
+    """Stand-in websocket for one recorded connection; collects what the server sends"""
+
+    def __init__(self, connection: int):
+        self.remote_address = ("replay", connection)
+        self.sent = Counter()
+
+    async def send(self, message):
+        self.sent[message_type(message)] += 1
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+
+class SessionReplayer:
+    """Feed a recorded session into a WebSocketServer"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path).expanduser()
+
+    async def replay(self, server, speed: Optional[float] = 1.0, skip_types: Iterable[str] = ()) -> dict:
+        """
+        Replay inbound commands through ``server._process_message``.
+
+        Args:
+            server: WebSocketServer (need not be started; usually on a NullSpriteBackend)
+            speed: 1.0 = recorded pace, N = N times faster, None = as fast as possible
+            skip_types: Inbound message types not to replay (e.g. "speak" without audio)
+        """
+        from src.core.stream_endpoint import LatestWinsStream
+        from src.core.vts_compat import VtsSession
+
+        skip_types = set(skip_types)
+        peers: Dict[int, ReplayPeer] = {}
+        endpoints: Dict[int, str] = {}
+        streams: Dict[int, LatestWinsStream] = {}
+        vts_sessions: Dict[int, VtsSession] = {}
+        recorded = Counter()
+        replayed = skipped = 0
+        lag_max = 0.0
+        started = time.monotonic()
+
+        def peer_for(connection: int) -> ReplayPeer:
+            peer = peers.get(connection)
+            if peer is None:
+                # Logs started mid-session: join on first use
+                peer = peers[connection] = ReplayPeer(connection)
+                if endpoints.get(connection, ENDPOINT_SPRITE) == ENDPOINT_SPRITE:
+                    server.hub.join(peer)  # Stream and VTS connections get no events
+            return peer
+
+        async def feed(connection: int, payload):
+            """🚨 按录制时的端点分派：命令 socket / 参数流 / VTS API"""
+            endpoint = endpoints.get(connection, ENDPOINT_SPRITE)
+            peer = peer_for(connection)
+            if endpoint == ENDPOINT_STREAM:
+                stream = streams.setdefault(connection, LatestWinsStream())
+                if stream.merge(payload):
+                    server._flush_stream(stream)
+            elif endpoint == ENDPOINT_VTS:
+                session = vts_sessions.setdefault(connection, VtsSession())
+                if message_type(payload) == "AuthenticationRequest":
+                    # Tokens are per server instance: present this server's token instead of the recorded one
+                    request = json.loads(payload)
+                    request.setdefault("data", {})["authenticationToken"] = server.vts._token
+                    payload = request
+                await peer.send(server.vts.handle(session, payload))
+            else:
+                await server._process_message(peer, payload)
+
+        for record in read_log(self.path):
+            if speed:
+                delay = started + record.t / speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lag_max = max(lag_max, -delay)
+
+            if record.event == EVENT_CONNECT:
+                endpoints[record.connection] = record.payload or ENDPOINT_SPRITE
+                peer_for(record.connection)
+            elif record.event == EVENT_DISCONNECT:
+                peer = peers.get(record.connection)
+                if peer is not None:
+                    server.hub.leave(peer)
+                    server._codecs.pop(peer, None)
+                streams.pop(record.connection, None)
+                vts_sessions.pop(record.connection, None)
+            elif record.event == EVENT_INBOUND:
+                if skip_types and message_type(record.payload) in skip_types:
+                    skipped += 1
+                    continue
+                await feed(record.connection, record.payload)
+                replayed += 1
+            elif record.event == EVENT_OUTBOUND and record.connection != BROADCAST_CONNECTION:
+                recorded[message_type(record.payload)] += 1
+
+        await asyncio.sleep(0)  # Let outbox writers deliver queued events
+        for peer in peers.values():
+            server.hub.leave(peer)
+
+        elapsed = time.monotonic() - started
+        responses = Counter()
+        for peer in peers.values():
+            responses.update(peer.sent)
+        return {
+            "log": str(self.path),
+            "speed": speed or "max",
+            "connections": len(peers),
+            "commands": replayed,
+            "skipped": skipped,
+            "elapsed_s": round(elapsed, 3),
+            "commands_per_s": round(replayed / elapsed, 1) if elapsed else 0.0,
+            "max_lag_ms": round(lag_max * 1000, 3),
+            "responses": dict(responses),
+            "recorded_responses": dict(recorded),
+        }
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Sprite Backend - What the control plane drives, separated from how it is drawn
+
+WebSocketServer only talks to a SpriteBackend. Two implementations:
+
+- QtSpriteBackend: the real SherrySpriteWindow. Parameter writes go to the
+  Live2DView staging table; everything else is queued onto the Qt thread
+  with QMetaObject.invokeMethod (QueuedConnection).
+- NullSpriteBackend: no Qt, no OpenGL, no live2d-py. Records every call with
+  a timestamp and keeps parameter values in memory, so the server and the
+  brain can be benchmarked and regression-tested on a GPU-less box.
+
+Backend methods are called from the server's event loop thread and must
+never block it.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from src.core.parameter_animator import ParameterAnimator
+from src.core.parameter_table import ParameterTable
+from src.core.timeline import TimelinePlayer
+
+try:
+    from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
+    HAS_QT = True
+except ImportError:
+    HAS_QT = False
+
+
+class SpriteBackend(ABC):
+    """Interface between the control plane and a sprite renderer"""
+
+    # Staging table drained once per rendered frame (None if the backend has none)
+    parameter_table: Optional[ParameterTable] = None
+    # Uploaded timelines evaluated once per rendered frame (None if unsupported)
+    timeline_player: Optional[TimelinePlayer] = None
+
+    @abstractmethod
+    def stage_parameters(self, params: Mapping[str, float]):
+        """Stage parameter values for the next frame (latest wins)"""
+
+    @abstractmethod
+    def set_parameter_targets(self, targets: Mapping[str, float], duration: float, easing: str):
+        """Interpolate parameters towards ``targets`` every frame over ``duration`` seconds"""
+
+    @abstractmethod
+    def get_parameter(self, param_id: str) -> float:
+        """Current value of a model parameter"""
+
+    def describe_parameters(self) -> List[dict]:
+        """Model parameters as {"id", "value", "min", "max", "default"} (min / max / default may be None)"""
+        return []
+
+    @abstractmethod
+    def available_expressions(self) -> List[str]:
+        """Expression names this sprite understands"""
+
+    @abstractmethod
+    def find_expression(self, name: str) -> Optional[str]:
+        """Resolve a requested expression name (None if unknown)"""
+
+    @property
+    @abstractmethod
+    def current_expression(self) -> str:
+        """Expression currently shown"""
+
+    @abstractmethod
+    def set_expression(self, name: str):
+        """Switch facial expression"""
+
+    @abstractmethod
+    def trigger_motion(self, group: str, index: int = 0):
+        """Start a motion from a motion group"""
+
+    @abstractmethod
+    def look_at(self, x: float, y: float):
+        """Point head / eyes at (x, y), both in -1.0 .. 1.0"""
+
+    @abstractmethod
+    def show_message(self, text: str, duration_ms: int = 5000):
+        """Show a speech bubble"""
+
+    @abstractmethod
+    def set_background(self, spec: str):
+        """Set the background ("transparent", "purple", a color or "image:<path>")"""
+
+    @abstractmethod
+    def position(self) -> Tuple[int, int]:
+        """Window position"""
+
+    @abstractmethod
+    def set_position(self, x: int, y: int):
+        """Move the window"""
+
+    @abstractmethod
+    def set_opacity(self, opacity: float):
+        """Set window opacity (0.0 - 1.0)"""
+
+    @abstractmethod
+    def set_visible(self, visible: bool):
+        """Show or hide the window"""
+
+    def stats(self) -> dict:
+        """Backend-specific counters"""
+        return {}
+
+
+class QtSpriteBackend(SpriteBackend):
+    """SherrySpriteWindow backend; all window calls are queued onto the Qt thread"""
+
+    def __init__(self, window):
+        if not HAS_QT:
+            raise RuntimeError("PyQt6 is required for QtSpriteBackend")
+        self.window = window
+        self.invokes: Dict[str, int] = {}
+
+    @property
+    def live2d_view(self):
+        return getattr(self.window, "live2d_view", None)
+
+    @property
+    def parameter_table(self) -> Optional[ParameterTable]:
+        return getattr(self.live2d_view, "parameter_table", None)
+
+    @property
+    def timeline_player(self) -> Optional[TimelinePlayer]:
+        return getattr(self.live2d_view, "timeline_player", None)
+
+    def _invoke(self, method: str, *args):
+        """Queue window.method(*args) on the Qt thread; args are (type, value) pairs"""
+        QMetaObject.invokeMethod(
+            self.window,
+            method,
+            Qt.ConnectionType.QueuedConnection,
+            *[Q_ARG(arg_type, value) for arg_type, value in args]
+        )
+        self.invokes[method] = self.invokes.get(method, 0) + 1
+
+    def stage_parameters(self, params: Mapping[str, float]):
+        view = self.live2d_view
+        if view is None or not hasattr(view, "stage_parameters"):
+            raise RuntimeError("Live2D view not available")
+        view.stage_parameters(params)
+
+    def set_parameter_targets(self, targets: Mapping[str, float], duration: float, easing: str):
+        view = self.live2d_view
+        if view is None or not hasattr(view, "set_parameter_targets"):
+            raise RuntimeError("Live2D view not available")
+        view.set_parameter_targets(targets, duration, easing)
+
+    def get_parameter(self, param_id: str) -> float:
+        view = self.live2d_view
+        return view.get_parameter(param_id) if view else 0.0
+
+    def describe_parameters(self) -> List[dict]:
+        view = self.live2d_view
+        if view and hasattr(view, "describe_parameters"):
+            return view.describe_parameters()
+        return []
+
+    def available_expressions(self) -> List[str]:
+        view = self.live2d_view
+        if view and hasattr(view, "get_available_expressions"):
+            return view.get_available_expressions()
+        return []
+
+    def find_expression(self, name: str) -> Optional[str]:
+        view = self.live2d_view
+        if view and hasattr(view, "find_expression"):
+            return view.find_expression(name)
+        return None
+
+    @property
+    def current_expression(self) -> str:
+        view = self.live2d_view
+        return view.current_expression if view else "normal"
+
+    def set_expression(self, name: str):
+        self._invoke("set_expression", (str, name))
+
+    def trigger_motion(self, group: str, index: int = 0):
+        self._invoke("trigger_motion", (str, group), (int, index))
+
+    def look_at(self, x: float, y: float):
+        self._invoke("look_at", (float, float(x)), (float, float(y)))
+
+    def show_message(self, text: str, duration_ms: int = 5000):
+        self._invoke("show_message", (str, text), (int, duration_ms))
+
+    def set_background(self, spec: str):
+        self._invoke("set_background", (str, spec))
+
+    def position(self) -> Tuple[int, int]:
+        return self.window.x(), self.window.y()
+
+    def set_position(self, x: int, y: int):
+        self._invoke("set_position", (int, x), (int, y))
+
+    def set_opacity(self, opacity: float):
+        self._invoke("set_opacity", (float, opacity))
+
+    def set_visible(self, visible: bool):
+        self._invoke("show" if visible else "hide")
+
+    def stats(self) -> dict:
+        animator = getattr(self.live2d_view, "parameter_animator", None)
+        player = self.timeline_player
+        return {
+            "qt_invokes": dict(self.invokes),
+            "animations": animator.stats() if animator else {},
+            "timelines": player.stats() if player else {},
+        }
+
+
+class BackendCall(NamedTuple):
+    """One recorded backend call"""
+    timestamp: float   # time.time() when the call reached the backend
+    method: str
+    args: tuple
+
+
+class NullSpriteBackend(SpriteBackend):
+    """
+    Headless recording backend (no Qt, no OpenGL, no live2d-py).
+
+    Every call is appended to ``calls`` with a timestamp. Parameter writes go
+    through a ParameterTable like the real view: with ``fps`` set, a render
+    thread drains it at that rate (recording "frame" calls); without it, writes
+    are applied immediately. Parameter targets and timelines are evaluated by
+    frame(), so they only animate with a render thread (or when frame() is called).
+    """
+
+    def __init__(self, expressions: Optional[Iterable[str]] = None, fps: Optional[float] = None,
+                 max_calls: Optional[int] = 100_000,
+                 parameters: Optional[Mapping[str, Tuple[float, float, float]]] = None):
+        """
+        Args:
+            expressions: Known expression names (None accepts any name)
+            fps: Simulated render rate; None applies parameter writes immediately
+            max_calls: Keep at most this many recorded calls (None = unbounded)
+            parameters: Model parameters as {id: (min, max, default)} for describe_parameters()
+        """
+        self.parameter_table = ParameterTable()
+        self.parameter_animator = ParameterAnimator()
+        self.timeline_player = TimelinePlayer()
+        self.calls = deque(maxlen=max_calls)
+        self.counts: Dict[str, int] = {}
+        self.values: Dict[str, float] = {}
+        self.parameters = dict(parameters or {})
+        self.frames = 0
+        self.fps = fps
+        self._expressions = [e.lower() for e in expressions] if expressions is not None else None
+        self._expression = "normal"
+        self._position = (0, 0)
+        self.opacity = 1.0
+        self.visible = True
+        self.background = "transparent"
+
+        self._render_thread: Optional[threading.Thread] = None
+        self._render_stop = threading.Event()
+        if fps:
+            self.start()
+
+    # === Recording ===
+    def _record(self, method: str, *args):
+        self.calls.append(BackendCall(time.time(), method, args))
+        self.counts[method] = self.counts.get(method, 0) + 1
+
+    def calls_of(self, method: str) -> List[BackendCall]:
+        """Recorded calls of one method, oldest first"""
+        return [call for call in list(self.calls) if call.method == method]
+
+    def clear(self):
+        """Forget recorded calls and counters (values are kept)"""
+        self.calls.clear()
+        self.counts.clear()
+
+    # === Simulated rendering ===
+    def start(self):
+        """Start the render thread (drains staged parameters at ``fps``)"""
+        if self._render_thread or not self.fps:
+            return
+        self._render_stop.clear()
+        self._render_thread = threading.Thread(target=self._render_loop, daemon=True)
+        self._render_thread.start()
+
+    def stop(self):
+        self._render_stop.set()
+        if self._render_thread:
+            self._render_thread.join(timeout=1)
+            self._render_thread = None
+
+    def frame(self) -> Dict[str, float]:
+        """Apply staged and animated parameters, as paintGL would; returns what was applied"""
+        staged = self.parameter_table.drain()
+        self.frames += 1
+        if staged:
+            self.values.update(staged)
+        animated = self.parameter_animator.evaluate(self.get_parameter)
+        animated.update(self.timeline_player.evaluate())
+        if animated:
+            self.values.update(animated)
+            staged.update(animated)
+        if staged:
+            self._record("frame", staged)
+        return staged
+
+    def _render_loop(self):
+        interval = 1.0 / self.fps
+        next_frame = time.perf_counter()
+        while not self._render_stop.is_set():
+            self.frame()
+            next_frame += interval
+            delay = next_frame - time.perf_counter()
+            if delay > 0:
+                self._render_stop.wait(delay)
+            else:
+                next_frame = time.perf_counter()  # Fell behind: don't try to catch up
+
+    # === SpriteBackend ===
+    def stage_parameters(self, params: Mapping[str, float]):
+        self._record("stage_parameters", dict(params))
+        self.parameter_table.stage_many(params)
+        self.parameter_animator.cancel(params)
+        if self._render_thread is None:
+            self.frame()
+
+    def set_parameter_targets(self, targets: Mapping[str, float], duration: float, easing: str):
+        self._record("set_parameter_targets", dict(targets), duration, easing)
+        self.parameter_animator.set_targets(targets, duration, easing)
+
+    def get_parameter(self, param_id: str) -> float:
+        default = self.parameters.get(param_id, (0.0, 0.0, 0.0))[2]
+        return self.values.get(param_id, default)
+
+    def describe_parameters(self) -> List[dict]:
+        return [
+            {"id": param_id, "value": self.get_parameter(param_id), "min": lo, "max": hi, "default": default}
+            for param_id, (lo, hi, default) in self.parameters.items()
+        ]
+
+    def available_expressions(self) -> List[str]:
+        return ["normal"] + list(self._expressions or [])
+
+    def find_expression(self, name: str) -> Optional[str]:
+        if not name or name.lower() in ("normal", "reset"):
+            return "normal"
+        if self._expressions is None or name.lower() in self._expressions:
+            return name.lower()
+        return None
+
+    @property
+    def current_expression(self) -> str:
+        return self._expression
+
+    def set_expression(self, name: str):
+        self._record("set_expression", name)
+        self._expression = self.find_expression(name) or self._expression
+
+    def trigger_motion(self, group: str, index: int = 0):
+        self._record("trigger_motion", group, index)
+
+    def look_at(self, x: float, y: float):
+        self._record("look_at", float(x), float(y))
+
+    def show_message(self, text: str, duration_ms: int = 5000):
+        self._record("show_message", text, duration_ms)
+
+    def set_background(self, spec: str):
+        self._record("set_background", spec)
+        self.background = spec
+
+    def position(self) -> Tuple[int, int]:
+        return self._position
+
+    def set_position(self, x: int, y: int):
+        self._record("set_position", x, y)
+        self._position = (x, y)
+
+    def set_opacity(self, opacity: float):
+        self._record("set_opacity", opacity)
+        self.opacity = max(0.0, min(1.0, opacity))
+
+    def set_visible(self, visible: bool):
+        self._record("set_visible", visible)
+        self.visible = visible
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.counts),
+            "frames": self.frames,
+            "parameters": len(self.values),
+            "animations": self.parameter_animator.stats(),
+            "timelines": self.timeline_player.stats(),
+        }
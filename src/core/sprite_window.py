@@ -29,6 +29,9 @@ try:
 except ImportError:
     HAS_TTS = False
 
+# Built-in model from project assets
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), "../assets/models/hanamaru")
+
 # macOS Native Window Level Support
 HAS_MACOS_LEVEL = False
 if platform.system() == 'Darwin':
@@ -51,9 +54,19 @@ class SherrySpriteWindow(QMainWindow):
     # 🚨 【触觉反馈】触摸事件信号 - 当用户触摸雪莉时发射
     touch_event = pyqtSignal(str, str)  # (action, part) 例如 ("tap", "head")
 
-    def __init__(self):
+    def __init__(self, name: str = "sherry", model_path: str = None, slot: int = 0, show_tray: bool = True):
+        """
+        Args:
+            name: Sprite name (WebSocket route ``/sprite/<name>``)
+            model_path: Live2D model directory (default: built-in hanamaru)
+            slot: Position index when several sprites share the screen (0 = bottom right)
+            show_tray: Create the tray icon (only one window per process needs it)
+        """
         super().__init__()
 
+        self.name = name
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.slot = slot
         self.drag_position = None
         self.bubble_widget = None
         self.is_click_through = False
@@ -72,7 +85,8 @@ class SherrySpriteWindow(QMainWindow):
         # Setup window properties
         self._setup_window()
         self._setup_ui()
-        self._setup_tray()
+        if show_tray:
+            self._setup_tray()
         self._position_bottom_right()
 
         logger.info("Sprite window initialized")
@@ -113,9 +127,7 @@ class SherrySpriteWindow(QMainWindow):
                 self.live2d_view.model_loaded.connect(self._auto_remove_watermark)
                 # 🚨 【触觉反馈】连接触摸信号到窗口级信号
                 self.live2d_view.touched.connect(self._on_touched)
-                # Use built-in model from project assets
-                model_path = os.path.join(os.path.dirname(__file__), "../assets/models/hanamaru")
-                self.live2d_view.load_model(model_path)
+                self.live2d_view.load_model(self.model_path)
             except Exception as e:
                 logger.error(f"Failed to initialize Live2D: {e}")
 
@@ -215,7 +227,7 @@ class SherrySpriteWindow(QMainWindow):
 
     def _position_bottom_right(self):
         screen = QApplication.primaryScreen().geometry()
-        x = screen.width() - self.width() - 20
+        x = screen.width() - (self.width() + 20) * (self.slot + 1)
         y = screen.height() - self.height() - 50
         self.move(x, y)
 
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Stream Endpoint - Latest-wins parameter stream (/sprite/stream)
+
+High-rate parameter traffic gets its own connection so it never queues in
+front of control commands on /sprite. A stream connection:
+
+- accepts only parameter / parameter_batch / look_at / binary_negotiate
+  (JSON or dict) and binary parameter / look_at frames;
+- merges every frame into one pending update on arrival: a value that is
+  overwritten before it was applied is dropped, never queued;
+- applies the pending update from a separate task as soon as the event loop
+  is free, so a burst of N frames costs one staging call;
+- never sends responses (invalid frames are counted and dropped).
+
+Event loop thread only.
+"""
+
+import asyncio
+import json
+import struct
+from typing import Dict, Optional, Tuple
+
+from src.core import wire_format
+from src.core.wire_format import ParamCodec, WireFormatError
+
+STREAM_TYPES = {"parameter", "parameter_batch", "look_at", "binary_negotiate"}
+
+
+class LatestWinsStream:
+    """Pending parameter / look_at update of one stream connection"""
+
+    def __init__(self):
+        self.ready = asyncio.Event()
+        self.codec: Optional[ParamCodec] = None
+        self._params: Dict[str, float] = {}
+        self._look_at: Optional[Tuple[float, float]] = None
+
+        self.received = 0    # Frames read from the socket
+        self.coalesced = 0   # Values overwritten before they were applied
+        self.rejected = 0    # Invalid or unsupported frames
+        self.applied = 0     # Merged updates handed to the sprite
+
+    def add_params(self, params: Dict[str, float]):
+        values = {str(param_id): float(value) for param_id, value in params.items()}
+        pending = self._params
+        for param_id, value in values.items():
+            if param_id in pending:
+                self.coalesced += 1  # 🚨 旧值尚未应用就被覆盖：直接丢弃，不排队
+            pending[param_id] = value
+        self.ready.set()
+
+    def set_look_at(self, x: float, y: float):
+        if self._look_at is not None:
+            self.coalesced += 1
+        self._look_at = (float(x), float(y))
+        self.ready.set()
+
+    def take(self) -> Tuple[Dict[str, float], Optional[Tuple[float, float]]]:
+        """Pending update (and reset); counts as one apply"""
+        params, look_at = self._params, self._look_at
+        self._params, self._look_at = {}, None
+        self.ready.clear()
+        if params or look_at:
+            self.applied += 1
+        return params, look_at
+
+    def merge(self, message) -> bool:
+        """Merge one received frame; False if it was rejected"""
+        self.received += 1
+        try:
+            if isinstance(message, bytes):
+                return self._merge_binary(message)
+            data = message if isinstance(message, dict) else json.loads(message)
+            msg_type = data.get("type")
+            msg_data = data.get("data", {})
+            if msg_type == "parameter_batch":
+                self.add_params(msg_data.get("params", {}))
+            elif msg_type == "parameter":
+                param_id = msg_data.get("id", msg_data.get("param_id"))
+                if not param_id:
+                    raise ValueError("parameter without id")
+                self.add_params({param_id: msg_data.get("value", 0.0)})
+            elif msg_type == "look_at":
+                self.set_look_at(msg_data.get("x", 0.0), msg_data.get("y", 0.0))
+            elif msg_type == "binary_negotiate":
+                params = msg_data.get("params")
+                if not isinstance(params, list) or not params:
+                    raise ValueError("binary_negotiate requires a non-empty 'params' list")
+                self.codec = ParamCodec(params)
+            else:
+                raise ValueError(f"{msg_type} is not accepted on the stream endpoint")
+            return True
+        except (ValueError, TypeError, AttributeError, struct.error):
+            self.rejected += 1
+            return False
+
+    def _merge_binary(self, frame: bytes) -> bool:
+        kind = wire_format.frame_kind(frame)
+        if kind == wire_format.KIND_PARAMETER_BATCH and self.codec is not None:
+            self.add_params(self.codec.decode_parameter_batch(frame))
+        elif kind == wire_format.KIND_LOOK_AT:
+            self.set_look_at(*wire_format.decode_look_at(frame))
+        else:
+            raise WireFormatError(f"Unsupported stream frame kind: {kind}")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "applied": self.applied,
+        }
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Thread Handoff - Fire-and-forget calls from any thread into the asyncio loop
+
+Producers (Qt main thread, TTS threads) append (callback, args) to a bounded
+deque and return immediately; they never wait on the event loop or on
+network I/O. deque.append / popleft are atomic, so the producer side takes
+no lock. The loop is woken with a single call_soon_threadsafe per burst and
+runs every pending callback in order.
+
+When the queue is full, or the loop is not running yet, the call is dropped
+and counted instead of blocking.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from loguru import logger
+
+
+class ThreadHandoff:
+    """Bounded cross-thread handoff queue into an asyncio event loop"""
+
+    def __init__(self, maxsize: int = 256, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.maxsize = maxsize
+        self.loop = loop
+        self._queue = deque()
+        self._scheduled = False
+
+        # Counters
+        self.posted = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.latency_last_ms = 0.0
+        self.latency_max_ms = 0.0
+        self._latency_total = 0.0
+
+        # Optional per-delivery latency observer (seconds), e.g. a histogram
+        self.on_latency: Optional[Callable[[float], None]] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Bind to the event loop that runs the callbacks"""
+        self.loop = loop
+
+    def post(self, callback: Callable, *args) -> bool:
+        """Queue callback(*args) to run on the loop; never blocks. Returns False if dropped."""
+        loop = self.loop
+        if loop is None or loop.is_closed() or len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            return False
+
+        self._queue.append((callback, args, time.monotonic()))
+        self.posted += 1
+
+        if not self._scheduled:
+            self._scheduled = True
+            try:
+                loop.call_soon_threadsafe(self._drain)
+            except RuntimeError:
+                # Loop closed between the check and the call
+                self._scheduled = False
+                self._queue.clear()
+                self.dropped += 1
+                return False
+        return True
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        delivered = self.delivered
+        return {
+            "depth": len(self._queue),
+            "posted": self.posted,
+            "delivered": delivered,
+            "dropped": self.dropped,
+            "latency_last_ms": round(self.latency_last_ms, 3),
+            "latency_max_ms": round(self.latency_max_ms, 3),
+            "latency_avg_ms": round(self._latency_total / delivered, 3) if delivered else 0.0,
+        }
+
+    def _drain(self):
+        # Clear the flag first so a concurrent post() schedules a new drain
+        self._scheduled = False
+        queue = self._queue
+        while queue:
+            callback, args, posted_at = queue.popleft()
+            latency = time.monotonic() - posted_at
+            latency_ms = latency * 1000
+            self.latency_last_ms = latency_ms
+            if latency_ms > self.latency_max_ms:
+                self.latency_max_ms = latency_ms
+            self._latency_total += latency_ms
+            self.delivered += 1
+            if self.on_latency:
+                self.on_latency(latency)
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Handoff callback error: {e}")
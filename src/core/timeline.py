@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Timelines - Uploaded keyframe curves played back inside the render loop
+
+A controller uploads a named timeline once (parameter id -> keyframes) and
+then triggers it by name, so a choreographed animation costs one message
+instead of hundreds of jittery per-step writes.
+
+Keyframes are ``[t_ms, value]`` or ``[t_ms, value, interpolation]``; the
+interpolation applies to the segment from that keyframe to the next one:
+"linear" (default), "step", "ease_in", "ease_out" or "ease_in_out".
+
+Uploads are compiled once into flat arrays (times, values, per-segment
+easing); the render thread evaluates every playing timeline per frame with
+one bisect per curve.
+
+Uploads and play / stop requests come from any thread; evaluate() runs on
+the render thread only.
+"""
+
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, List, Mapping, Optional
+
+from src.core.parameter_animator import EASING_FUNCTIONS
+
+INTERPOLATION_STEP = "step"
+INTERPOLATIONS: Dict[str, Callable[[float], float]] = {
+    **EASING_FUNCTIONS,
+    INTERPOLATION_STEP: lambda t: 0.0,
+}
+DEFAULT_INTERPOLATION = "linear"
+
+MAX_TIMELINES = 64
+MAX_KEYFRAMES = 10_000  # Per timeline, across all curves
+
+
+class TimelineError(ValueError):
+    """Invalid timeline upload or unknown timeline name"""
+
+
+class Curve:
+    """Keyframes of one parameter, compiled for bisect evaluation"""
+
+    __slots__ = ("times", "values", "easings")
+
+    def __init__(self, keyframes: List[tuple]):
+        keyframes = sorted(keyframes, key=lambda k: k[0])
+        self.times = array("d", (k[0] for k in keyframes))
+        self.values = array("d", (k[1] for k in keyframes))
+        self.easings = [INTERPOLATIONS[k[2]] for k in keyframes]
+
+    def value_at(self, t: float) -> float:
+        times = self.times
+        i = bisect_right(times, t) - 1
+        if i < 0:
+            return self.values[0]
+        if i >= len(times) - 1:
+            return self.values[-1]
+        span = times[i + 1] - times[i]
+        start = self.values[i]
+        return start + (self.values[i + 1] - start) * self.easings[i]((t - times[i]) / span)
+
+
+class Timeline:
+    """A named set of parameter curves (times in seconds)"""
+
+    def __init__(self, name: str, curves: Mapping[str, Curve], loop: bool = False):
+        self.name = name
+        self.curves = dict(curves)
+        self.loop = loop
+        self.duration = max((curve.times[-1] for curve in self.curves.values()), default=0.0)
+        self.keyframes = sum(len(curve.times) for curve in self.curves.values())
+
+    def values_at(self, t: float) -> Dict[str, float]:
+        return {param_id: curve.value_at(t) for param_id, curve in self.curves.items()}
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "parameters": sorted(self.curves),
+            "keyframes": self.keyframes,
+            "duration": round(self.duration * 1000),
+            "loop": self.loop,
+        }
+
+
+def compile_timeline(name: str, curves: Mapping[str, list], loop: bool = False) -> Timeline:
+    """Validate an uploaded timeline (keyframe times in ms) and compile it"""
+    if not name or not isinstance(name, str):
+        raise TimelineError("Timeline name is required")
+    if not curves or not isinstance(curves, Mapping):
+        raise TimelineError("Timeline needs at least one curve")
+
+    compiled = {}
+    total = 0
+    for param_id, keyframes in curves.items():
+        if not keyframes:
+            raise TimelineError(f"Curve {param_id} has no keyframes")
+        total += len(keyframes)
+        if total > MAX_KEYFRAMES:
+            raise TimelineError(f"Timeline exceeds {MAX_KEYFRAMES} keyframes")
+        parsed = []
+        for keyframe in keyframes:
+            try:
+                t_ms, value = float(keyframe[0]), float(keyframe[1])
+                interpolation = keyframe[2] if len(keyframe) > 2 else DEFAULT_INTERPOLATION
+            except (TypeError, ValueError, IndexError, KeyError):
+                raise TimelineError(f"Invalid keyframe for {param_id}: {keyframe!r}") from None
+            if not (math.isfinite(t_ms) and math.isfinite(value)):
+                raise TimelineError(f"Non-finite keyframe for {param_id}: {keyframe!r}")
+            if t_ms < 0:
+                raise TimelineError(f"Negative keyframe time for {param_id}: {t_ms}")
+            if interpolation not in INTERPOLATIONS:
+                raise TimelineError(f"Unknown interpolation: {interpolation} (expected one of {sorted(INTERPOLATIONS)})")
+            parsed.append((t_ms / 1000.0, value, interpolation))
+        compiled[param_id] = Curve(parsed)
+    return Timeline(name, compiled, loop)
+
+
+class _Playback:
+    __slots__ = ("timeline", "started", "loop", "speed")
+
+    def __init__(self, timeline: Timeline, started: float, loop: bool, speed: float):
+        self.timeline = timeline
+        self.started = started
+        self.loop = loop
+        self.speed = speed
+
+
+class TimelinePlayer:
+    """Timeline registry + render-thread playback"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timelines: Dict[str, Timeline] = {}
+        self._requests: List[tuple] = []               # ("play", playback) / ("stop", name or None)
+        self._playing: Dict[str, _Playback] = {}       # Render thread only
+
+        # Statistics (read without lock, approximate is fine)
+        self.started = 0
+        self.finished = 0
+
+    # === Any thread ===
+    def upload(self, timeline: Timeline):
+        """Add or replace a timeline (a playing copy keeps its old curves until restarted)"""
+        with self._lock:
+            if timeline.name not in self._timelines and len(self._timelines) >= MAX_TIMELINES:
+                raise TimelineError(f"Too many timelines (max {MAX_TIMELINES})")
+            self._timelines[timeline.name] = timeline
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            return self._timelines.pop(name, None) is not None
+
+    def get(self, name: str) -> Optional[Timeline]:
+        return self._timelines.get(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._timelines)
+
+    def play(self, name: str, loop: Optional[bool] = None, speed: float = 1.0) -> Timeline:
+        """Start (or restart) a timeline from the beginning; returns it"""
+        if speed <= 0:
+            raise TimelineError("speed must be positive")
+        with self._lock:
+            timeline = self._timelines.get(name)
+            if timeline is None:
+                raise TimelineError(f"Unknown timeline: {name}")
+            playback = _Playback(timeline, time.monotonic(), timeline.loop if loop is None else loop, speed)
+            self._requests.append(("play", playback))
+        return timeline
+
+    def stop(self, name: Optional[str] = None):
+        """Stop one timeline, or all of them (values stay where they are)"""
+        with self._lock:
+            self._requests.append(("stop", name))
+
+    # === Render thread ===
+    def evaluate(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Parameter values of every playing timeline at ``now``"""
+        if not self._requests and not self._playing:
+            return {}
+        now = time.monotonic() if now is None else now
+        if self._requests:
+            with self._lock:
+                requests, self._requests = self._requests, []
+            for action, arg in requests:
+                if action == "play":
+                    self._playing[arg.timeline.name] = arg
+                    self.started += 1
+                elif arg is None:
+                    self._playing.clear()
+                else:
+                    self._playing.pop(arg, None)
+
+        values = {}
+        for name, playback in list(self._playing.items()):
+            timeline = playback.timeline
+            t = (now - playback.started) * playback.speed
+            if t >= timeline.duration:
+                if playback.loop and timeline.duration > 0:
+                    t %= timeline.duration
+                else:
+                    t = timeline.duration
+                    del self._playing[name]
+                    self.finished += 1
+            values.update(timeline.values_at(t))
+        return values
+
+    def playing(self) -> List[str]:
+        return list(self._playing)
+
+    def stats(self) -> dict:
+        return {
+            "timelines": len(self._timelines),
+            "playing": len(self._playing),
+            "started": self.started,
+            "finished": self.finished,
+        }
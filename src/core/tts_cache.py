@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+TTS Cache - Persistent synthesis results with precomputed lip-sync envelopes
+
+Most lines Sherry says come from fixed pools (quotes, touch reactions), yet
+every speak() used to synthesize from scratch: a network round trip plus
+ffprobe (duration) and ffmpeg (amplitude analysis). The cache stores, per
+(provider, voice, rate, pitch, text):
+
+    <key>.<ext>   the audio file
+    <key>.json    duration, sample rate, amplitude envelope, the key fields
+
+under ~/.sherry/tts_cache, capped at ``max_bytes`` with least-recently-used
+eviction (the access time is the metadata file's mtime, so LRU order
+survives restarts).
+
+``get_or_create()`` shares one in-flight synthesis between concurrent
+identical requests, also across threads / event loops.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from loguru import logger
+
+DEFAULT_CACHE_DIR = Path.home() / ".sherry" / "tts_cache"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+_RETRY = object()  # In-flight result when the owning request was cancelled
+_CACHE_FILE = re.compile(r"^[0-9a-f]{32}\.")  # <key>.<ext>, <key>.json and their .tmp files
+
+
+@dataclass
+class CachedSpeech:
+    """One synthesized line, ready to play"""
+    audio_path: str
+    duration_ms: float
+    sample_rate: int
+    amplitudes: List[float] = field(default_factory=list)  # Lip-sync envelope (AudioAnalyzer frames)
+    cached: bool = False                                   # True if served from the cache
+
+
+def cache_key(provider: str, voice: Optional[str], rate: Optional[str], pitch: Optional[str], text: str) -> str:
+    """Stable key of one synthesis request"""
+    raw = json.dumps([provider, voice, rate, pitch, text], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+class TTSCache:
+    """Size-capped on-disk LRU of synthesized speech (thread-safe)"""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()   # key -> bytes on disk, oldest first
+        self._bytes = 0
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0      # Requests that joined an in-flight synthesis
+        self.evictions = 0
+        self._load_index()
+
+    # === Index ===
+    def _load_index(self):
+        # 🚨 只处理缓存自己的文件：目录可能是用户指定的已有目录（~、/tmp ...）
+        own_files = [path for path in self.root.iterdir() if _CACHE_FILE.match(path.name)]
+        entries = []
+        for meta_path in own_files:
+            if meta_path.suffix != ".json":
+                continue
+            try:
+                meta = json.loads(meta_path.read_text())
+                audio = self.root / meta["audio"]
+                size = meta_path.stat().st_size + audio.stat().st_size
+                entries.append((meta_path.stat().st_mtime, meta_path.stem, size))
+            except (OSError, ValueError, KeyError):
+                self._remove_files(meta_path.stem)  # Half-written or orphaned entry
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._bytes += size
+        for path in own_files:
+            if path.name.split(".", 1)[0] not in self._entries:
+                try:
+                    path.unlink()  # Temp file or audio without metadata (interrupted put)
+                except OSError:
+                    pass
+        if entries:
+            logger.info(f"🗃️ TTS cache: {len(entries)} entries, {self._bytes / 2**20:.1f} MB in {self.root}")
+        self._evict()
+
+    def _remove_files(self, key: str):
+        for path in self.root.glob(f"{key}.*"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop least recently used entries until under max_bytes (caller holds no lock)"""
+        while True:
+            with self._lock:
+                if self._bytes <= self.max_bytes or not self._entries:
+                    return
+                key, size = next(iter(self._entries.items()))
+                if key == keep:
+                    if len(self._entries) == 1:
+                        return
+                    self._entries.move_to_end(key)
+                    continue
+                del self._entries[key]
+                self._bytes -= size
+                self.evictions += 1
+            self._remove_files(key)
+
+    # === Lookup / store ===
+    def get(self, key: str) -> Optional[CachedSpeech]:
+        """Cached speech for ``key`` (marks it as recently used), or None"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        meta_path = self.root / f"{key}.json"
+        try:
+            meta = json.loads(meta_path.read_text())
+            audio = self.root / meta["audio"]
+            if not audio.exists():
+                raise FileNotFoundError(audio)
+            os.utime(meta_path)  # Persist LRU order
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"TTS cache entry {key} unreadable: {e}")
+            self.discard(key)
+            return None
+        return CachedSpeech(str(audio), meta["duration_ms"], meta["sample_rate"], meta.get("amplitudes", []), True)
+
+    def put(self, key: str, audio_path: str, duration_ms: float, sample_rate: int,
+            amplitudes: List[float], move: bool = True, **info) -> CachedSpeech:
+        """Store a synthesized file (moved into the cache unless ``move=False``); returns the cached copy"""
+        suffix = Path(audio_path).suffix or ".audio"
+        audio = self.root / f"{key}{suffix}"
+        tmp = audio.with_name(f"{audio.name}.tmp")
+        if move:
+            shutil.move(audio_path, tmp)
+        else:
+            shutil.copyfile(audio_path, tmp)
+        os.replace(tmp, audio)
+
+        meta = {
+            "audio": audio.name,
+            "duration_ms": duration_ms,
+            "sample_rate": sample_rate,
+            "amplitudes": [round(a, 4) for a in amplitudes],
+            "created": time.time(),
+            **info,
+        }
+        meta_path = self.root / f"{key}.json"
+        tmp = meta_path.with_name(f"{meta_path.name}.tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False))
+        os.replace(tmp, meta_path)  # Metadata last: an entry exists only once complete
+
+        size = audio.stat().st_size + meta_path.stat().st_size
+        with self._lock:
+            self._bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+        self._evict(keep=key)
+        return CachedSpeech(str(audio), duration_ms, sample_rate, list(amplitudes))
+
+    def discard(self, key: str):
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._bytes -= size
+        self._remove_files(key)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        for key in keys:
+            self._remove_files(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    # === Synthesis ===
+    async def get_or_create(self, key: str,
+                            create: Callable[[], Awaitable[Optional[CachedSpeech]]]) -> Optional[CachedSpeech]:
+        """
+        Cached speech for ``key``, or the result of ``create()`` (stored by the
+        caller through put()). Concurrent calls with the same key share one
+        ``create()``; None results are not cached. If the owning request is
+        cancelled, a waiting one takes over.
+        """
+        while True:
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            with self._lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = concurrent.futures.Future()
+            if owner:
+                break
+            # 🚨 同一句话正在合成：等待同一个结果，不再重复请求
+            self.shared += 1
+            result = await asyncio.wrap_future(future)
+            if result is not _RETRY:
+                return result
+
+        self.misses += 1
+        try:
+            result = await create()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+        }
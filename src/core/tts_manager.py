@@ -10,17 +10,24 @@ import asyncio
 import tempfile
 import subprocess
 import wave
-import struct
 import numpy as np
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, Callable, List, Dict, Any
+from typing import Optional, Callable, List, Dict, Any, Tuple, AsyncIterator
 from dataclasses import dataclass
 from concurrent.futures import ThreadPoolExecutor
 
 from PyQt6.QtCore import QObject, pyqtSignal, QThread, QTimer
 from loguru import logger
 
+from src.core.audio_sink import default_sink
+from src.core.tts_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, CachedSpeech, TTSCache, cache_key
+from src.core.tts_stream import (
+    EDGE_MP3_BITRATE, HAS_EDGE_TTS, PCM_SAMPLE_RATE, RecordedStream, StreamingAmplitude,
+    StreamDecodeError, amplitude_envelope, can_decode_compressed, decode_stream, edge_tts_chunks, resample_pcm,
+    split_sentences,
+)
+
 
 def is_apple_silicon() -> bool:
     """Check if running on Apple Silicon"""
@@ -56,6 +63,18 @@ class BaseTTSProvider(ABC):
         """Check if provider is available"""
         pass
     
+    def cache_fields(self, voice_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """Settings that change the audio (part of the TTS cache key)"""
+        return {"voice": voice_id, "rate": None, "pitch": None}
+    
+    def supports_streaming(self) -> bool:
+        """True if stream() yields audio chunks while synthesizing"""
+        return False
+    
+    def stream(self, text: str, voice_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Encoded audio chunks as they are synthesized (see tts_stream)"""
+        raise NotImplementedError(f"{self.name} does not stream")
+    
     async def warmup(self):
         """Warm up the provider (optional)"""
         pass
@@ -74,10 +93,16 @@ class EdgeTTSProvider(BaseTTSProvider):
         self.voice = voice or self.DEFAULT_VOICE
         self.rate = rate
         self.pitch = pitch
+        # 🚨 进程内模式（已安装 edge_tts 包）：不再启动 CLI 解释器，音频分块流式到达
+        self.in_process = HAS_EDGE_TTS
         self._check_edge_tts()
     
     def _check_edge_tts(self):
         """Check if edge-tts is installed"""
+        if self.in_process:
+            self._initialized = True
+            logger.info("✅ EdgeTTS provider initialized (in-process streaming)")
+            return
         try:
             subprocess.run(["edge-tts", "--version"], 
                          capture_output=True, check=True)
@@ -90,6 +115,15 @@ class EdgeTTSProvider(BaseTTSProvider):
     def is_available(self) -> bool:
         return self._initialized
     
+    def cache_fields(self, voice_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        return {"voice": voice_id or self.voice, "rate": self.rate, "pitch": self.pitch}
+    
+    def supports_streaming(self) -> bool:
+        return self.in_process and can_decode_compressed()  # The stream is MP3
+    
+    def stream(self, text: str, voice_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        return edge_tts_chunks(text, voice_id or self.voice, self.rate, self.pitch)
+    
     async def speak(self, text: str, voice_id: Optional[str] = None) -> TTSResult:
         """Generate audio using edge-tts"""
         if not self._initialized:
@@ -109,6 +143,16 @@ class EdgeTTSProvider(BaseTTSProvider):
             output_path = f.name
         
         try:
+            if self.in_process:
+                size = 0
+                with open(output_path, "wb") as f:
+                    async for chunk in self.stream(text, voice_id):
+                        f.write(chunk)
+                        size += len(chunk)
+                if not size:
+                    raise Exception("EdgeTTS returned no audio")
+                return TTSResult(output_path, text, size * 8 * 1000 / EDGE_MP3_BITRATE, 24000, True)
+            
             # Build edge-tts command
             cmd = [
                 "edge-tts",
@@ -170,8 +214,8 @@ class EdgeTTSProvider(BaseTTSProvider):
             duration_sec = float(result.stdout.strip())
             return duration_sec * 1000
         except:
-            # Fallback: estimate based on text length
-            return len(text) * 200  # ~200ms per character
+            # Fallback: Edge MP3 is constant bit rate
+            return os.path.getsize(audio_path) * 8 * 1000 / EDGE_MP3_BITRATE
 
 
 class ElevenLabsProvider(BaseTTSProvider):
@@ -194,6 +238,9 @@ class ElevenLabsProvider(BaseTTSProvider):
     def is_available(self) -> bool:
         return self._initialized
     
+    def cache_fields(self, voice_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        return {"voice": voice_id or self.voice_id, "rate": None, "pitch": None}
+    
     async def speak(self, text: str, voice_id: Optional[str] = None) -> TTSResult:
         """Generate audio using ElevenLabs API"""
         if not self._initialized:
@@ -413,8 +460,7 @@ class AudioAnalyzer:
                 
                 # Convert to numpy array
                 if sample_width == 2:
-                    fmt = f"{n_frames * n_channels}h"
-                    samples = np.array(struct.unpack(fmt, raw_data))
+                    samples = np.frombuffer(raw_data, dtype="<i2")
                 elif sample_width == 1:
                     samples = np.frombuffer(raw_data, dtype=np.uint8)
                     samples = (samples.astype(np.float32) - 128) / 128.0
@@ -426,22 +472,8 @@ class AudioAnalyzer:
                 if n_channels == 2:
                     samples = samples[::2]  # Take left channel
                 
-                # Calculate samples per frame
-                samples_per_frame = frame_rate // self.frame_rate
-                n_analysis_frames = len(samples) // samples_per_frame
-                
-                # Calculate amplitude for each frame
-                amplitudes = []
-                for i in range(n_analysis_frames):
-                    start = i * samples_per_frame
-                    end = start + samples_per_frame
-                    frame_samples = samples[start:end]
-                    
-                    # RMS amplitude
-                    rms = np.sqrt(np.mean(frame_samples.astype(np.float64) ** 2))
-                    # Normalize (16-bit audio max value is 32768)
-                    normalized = min(rms / 32768.0 * 8, 1.0)  # Scale up for better sensitivity
-                    amplitudes.append(normalized)
+                # RMS amplitude per frame, normalized (shared with the streaming analyzer)
+                amplitudes = amplitude_envelope(samples, frame_rate // self.frame_rate)
                 
                 # Clean up temp WAV if converted
                 if wav_path != audio_path and os.path.exists(wav_path):
@@ -504,11 +536,23 @@ class TTSManager(QObject):
         self.current_provider = self._select_provider(preferred_provider)
         self.audio_analyzer = AudioAnalyzer(frame_rate=30)
         
+        # 🚨 合成结果缓存：音频 + 口型包络持久化在 ~/.sherry/tts_cache，重复的台词毫秒级开口
+        # SHERRY_TTS_CACHE_MB=0 关闭；SHERRY_TTS_CACHE_DIR 改变位置
+        self.cache: Optional[TTSCache] = None
+        cache_mb = float(os.environ.get("SHERRY_TTS_CACHE_MB", DEFAULT_MAX_BYTES / 2**20))
+        if cache_mb > 0:
+            try:
+                self.cache = TTSCache(os.environ.get("SHERRY_TTS_CACHE_DIR") or DEFAULT_CACHE_DIR,
+                                      max_bytes=int(cache_mb * 2**20))
+            except OSError as e:
+                logger.warning(f"⚠️ TTS cache disabled: {e}")
+        
         # Playback state
         self._is_speaking = False
         self._current_audio_path: Optional[str] = None
         self._amplitude_data: List[float] = []
         self._current_frame = 0
+        self._playback_clock = None  # Sink currently playing: lip sync frames follow its position()
         
         # Playback timer
         self._playback_timer = QTimer(self)
@@ -517,6 +561,17 @@ class TTSManager(QObject):
         # Cleanup tracking
         self._temp_files: List[str] = []
         
+        # speak() calls currently synthesizing (background warmup yields to them)
+        self.live_synthesis = 0
+        
+        # 🚨 流式合成：provider 支持时音频分块到达即解码、分析、播放（首块即出声）
+        # 音频经进程内 sink 播放（见 audio_sink.py），口型按 sink 实际播放位置取帧
+        # 工厂返回 None（无声卡也无 ffplay）时退回整文件流程：每句起一个播放进程，口型按定时器计帧
+        self.stream_player_factory: Optional[Callable[[], Any]] = default_sink
+        self.stream_stats: Dict[str, Any] = {
+            "streams": 0, "failed": 0, "pipelined": 0, "last_first_chunk_ms": None, "last_first_sound_ms": None,
+        }
+        
         logger.info(f"🎙️ TTSManager initialized with provider: {self.current_provider.name}")
     
     def _select_provider(self, preferred: str) -> BaseTTSProvider:
@@ -554,6 +609,64 @@ class TTSManager(QObject):
         """Get list of available provider names"""
         return [name for name, p in self.providers.items() if p.is_available()]
     
+    def cache_key(self, text: str, voice_id: Optional[str] = None) -> str:
+        """TTS cache key of ``text`` with the current provider and voice settings"""
+        fields = self.current_provider.cache_fields(voice_id)
+        return cache_key(self.current_provider.name, fields["voice"], fields["rate"], fields["pitch"], text)
+    
+    async def synthesize(self, text: str, voice_id: Optional[str] = None) -> Tuple[TTSResult, List[float]]:
+        """
+        Audio + lip-sync envelope for ``text`` without playing it.
+        
+        Served from the TTS cache when possible; concurrent identical requests
+        share one synthesis. Cached audio is owned by the cache (not a temp file).
+        """
+        provider = self.current_provider
+        if self.cache is None:
+            result, amplitudes = await self._synthesize_uncached(provider, text, voice_id)
+            if result.audio_path:
+                self._temp_files.append(result.audio_path)
+            return result, amplitudes
+        
+        key = self.cache_key(text, voice_id)
+        outcome: List[TTSResult] = []
+        
+        async def create() -> Optional[CachedSpeech]:
+            result, amplitudes = await self._synthesize_uncached(provider, text, voice_id)
+            outcome.append(result)
+            if not result.success or not result.audio_path:
+                return None
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.audio_analyzer._executor,
+                    lambda: self.cache.put(key, result.audio_path, result.duration_ms, result.sample_rate,
+                                           amplitudes, provider=provider.name, text=text))
+            except OSError as e:
+                logger.warning(f"⚠️ TTS cache write failed: {e}")
+                self._temp_files.append(result.audio_path)
+                return CachedSpeech(result.audio_path, result.duration_ms, result.sample_rate, amplitudes)
+        
+        entry = await self.cache.get_or_create(key, create)
+        if entry is None:
+            if outcome:
+                return outcome[0], []
+            return TTSResult("", text, 0, 24000, False, "Shared TTS synthesis failed"), []
+        if entry.cached:
+            logger.info(f"🗃️ TTS cache hit: '{text[:30]}'")
+        result = TTSResult(entry.audio_path, text, entry.duration_ms, entry.sample_rate, True)
+        return result, entry.amplitudes
+    
+    async def _synthesize_uncached(self, provider: BaseTTSProvider, text: str,
+                                   voice_id: Optional[str]) -> Tuple[TTSResult, List[float]]:
+        """Provider synthesis + amplitude analysis (analysis runs off the event loop)"""
+        result = await provider.speak(text, voice_id)
+        if not result.success or not result.audio_path:
+            return result, []
+        logger.info("🔊 Analyzing audio for lip sync...")
+        amplitudes = await asyncio.get_running_loop().run_in_executor(
+            self.audio_analyzer._executor, self.audio_analyzer.analyze_amplitude, result.audio_path)
+        return result, amplitudes
+    
     async def speak(self, text: str, voice_id: Optional[str] = None) -> TTSResult:
         """
         Generate and play TTS audio with lip sync
@@ -575,8 +688,28 @@ class TTSManager(QObject):
         self.tts_started.emit(text)
         
         try:
-            # Generate audio
-            result = await self.current_provider.speak(text, voice_id)
+            sentences = split_sentences(text)
+            if len(sentences) > 1:
+                result = await self._speak_sentences(text, sentences, voice_id)
+                if not result.success:
+                    self.tts_error.emit(result.error or "Unknown TTS error")
+                return result
+            
+            provider = self.current_provider
+            if provider.supports_streaming() and not self._is_cached(text, voice_id):
+                player = self.stream_player_factory() if self.stream_player_factory else None
+                if player is not None:
+                    result = await self._speak_streaming(provider, player, text, voice_id)
+                    if not result.success:
+                        self.tts_error.emit(result.error or "Unknown TTS error")
+                    return result
+            
+            # Generate audio (or take it and its lip-sync envelope from the cache)
+            self.live_synthesis += 1
+            try:
+                result, amplitudes = await self.synthesize(text, voice_id)
+            finally:
+                self.live_synthesis -= 1
             
             if not result.success:
                 self.tts_error.emit(result.error or "Unknown TTS error")
@@ -584,14 +717,9 @@ class TTSManager(QObject):
                 self.tts_finished.emit()
                 return result
             
-            # Track temp file for cleanup
             if result.audio_path:
-                self._temp_files.append(result.audio_path)
                 self._current_audio_path = result.audio_path
-                
-                # Analyze audio for lip sync
-                logger.info("🔊 Analyzing audio for lip sync...")
-                self._amplitude_data = self.audio_analyzer.analyze_amplitude(result.audio_path)
+                self._amplitude_data = amplitudes
                 self.audio_amplitude.emit(self._amplitude_data)
             
             # Play audio
@@ -613,6 +741,259 @@ class TTSManager(QObject):
                 error=str(e)
             )
     
+    def _is_cached(self, text: str, voice_id: Optional[str]) -> bool:
+        return self.cache is not None and self.cache_key(text, voice_id) in self.cache
+    
+    async def _speak_streaming(self, provider: BaseTTSProvider, player, text: str,
+                               voice_id: Optional[str]) -> TTSResult:
+        """Stream, play and cache one line (a concurrent identical synthesis is shared instead)"""
+        streamed: List[TTSResult] = []
+        entry: Optional[CachedSpeech] = None
+        
+        async def create() -> Optional[CachedSpeech]:
+            result, amplitudes = await self._stream_and_play(provider, player, text, voice_id)
+            streamed.append(result)
+            if not result.success:
+                return None
+            if self.cache is not None:
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(
+                        self.audio_analyzer._executor,
+                        lambda: self.cache.put(self.cache_key(text, voice_id), result.audio_path, result.duration_ms,
+                                               result.sample_rate, amplitudes, provider=provider.name, text=text))
+                except OSError as e:
+                    logger.warning(f"⚠️ TTS cache write failed: {e}")
+            self._temp_files.append(result.audio_path)
+            return None
+        
+        self.live_synthesis += 1
+        try:
+            if self.cache is None:
+                await create()
+            else:
+                entry = await self.cache.get_or_create(self.cache_key(text, voice_id), create)
+        finally:
+            self.live_synthesis -= 1
+        
+        if streamed:
+            result = streamed[0]
+            if entry is not None:
+                result.audio_path = entry.audio_path  # Moved into the cache
+            return result
+        
+        # 同一句话已由其他请求（如预合成）合成：播放共享的结果
+        await self._close_sink(player)
+        if entry is None:
+            self._is_speaking = False
+            self.tts_finished.emit()
+            return TTSResult("", text, 0, PCM_SAMPLE_RATE, False, "Shared TTS synthesis failed")
+        self._current_audio_path = entry.audio_path
+        self._amplitude_data = entry.amplitudes
+        self.audio_amplitude.emit(self._amplitude_data)
+        await self._play_audio(entry.audio_path)
+        return TTSResult(entry.audio_path, text, entry.duration_ms, entry.sample_rate, True)
+    
+    async def _stream_and_play(self, provider: BaseTTSProvider, player, text: str,
+                               voice_id: Optional[str]) -> Tuple[TTSResult, List[float]]:
+        """
+        Chunks → decode → envelope → player as they arrive; the encoded stream is saved to a temp file
+
+        If the sink fails (no output device, device unplugged mid-line) the
+        rest of the stream is still received, and the saved file is played
+        with the system player instead.
+        """
+        loop = asyncio.get_running_loop()
+        requested = loop.time()
+        encoded = bytearray()
+        info: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        analyzer: Optional[StreamingAmplitude] = None
+        sample_rate = PCM_SAMPLE_RATE
+        error = None
+        sink_error: Optional[Exception] = None
+        audio_path = ""
+        
+        self._amplitude_data = []
+        self._current_frame = 0
+        self._current_audio_path = None
+        
+        async def chunks():
+            async for chunk in provider.stream(text, voice_id):
+                timings.setdefault("first_chunk", loop.time() - requested)
+                encoded.extend(chunk)
+                yield chunk
+        
+        logger.info(f"🎙️ {provider.name}: streaming '{text[:30]}...'")
+        try:
+            async for pcm in decode_stream(chunks(), info):
+                if analyzer is None:
+                    sample_rate = info.get("sample_rate", PCM_SAMPLE_RATE)
+                    analyzer = StreamingAmplitude(sample_rate, self.audio_analyzer.frame_rate)
+                self._amplitude_data.extend(analyzer.feed(pcm))
+                if sink_error is not None:
+                    continue  # Keep receiving: the saved file is played instead
+                try:
+                    if "first_sound" not in timings:
+                        # 🚨 第一块解码完成即开始播放与口型同步，不等整句合成
+                        await player.start(sample_rate)
+                        timings["first_sound"] = loop.time() - requested
+                        self._set_lip_sync_timer(True, player)
+                    await player.write(pcm)
+                except Exception as e:  # PortAudioError (no device / unplugged), sink stalled, pipe closed
+                    sink_error = e
+                    await self._abandon_sink(player, e)
+            if analyzer is None:
+                raise RuntimeError("TTS stream returned no audio")
+            if sink_error is None:
+                try:
+                    await player.finish()
+                except Exception as e:
+                    sink_error = e
+                    await self._abandon_sink(player, e)
+            
+            fd, audio_path = tempfile.mkstemp(suffix=f".{info.get('format', 'mp3')}")
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            if sink_error is not None:
+                # 🚨 声卡不可用：整句已收完，改用系统播放器播放保存的文件（口型由定时器驱动）
+                timings.setdefault("first_sound", loop.time() - requested)
+                self._current_frame = 0
+                self._set_lip_sync_timer(True)
+                await self._play_file(audio_path)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"❌ TTS stream error: {e}")
+            if audio_path:
+                self._temp_files.append(audio_path)
+        finally:
+            await self._close_sink(player)
+            self._set_lip_sync_timer(False)
+            self.lip_sync_frame.emit(0.0)  # Close mouth
+            self._is_speaking = False
+            self.tts_finished.emit()
+        
+        stats = self.stream_stats
+        stats["streams"] += 1
+        if error is not None:
+            stats["failed"] += 1
+            return TTSResult("", text, 0, sample_rate, False, error), []
+        stats["last_first_chunk_ms"] = round(timings["first_chunk"] * 1000, 1)
+        stats["last_first_sound_ms"] = round(timings["first_sound"] * 1000, 1)
+        logger.info(f"🔊 First sound after {stats['last_first_sound_ms']} ms "
+                    f"(first chunk {stats['last_first_chunk_ms']} ms)")
+        
+        self.audio_amplitude.emit(self._amplitude_data)
+        duration_ms = analyzer.samples / sample_rate * 1000
+        return TTSResult(audio_path, text, duration_ms, sample_rate, True), list(self._amplitude_data)
+    
+    async def _speak_sentences(self, text: str, sentences: List[str], voice_id: Optional[str]) -> TTSResult:
+        """
+        🚨 分句流水线：第 N 句播放时合成并分析第 N+1 句，首句就绪即出声
+
+        With an audio sink the sentences are decoded into one continuous PCM
+        stream (gapless, one envelope computed over the whole stream); without
+        one each sentence file is played in turn while the lip sync timer keeps
+        running, resynced to the start of every sentence.
+        """
+        loop = asyncio.get_running_loop()
+        requested = loop.time()
+        player = self.stream_player_factory() if self.stream_player_factory else None
+        analyzer: Optional[StreamingAmplitude] = None
+        sample_rate = None
+        duration_ms = 0.0
+        played = 0
+        errors: List[str] = []
+        
+        self._amplitude_data = []
+        self._current_frame = 0
+        self._current_audio_path = None
+        
+        self.live_synthesis += 1
+        pending = loop.create_task(self.synthesize(sentences[0], voice_id))
+        try:
+            for index in range(len(sentences)):
+                result, amplitudes = await pending
+                pending = None
+                if index + 1 < len(sentences):
+                    pending = loop.create_task(self.synthesize(sentences[index + 1], voice_id))
+                if not result.success or not result.audio_path:
+                    errors.append(result.error or f"No audio for: {sentences[index][:20]}")
+                    continue
+                
+                if player is not None:
+                    info: Dict[str, Any] = {}
+                    other_rate = bytearray()  # This sentence's PCM if its rate differs from the stream's
+                    try:
+                        async for pcm in decode_stream(RecordedStream(result.audio_path, chunk_size=65536), info):
+                            # 🚨 采样率取解码输出（MP3 解码为 PCM_SAMPLE_RATE），不用 provider 报告的值
+                            if analyzer is None:
+                                sample_rate = info["sample_rate"]
+                                await player.start(sample_rate)
+                                analyzer = StreamingAmplitude(sample_rate, self.audio_analyzer.frame_rate)
+                                self.stream_stats["last_first_sound_ms"] = round((loop.time() - requested) * 1000, 1)
+                                self._set_lip_sync_timer(True, player)
+                            if info["sample_rate"] != sample_rate:
+                                other_rate += pcm
+                                continue
+                            # 包络在整条 PCM 流上连续计算：句子边界处不重置、不留空帧
+                            self._amplitude_data.extend(analyzer.feed(pcm))
+                            await player.write(pcm)
+                        if other_rate:
+                            pcm = resample_pcm(bytes(other_rate), info["sample_rate"], sample_rate)
+                            self._amplitude_data.extend(analyzer.feed(pcm))
+                            await player.write(pcm)
+                    except Exception as e:  # Not decodable in-process, or the sink failed (to open / mid-line)
+                        if analyzer is None and isinstance(e, StreamDecodeError):
+                            logger.debug(f"Audio sink unavailable ({e}): playing sentence files")
+                            await self._close_sink(player)
+                        else:
+                            await self._abandon_sink(player, e)
+                        player = None
+                        if played:
+                            self._set_lip_sync_timer(True)  # 本句从头用系统播放器重放，口型改由定时器驱动
+                if player is None:
+                    if not played:
+                        self.stream_stats["last_first_sound_ms"] = round((loop.time() - requested) * 1000, 1)
+                        self._set_lip_sync_timer(True)
+                    self._current_frame = len(self._amplitude_data)  # Resync to this sentence
+                    self._amplitude_data.extend(amplitudes)
+                    await self._play_file(result.audio_path)
+                played += 1
+                duration_ms += result.duration_ms
+            if player is not None and analyzer is not None:
+                await player.finish()
+        except Exception as e:
+            errors.append(str(e))
+            logger.error(f"❌ TTS sentence pipeline error: {e}")
+        finally:
+            self.live_synthesis -= 1
+            if pending is not None:
+                pending.cancel()
+            if player is not None:
+                await self._close_sink(player)
+            self._set_lip_sync_timer(False)
+            self.lip_sync_frame.emit(0.0)  # Close mouth
+            self._is_speaking = False
+            self.tts_finished.emit()
+        
+        self.stream_stats["pipelined"] += 1
+        if not played:
+            return TTSResult("", text, 0, PCM_SAMPLE_RATE, False, "; ".join(errors) or "TTS failed")
+        if errors:
+            logger.warning(f"⚠️ {len(errors)} of {len(sentences)} sentences failed: {errors[0]}")
+        logger.info(f"🗣️ Spoke {len(sentences)} sentences, first sound after "
+                    f"{self.stream_stats['last_first_sound_ms']} ms")
+        return TTSResult("", text, duration_ms, sample_rate or PCM_SAMPLE_RATE, True)
+    
+    def _set_lip_sync_timer(self, running: bool, clock=None):
+        """Start / stop the 30 fps lip sync timer (it lives in the main thread); ``clock`` is the playing sink"""
+        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
+        self._playback_clock = clock if running else None
+        if running:
+            QMetaObject.invokeMethod(self._playback_timer, "start", Qt.ConnectionType.QueuedConnection, Q_ARG(int, 33))
+        else:
+            QMetaObject.invokeMethod(self._playback_timer, "stop", Qt.ConnectionType.QueuedConnection)
+    
     async def _play_audio(self, audio_path: str):
         """Play audio file with lip sync"""
         if not audio_path or not os.path.exists(audio_path):
@@ -622,13 +1003,61 @@ class TTSManager(QObject):
             return
         
         self._current_frame = 0
+        sink = self.stream_player_factory() if self.stream_player_factory else None
         
-        # Start lip sync timer (30fps = 33ms per frame) - MUST BE IN MAIN THREAD
-        if self._amplitude_data:
-            from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-            QMetaObject.invokeMethod(self._playback_timer, "start", Qt.ConnectionType.QueuedConnection, Q_ARG(int, 33))
-        
-        # Play audio using system player
+        try:
+            if sink is None or not await self._play_through_sink(sink, audio_path):
+                # Start lip sync timer (30fps = 33ms per frame) - MUST BE IN MAIN THREAD
+                self._current_frame = 0
+                if self._amplitude_data:
+                    self._set_lip_sync_timer(True)
+                await self._play_file(audio_path)
+        finally:
+            # Stop lip sync
+            self._set_lip_sync_timer(False)
+            self.lip_sync_frame.emit(0.0)  # Close mouth
+            self._is_speaking = False
+            self.tts_finished.emit()
+    
+    async def _play_through_sink(self, sink, audio_path: str) -> bool:
+        """Decode a file into the in-process sink; False if the sink failed (then use _play_file)"""
+        info: Dict[str, Any] = {}
+        started = False
+        try:
+            async for pcm in decode_stream(RecordedStream(audio_path, chunk_size=65536), info):
+                if not started:
+                    await sink.start(info.get("sample_rate", PCM_SAMPLE_RATE))
+                    started = True
+                    if self._amplitude_data:
+                        self._set_lip_sync_timer(True, sink)
+                await sink.write(pcm)
+            if started:
+                await sink.finish()
+        except Exception as e:  # StreamDecodeError, OSError, PortAudioError (device busy / unplugged / stalled)
+            log = logger.debug if isinstance(e, StreamDecodeError) and not started else logger.warning
+            log(f"⚠️ Audio sink cannot play {audio_path}: {e}")
+            self._set_lip_sync_timer(False)
+            return False
+        finally:
+            await self._close_sink(sink)
+        return started
+    
+    async def _abandon_sink(self, sink, error: Exception):
+        """The sink failed (no device, unplugged, stalled): stop its lip sync clock and close it"""
+        logger.warning(f"⚠️ Audio sink failed ({error}): falling back to the system player")
+        self._set_lip_sync_timer(False)
+        await self._close_sink(sink)
+    
+    @staticmethod
+    async def _close_sink(sink):
+        """Close a sink; one that already failed may raise again here"""
+        try:
+            await sink.close()
+        except Exception as e:
+            logger.debug(f"Audio sink close failed: {e}")
+    
+    async def _play_file(self, audio_path: str):
+        """Play audio file using system player (returns when playback ends)"""
         try:
             if is_apple_silicon() or os.uname().sysname == 'Darwin':
                 # macOS: use afplay
@@ -649,19 +1078,17 @@ class TTSManager(QObject):
                 
         except Exception as e:
             logger.error(f"❌ Audio playback error: {e}")
-        finally:
-            # Stop lip sync
-            from PyQt6.QtCore import QMetaObject, Qt
-            QMetaObject.invokeMethod(self._playback_timer, "stop", Qt.ConnectionType.QueuedConnection)
-            self.lip_sync_frame.emit(0.0)  # Close mouth
-            self._is_speaking = False
-            self.tts_finished.emit()
     
     def _on_playback_frame(self):
         """Called every frame during audio playback for lip sync"""
         if not self._amplitude_data:
             return
         
+        # 🚨 有播放时钟时按实际播放位置取帧（定时器抖动、设备缓冲都不会让口型漂移）
+        clock = self._playback_clock
+        if clock is not None:
+            self._current_frame = int(clock.position() * self.audio_analyzer.frame_rate)
+        
         if self._current_frame < len(self._amplitude_data):
             amplitude = self._amplitude_data[self._current_frame]
             
@@ -678,7 +1105,8 @@ class TTSManager(QObject):
                 mouth_open = min(normalized ** 1.8 * 1.2, 1.0)
                 
             self.lip_sync_frame.emit(mouth_open)
-            self._current_frame += 1
+            if clock is None:
+                self._current_frame += 1
         else:
             # End of audio
             self.lip_sync_frame.emit(0.0)
@@ -691,10 +1119,20 @@ class TTSManager(QObject):
         """Check if currently speaking"""
         return self._is_speaking
     
+    def stats(self) -> dict:
+        """Provider and cache state (for get_status)"""
+        return {
+            "provider": self.current_provider.name,
+            "speaking": self._is_speaking,
+            "streaming": {**self.stream_stats, "available": self.current_provider.supports_streaming()},
+            "cache": self.cache.stats() if self.cache else None,
+        }
+    
     def stop(self):
         """Stop current TTS playback"""
         from PyQt6.QtCore import QMetaObject, Qt
         QMetaObject.invokeMethod(self._playback_timer, "stop", Qt.ConnectionType.QueuedConnection)
+        self._playback_clock = None
         self._is_speaking = False
         self.lip_sync_frame.emit(0.0)
         self.tts_finished.emit()
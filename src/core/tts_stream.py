@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+TTS Stream - Chunked synthesis → decode → lip-sync analysis → playback
+
+The file pipeline waits for the whole synthesized file, probes its duration,
+analyzes it and only then starts the player, so time-to-first-sound grows
+with the sentence. Here every stage consumes the previous one chunk by chunk:
+
+    source (edge-tts websocket / recorded stream)
+      → decode_stream()       encoded chunks → s16le mono PCM
+      → StreamingAmplitude    PCM → lip-sync envelope frames (same scale as AudioAnalyzer)
+      → audio sink            PCM → speaker (src/core/audio_sink.py; ffplay pipe as fallback)
+
+Sources:
+- ``edge_tts_chunks()``: in-process edge-tts (optional ``pip install edge-tts``),
+  no CLI interpreter start, MP3 chunks as they arrive from the service.
+- ``RecordedStream``: replays a recorded stream (or any audio bytes) with a
+  simulated first-chunk latency and chunk pacing, for offline tests.
+  ``record_stream()`` captures a live stream to a file.
+
+Decoding: WAV streams are parsed in-process; anything else (Edge's MP3) goes
+through an ffmpeg pipe.
+"""
+
+import asyncio
+import shutil
+import struct
+import time
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, List, Optional, Union
+
+import numpy as np
+
+try:
+    import edge_tts
+    HAS_EDGE_TTS = True
+except ImportError:
+    HAS_EDGE_TTS = False
+
+PCM_SAMPLE_RATE = 24000        # Edge TTS output rate; decoders convert to this
+PCM_SAMPLE_WIDTH = 2           # s16le
+EDGE_MP3_BITRATE = 48000       # audio-24khz-48kbitrate-mono-mp3 (constant bit rate)
+AMPLITUDE_GAIN = 8             # AudioAnalyzer scale: rms / 32768 * 8, clipped to 1.0
+
+
+class StreamDecodeError(RuntimeError):
+    """Stream format not decodable here (e.g. MP3 without ffmpeg)"""
+
+
+def amplitude_envelope(samples: np.ndarray, samples_per_frame: int) -> List[float]:
+    """RMS per complete frame of 16-bit samples, normalized like AudioAnalyzer (0.0 - 1.0)"""
+    n_frames = len(samples) // samples_per_frame
+    if n_frames == 0:
+        return []
+    frames = samples[:n_frames * samples_per_frame].astype(np.float64).reshape(n_frames, samples_per_frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return np.minimum(rms / 32768.0 * AMPLITUDE_GAIN, 1.0).tolist()
+
+
+def wav_stream_header(sample_rate: int = PCM_SAMPLE_RATE, channels: int = 1) -> bytes:
+    """WAV header with unknown (maximum) length, for piping PCM to a player"""
+    byte_rate = sample_rate * channels * PCM_SAMPLE_WIDTH
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                    channels * PCM_SAMPLE_WIDTH, PCM_SAMPLE_WIDTH * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+# === Sentences ===
+# 🚨 分句：长文本按句合成，播放第 N 句时合成第 N+1 句（无 Qt 依赖，预热与无头服务器共用）
+SENTENCE_ENDINGS = set("。！？～!?；;…\n")
+CLAUSE_BREAKS = set("，,、：:")
+MIN_SENTENCE_CHARS = 3    # Pieces with fewer letters / characters are merged into a neighbour
+MAX_SENTENCE_CHARS = 80   # Longer sentences are split again at clause breaks
+
+
+def _speech_chars(text: str) -> int:
+    return sum(ch.isalnum() for ch in text)
+
+
+def _split_long(piece: str) -> List[str]:
+    parts = []
+    while len(piece) > MAX_SENTENCE_CHARS:
+        cut = max((i for i, ch in enumerate(piece[:MAX_SENTENCE_CHARS]) if ch in CLAUSE_BREAKS), default=-1)
+        if cut <= 0:
+            break
+        parts.append(piece[:cut + 1])
+        piece = piece[cut + 1:]
+    parts.append(piece)
+    return parts
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text at sentence boundaries (。！？～!?；…, newlines, ". ").
+    Trailing punctuation, closing quotes and emoji stay with their sentence;
+    very short pieces ("喵！") are merged into a neighbour.
+    """
+    pieces, current, i = [], "", 0
+    while i < len(text):
+        ch = text[i]
+        current += ch
+        i += 1
+        boundary = ch in SENTENCE_ENDINGS or (ch == "." and (i >= len(text) or not text[i].isalnum()))
+        if boundary:
+            while i < len(text) and not text[i].isalnum():
+                current += text[i]  # "！！", "～ 💜", "...", closing quotes
+                i += 1
+            pieces.append(current)
+            current = ""
+    pieces.append(current)
+
+    sentences: List[str] = []
+    for piece in pieces:
+        for part in _split_long(piece):
+            if not part.strip():
+                continue
+            if sentences and (_speech_chars(part) < MIN_SENTENCE_CHARS
+                              or _speech_chars(sentences[-1]) < MIN_SENTENCE_CHARS):
+                sentences[-1] += part
+            else:
+                sentences.append(part)
+    return [sentence.strip() for sentence in sentences]
+
+
+# === Sources ===
+async def edge_tts_chunks(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz") -> AsyncIterator[bytes]:
+    """MP3 chunks from the Edge TTS service, in-process"""
+    if not HAS_EDGE_TTS:
+        raise StreamDecodeError("edge-tts is not installed (pip install edge-tts)")
+    communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio" and chunk["data"]:
+            yield chunk["data"]
+
+
+class RecordedStream:
+    """Replays recorded audio bytes chunk by chunk (offline stand-in for a synthesis stream)"""
+
+    def __init__(self, source: Union[str, Path, bytes], chunk_size: int = 4096,
+                 first_chunk_delay: float = 0.0, chunk_interval: float = 0.0):
+        """
+        Args:
+            source: Recorded stream file (see record_stream) or the bytes themselves
+            chunk_size: Bytes per chunk
+            first_chunk_delay: Seconds before the first chunk (simulated service latency)
+            chunk_interval: Seconds between later chunks (simulated delivery rate)
+        """
+        self.data = source if isinstance(source, bytes) else Path(source).read_bytes()
+        self.chunk_size = chunk_size
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_interval = chunk_interval
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.first_chunk_delay
+        for offset in range(0, len(self.data), self.chunk_size):
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield self.data[offset:offset + self.chunk_size]
+            deadline += self.chunk_interval
+
+
+async def record_stream(chunks: AsyncIterable[bytes], path: Union[str, Path]) -> int:
+    """Save a live stream (e.g. edge_tts_chunks) for offline replay; returns its size"""
+    data = bytearray()
+    async for chunk in chunks:
+        data += chunk
+    Path(path).write_bytes(bytes(data))
+    return len(data)
+
+
+# === Decoding ===
+def can_decode_compressed() -> bool:
+    """True if MP3 (Edge) streams can be decoded here"""
+    return shutil.which("ffmpeg") is not None
+
+
+class WavStreamDecoder:
+    """Incremental WAV parser: PCM is returned as soon as the data chunk starts"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._in_data = False
+        self.sample_rate = PCM_SAMPLE_RATE
+        self.channels = 1
+
+    def feed(self, data: bytes) -> bytes:
+        """Mono s16le PCM decodable so far"""
+        if self._in_data:
+            return self._to_mono(data)
+        self._buffer += data
+        buffer = self._buffer
+        if len(buffer) < 12:
+            return b""
+        if buffer[:4] != b"RIFF" or buffer[8:12] != b"WAVE":
+            raise StreamDecodeError("Not a WAV stream")
+        offset = 12
+        while offset + 8 <= len(buffer):
+            chunk_id, size = buffer[offset:offset + 4], struct.unpack_from("<I", buffer, offset + 4)[0]
+            if chunk_id == b"data":
+                self._in_data = True
+                pcm = bytes(buffer[offset + 8:])
+                self._buffer = bytearray()
+                return self._to_mono(pcm)
+            if offset + 8 + size > len(buffer):
+                return b""  # Header chunk not complete yet
+            if chunk_id == b"fmt ":
+                fmt, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", buffer, offset + 8)
+                if fmt != 1 or bits != 16:
+                    raise StreamDecodeError(f"Unsupported WAV format (format {fmt}, {bits} bit)")
+                self.channels, self.sample_rate = channels, sample_rate
+            offset += 8 + size + (size & 1)
+        return b""
+
+    def _to_mono(self, pcm: bytes) -> bytes:
+        if self.channels == 1:
+            return pcm
+        self._buffer += pcm  # Keep partial sample frames for the next chunk
+        frame = PCM_SAMPLE_WIDTH * self.channels
+        usable = len(self._buffer) // frame * frame
+        samples = np.frombuffer(bytes(self._buffer[:usable]), dtype="<i2")
+        del self._buffer[:usable]
+        return samples[::self.channels].tobytes()  # Left channel, as AudioAnalyzer does
+
+
+async def _ffmpeg_decode(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Encoded chunks (MP3, ...) → s16le mono PCM_SAMPLE_RATE through an ffmpeg pipe"""
+    if not can_decode_compressed():
+        raise StreamDecodeError("ffmpeg is required to decode compressed TTS streams")
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "quiet", "-fflags", "nobuffer", "-probesize", "2048",
+        "-i", "pipe:0", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(PCM_SAMPLE_RATE), "-ac", "1",
+        "-flush_packets", "1", "pipe:1",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+
+    async def pump():
+        try:
+            process.stdin.write(first)
+            await process.stdin.drain()
+            async for chunk in rest:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        finally:
+            process.stdin.close()
+
+    # 🚨 写入与读取并行：边收边解码，避免管道缓冲区互相等待
+    writer = asyncio.get_running_loop().create_task(pump())
+    try:
+        while True:
+            pcm = await process.stdout.read(8192)
+            if not pcm:
+                break
+            yield pcm
+        await writer  # Source errors surface here
+    finally:
+        writer.cancel()
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+
+async def decode_stream(chunks: AsyncIterable[bytes], info: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """
+    Mono s16le PCM from an encoded stream, as soon as each chunk decodes.
+    ``info`` (optional dict) receives "format" and "sample_rate".
+    """
+    info = info if info is not None else {}
+    iterator = chunks.__aiter__()
+    first = b""
+    while len(first) < 4:
+        try:
+            first += await iterator.__anext__()
+        except StopAsyncIteration:
+            break
+    if not first:
+        return
+    if first.startswith(b"RIFF"):
+        decoder = WavStreamDecoder()
+        info["format"] = "wav"
+        pcm = decoder.feed(first)
+        info["sample_rate"] = decoder.sample_rate
+        if pcm:
+            yield pcm
+        async for chunk in iterator:
+            pcm = decoder.feed(chunk)
+            info["sample_rate"] = decoder.sample_rate
+            if pcm:
+                yield pcm
+    else:
+        info["format"] = "mp3"
+        info["sample_rate"] = PCM_SAMPLE_RATE
+        async for pcm in _ffmpeg_decode(first, iterator):
+            yield pcm
+
+
+def resample_pcm(pcm: bytes, from_rate: int, to_rate: int) -> bytes:
+    """Mono s16le PCM converted to another rate (linear interpolation, whole buffers only)"""
+    samples = np.frombuffer(pcm, dtype="<i2")
+    if from_rate == to_rate or not len(samples):
+        return pcm
+    count = int(round(len(samples) * to_rate / from_rate))
+    positions = np.arange(count) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).round().astype("<i2").tobytes()
+
+
+# === Analysis ===
+class StreamingAmplitude:
+    """Incremental lip-sync envelope: feed PCM, get each frame as soon as it is complete"""
+
+    def __init__(self, sample_rate: int = PCM_SAMPLE_RATE, frame_rate: int = 30):
+        self.samples_per_frame = sample_rate // frame_rate
+        self._pending = bytearray()
+        self.samples = 0
+
+    def feed(self, pcm: bytes) -> List[float]:
+        self._pending += pcm
+        frame_bytes = self.samples_per_frame * PCM_SAMPLE_WIDTH
+        usable = len(self._pending) // frame_bytes * frame_bytes
+        if not usable:
+            return []
+        samples = np.frombuffer(bytes(self._pending[:usable]), dtype="<i2")
+        del self._pending[:usable]
+        self.samples += len(samples)
+        return amplitude_envelope(samples, self.samples_per_frame)
+
+
+# === Playback ===
+class FfplayStreamPlayer:
+    """Plays PCM as it is written, through an ffplay pipe (starts on the first write)"""
+
+    def __init__(self):
+        self._process = None
+        self.sample_rate = PCM_SAMPLE_RATE
+        self.started_at: Optional[float] = None
+        self.bytes_written = 0
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("ffplay") is not None
+
+    async def start(self, sample_rate: int = PCM_SAMPLE_RATE):
+        self._process = await asyncio.create_subprocess_exec(
+            "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",
+            "-fflags", "nobuffer", "-probesize", "32", "-analyzeduration", "0", "-i", "pipe:0",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+        self._process.stdin.write(wav_stream_header(sample_rate))
+        self.sample_rate = sample_rate
+
+    async def write(self, pcm: bytes):
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self._process.stdin.write(pcm)
+        self.bytes_written += len(pcm)
+        await self._process.stdin.drain()
+
+    def position(self) -> float:
+        """Estimated seconds played (wall clock since the first write; ffplay does not report it)"""
+        if self.started_at is None:
+            return 0.0
+        written = self.bytes_written / (self.sample_rate * PCM_SAMPLE_WIDTH)
+        return min(time.monotonic() - self.started_at, written)
+
+    async def finish(self):
+        """Wait until everything written has been played"""
+        self._process.stdin.close()
+        await self._process.wait()
+
+    async def close(self):
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
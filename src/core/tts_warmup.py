@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+TTS Warmup - Background pre-synthesis of the known dialogue corpus
+
+Every scripted line (soul quotes, touch reactions, affection prompts) is
+known at startup. The warmup job synthesizes and analyzes them into the TTS
+cache with a small worker pool, so the first greeting or touch reaction is
+a cache hit instead of a network round trip.
+
+- Low priority: workers wait while a live speak() is synthesizing.
+- Lines are split into sentences like speak() does, so every cache entry
+  is one that speak() will look up. Sentences already in the cache are
+  skipped without synthesis.
+- Keys use the provider / voice settings current when each line is
+  synthesized; restart() re-queues the corpus after a provider switch.
+- A provider that keeps failing (offline, not installed) stops the job
+  after MAX_CONSECUTIVE_FAILURES lines.
+
+Event loop thread only.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Iterable, List
+
+from loguru import logger
+
+from src.core.tts_stream import split_sentences
+
+DEFAULT_WORKERS = 2
+MAX_CONSECUTIVE_FAILURES = 3
+LIVE_POLL_INTERVAL = 0.1  # Seconds between checks while live speech is synthesizing
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_DISABLED = "disabled"
+
+
+class TTSWarmup:
+    """Bounded background synthesis of known lines into the TTS cache"""
+
+    def __init__(self, tts_manager, workers: int = DEFAULT_WORKERS):
+        self.tts = tts_manager
+        self.workers = workers
+        self._corpus: List[str] = []          # Every line ever queued (for restart())
+        self._queue: deque = deque()
+        self._queued = set()
+        self._tasks: set = set()
+
+        self.state = STATE_IDLE if tts_manager.cache is not None and workers > 0 else STATE_DISABLED
+        self.total = 0
+        self.cached = 0        # Already in the cache
+        self.synthesized = 0
+        self.failed = 0
+        self._consecutive_failures = 0
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self, lines: Iterable[str]) -> int:
+        """Queue lines (in priority order) and start the workers; returns how many were new"""
+        if self.state == STATE_DISABLED:
+            return 0
+        added = 0
+        for line in lines:
+            for text in split_sentences(line) if isinstance(line, str) else []:
+                if text in self._queued:
+                    continue
+                self._queued.add(text)
+                self._corpus.append(text)
+                self._queue.append(text)
+                added += 1
+        self.total += added
+        if self._queue and not self._tasks:
+            self.state = STATE_RUNNING
+            self._consecutive_failures = 0
+            self._started = time.monotonic()
+            logger.info(f"🔥 TTS warmup: {len(self._queue)} lines, {self.workers} workers "
+                        f"({self.tts.current_provider.name})")
+            loop = asyncio.get_running_loop()
+            for _ in range(self.workers):
+                task = loop.create_task(self._worker())
+                self._tasks.add(task)
+                task.add_done_callback(self._worker_done)
+        return added
+
+    def restart(self) -> int:
+        """Re-queue the whole corpus (e.g. after the provider or voice changed)"""
+        if self.state == STATE_DISABLED or not self._corpus:
+            return 0
+        self.cancel()
+        corpus = self._corpus
+        self._corpus, self._queued = [], set()
+        self.total = self.cached = self.synthesized = self.failed = 0
+        return self.start(corpus)
+
+    def cancel(self):
+        """Stop queued work (a line being synthesized is abandoned; a live request sharing it takes over)"""
+        self._queue.clear()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self.state == STATE_RUNNING:
+            self.state = STATE_IDLE
+
+    async def _worker(self):
+        cache = self.tts.cache
+        while self._queue:
+            # 🚨 低优先级：实时 speak() 正在合成时让路
+            while self.tts.live_synthesis > 0:
+                await asyncio.sleep(LIVE_POLL_INTERVAL)
+            if not self._queue:
+                break
+            text = self._queue.popleft()
+            if self.tts.cache_key(text) in cache:
+                self.cached += 1
+                continue
+            try:
+                result, _ = await self.tts.synthesize(text)
+            except Exception as e:
+                result = None
+                logger.debug(f"TTS warmup error for '{text[:20]}': {e}")
+            if result is not None and result.success:
+                self.synthesized += 1
+                self._consecutive_failures = 0
+                continue
+            self.failed += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                logger.warning(f"⚠️ TTS warmup stopped: {self._consecutive_failures} failures in a row "
+                               f"({result.error if result is not None else 'exception'})")
+                self.state = STATE_FAILED
+                self._queue.clear()
+
+    def _worker_done(self, task: asyncio.Task):
+        if task not in self._tasks:
+            return  # Cancelled
+        self._tasks.discard(task)
+        if self._tasks:
+            return
+        self._elapsed = time.monotonic() - self._started
+        if self.state == STATE_RUNNING:
+            self.state = STATE_DONE if not self._queue else STATE_IDLE
+            logger.info(f"🔥 TTS warmup done in {self._elapsed:.1f}s: {self.synthesized} synthesized, "
+                        f"{self.cached} cached, {self.failed} failed")
+
+    def stats(self) -> dict:
+        done = self.cached + self.synthesized + self.failed
+        elapsed = time.monotonic() - self._started if self._tasks else self._elapsed
+        return {
+            "state": self.state,
+            "total": self.total,
+            "done": done,
+            "progress": round(done / self.total, 3) if self.total else 1.0,
+            "cached": self.cached,
+            "synthesized": self.synthesized,
+            "failed": self.failed,
+            "workers": len(self._tasks),
+            "elapsed_s": round(elapsed, 1),
+        }
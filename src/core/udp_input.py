@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+UDP Input - Motion-capture parameter feeds over OSC or packed datagrams
+
+TCP (WebSocket) head-of-line blocks on packet loss: one lost segment delays
+every newer frame behind it. A 60 Hz tracker only cares about the newest
+pose, so this optional listener takes one datagram per frame and feeds the
+same latest-wins path as /sprite/stream (LatestWinsStream ->
+_apply_parameter_batch / _apply_look_at).
+
+Accepted datagrams:
+
+- Packed: wire_format KIND_NAMED_PARAMETERS
+  (``encode_named_parameters(seq, {"ParamAngleX": 12.0, ...})``).
+- OSC 1.0 messages or bundles; the ``/sprite`` or ``/sprite/<name>`` prefix
+  is optional and selects the sprite:
+
+      /sprite/param/ParamAngleX  f            one parameter
+      /sprite/params             s f s f ...  several parameters
+      /sprite/look_at            f f          gaze target
+      /sprite/seq                i            sequence number of this packet
+
+Sequence numbers are tracked per source address (32-bit, wrapping): a packet
+that is not newer than the last one applied from that source is dropped as
+reordered or duplicated. Packets without a sequence number are applied as
+they arrive. A source that stays silent for SOURCE_TIMEOUT seconds starts
+over, so a restarted tracker is accepted again.
+
+Runs on the server's event loop.
+"""
+
+import asyncio
+import math
+import struct
+import time
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+from src.core import wire_format
+from src.core.stream_endpoint import LatestWinsStream
+from src.core.wire_format import WireFormatError
+
+SOURCE_TIMEOUT = 2.0
+MAX_SOURCES = 64
+_SEQ_HALF = 0x80000000
+
+_OSC_BUNDLE = b"#bundle\0"
+MAX_OSC_BUNDLE_DEPTH = 8  # Nested bundles deeper than this are rejected
+_OSC_ARGS = {
+    "i": struct.Struct(">i"), "f": struct.Struct(">f"),
+    "h": struct.Struct(">q"), "d": struct.Struct(">d"),
+}
+_OSC_CONSTANTS = {"T": True, "F": False, "N": None, "I": None}
+
+
+class OscError(ValueError):
+    """Malformed OSC packet"""
+
+
+def _osc_string(packet: bytes, offset: int) -> Tuple[str, int]:
+    end = packet.find(b"\0", offset)
+    if end < 0:
+        raise OscError("Unterminated OSC string")
+    return packet[offset:end].decode(), (end + 4) & ~3
+
+
+def _osc_message(packet: bytes) -> Tuple[str, list]:
+    address, offset = _osc_string(packet, 0)
+    if offset >= len(packet):
+        return address, []  # Old-style message without a type tag string
+    tags, offset = _osc_string(packet, offset)
+    if not tags.startswith(","):
+        raise OscError(f"Invalid OSC type tags: {tags!r}")
+    args = []
+    try:
+        for tag in tags[1:]:
+            if tag in _OSC_ARGS:
+                fmt = _OSC_ARGS[tag]
+                args.append(fmt.unpack_from(packet, offset)[0])
+                offset += fmt.size
+            elif tag == "s":
+                value, offset = _osc_string(packet, offset)
+                args.append(value)
+            elif tag == "b":
+                (size,) = _OSC_ARGS["i"].unpack_from(packet, offset)
+                args.append(packet[offset + 4:offset + 4 + size])
+                offset = (offset + 4 + size + 3) & ~3
+            elif tag in _OSC_CONSTANTS:
+                args.append(_OSC_CONSTANTS[tag])
+            else:
+                raise OscError(f"Unsupported OSC type tag: {tag}")
+    except struct.error:
+        raise OscError("Truncated OSC arguments") from None
+    return address, args
+
+
+def parse_osc(packet: bytes, _depth: int = 0) -> List[Tuple[str, list]]:
+    """Messages of an OSC packet (bundles are flattened, timetags ignored)"""
+    if not packet.startswith(_OSC_BUNDLE):
+        return [_osc_message(packet)]
+    if _depth >= MAX_OSC_BUNDLE_DEPTH:
+        raise OscError(f"OSC bundles nested deeper than {MAX_OSC_BUNDLE_DEPTH}")
+    messages = []
+    offset = len(_OSC_BUNDLE) + 8  # Skip the timetag
+    while offset < len(packet):
+        if offset + 4 > len(packet):
+            raise OscError("Truncated OSC bundle")
+        (size,) = _OSC_ARGS["i"].unpack_from(packet, offset)
+        element = packet[offset + 4:offset + 4 + size]
+        if size <= 0 or len(element) != size:
+            raise OscError("Truncated OSC bundle element")
+        messages.extend(parse_osc(element, _depth + 1))
+        offset += 4 + size
+    return messages
+
+
+def _pad(data: bytes) -> bytes:
+    return data + b"\0" * (4 - len(data) % 4)
+
+
+def encode_osc(address: str, *args) -> bytes:
+    """Minimal OSC message encoder (int / float / str arguments; for clients and tests)"""
+    tags, body = ",", b""
+    for arg in args:
+        if isinstance(arg, bool) or not isinstance(arg, (int, float, str)):
+            raise OscError(f"Unsupported OSC argument: {arg!r}")
+        if isinstance(arg, int):
+            tags, body = tags + "i", body + _OSC_ARGS["i"].pack(arg)
+        elif isinstance(arg, float):
+            tags, body = tags + "f", body + _OSC_ARGS["f"].pack(arg)
+        else:
+            tags, body = tags + "s", body + _pad(arg.encode())
+    return _pad(address.encode()) + _pad(tags.encode()) + body
+
+
+def encode_osc_bundle(*messages: bytes) -> bytes:
+    """OSC bundle with an "immediately" timetag"""
+    return _OSC_BUNDLE + struct.pack(">Q", 1) + b"".join(
+        struct.pack(">i", len(message)) + message for message in messages)
+
+
+class UdpParameterInput(asyncio.DatagramProtocol):
+    """UDP listener feeding parameter datagrams into the sprites of one server"""
+
+    def __init__(self, server):
+        self.server = server                 # Host WebSocketServer (routes to server.sprites)
+        self.transport = None
+        self._streams: Dict[object, LatestWinsStream] = {}
+        self._appliers: Dict[object, asyncio.Task] = {}
+        self._sources: Dict[tuple, Tuple[int, float]] = {}  # addr -> (last seq, last seen)
+
+        self.received = 0     # Datagrams
+        self.reordered = 0    # Dropped: not newer than the last one from that source
+        self.invalid = 0      # Dropped: malformed or unknown address / sprite
+
+    # === asyncio.DatagramProtocol ===
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        self.received += 1
+        try:
+            if data[:1] in (b"/", b"#"):
+                self._handle_osc(data, addr)
+            elif wire_format.frame_kind(data) == wire_format.KIND_NAMED_PARAMETERS:
+                seq, params = wire_format.decode_named_parameters(data)
+                if self._accept_seq(addr, seq):
+                    self._stream_for(self.server).add_params(params)
+            else:
+                raise WireFormatError("Unsupported UDP frame kind")
+        except (WireFormatError, UnicodeDecodeError, ValueError, TypeError, IndexError, OverflowError) as e:
+            self.invalid += 1
+            if self.invalid == 1:
+                logger.warning(f"📡 Invalid UDP datagram from {addr}: {e} (further ones are only counted)")
+
+    def error_received(self, exc):
+        logger.debug(f"UDP input error: {exc}")
+
+    # === Decoding ===
+    def _handle_osc(self, packet: bytes, addr):
+        updates = []  # (sprite, params, look_at) applied only after the seq check
+        seq = None
+        for address, args in parse_osc(packet):
+            sprite, command = self._route(address)
+            if command == ["seq"]:
+                if isinstance(args[0], float) and not math.isfinite(args[0]):
+                    raise OscError(f"Invalid OSC sequence number: {args[0]}")
+                seq = int(args[0])
+            elif len(command) == 2 and command[0] == "param":
+                updates.append((sprite, {command[1]: float(args[0])}, None))
+            elif command == ["params"]:
+                if len(args) % 2:
+                    raise OscError("/params needs name/value pairs")
+                updates.append((sprite, {str(args[i]): float(args[i + 1]) for i in range(0, len(args), 2)}, None))
+            elif command == ["look_at"]:
+                updates.append((sprite, None, (float(args[0]), float(args[1]))))
+            else:
+                raise OscError(f"Unknown OSC address: {address}")
+
+        if seq is not None and not self._accept_seq(addr, seq):
+            return
+        for sprite, params, look_at in updates:
+            stream = self._stream_for(sprite)
+            if params:
+                stream.add_params(params)
+            if look_at:
+                stream.set_look_at(*look_at)
+
+    def _route(self, address: str):
+        """(sprite, remaining address parts); the /sprite[/<name>] prefix is optional"""
+        parts = [part for part in address.split("/") if part]
+        if parts and parts[0] == "sprite":
+            parts = parts[1:]
+            if parts and parts[0] in self.server.sprites:
+                return self.server.sprites[parts[0]], parts[1:]
+        return self.server, parts
+
+    def _accept_seq(self, addr, seq: int) -> bool:
+        """🚨 乱序丢弃：序号（32 位回绕）不比该来源上次应用的新则丢弃"""
+        now = time.monotonic()
+        last = self._sources.get(addr)
+        if last is not None and now - last[1] < SOURCE_TIMEOUT:
+            delta = (seq - last[0]) & 0xFFFFFFFF
+            if delta == 0 or delta >= _SEQ_HALF:
+                self.reordered += 1
+                return False
+        elif last is None and len(self._sources) >= MAX_SOURCES:
+            self._sources = {a: s for a, s in self._sources.items() if now - s[1] < SOURCE_TIMEOUT}
+        self._sources[addr] = (seq & 0xFFFFFFFF, now)
+        return True
+
+    # === Applying ===
+    def _stream_for(self, sprite) -> LatestWinsStream:
+        stream = self._streams.get(sprite)
+        if stream is None:
+            stream = self._streams[sprite] = LatestWinsStream()
+            self._appliers[sprite] = asyncio.get_running_loop().create_task(sprite._apply_stream(stream))
+        return stream
+
+    def close(self):
+        for sprite, applier in self._appliers.items():
+            applier.cancel()
+            sprite._flush_stream(self._streams[sprite])
+        self._appliers.clear()
+        if self.transport:
+            self.transport.close()
+
+    def stats(self) -> dict:
+        streams = [stream.stats() for stream in self._streams.values()]
+        return {
+            "received": self.received,
+            "reordered": self.reordered,
+            "invalid": self.invalid,
+            "coalesced": sum(s["coalesced"] for s in streams),
+            "applied": sum(s["applied"] for s in streams),
+            "sources": len(self._sources),
+        }
+
+
+async def start_udp_input(server, host: str = "127.0.0.1", port: int = 9000) -> UdpParameterInput:
+    """Listen for parameter datagrams on the running loop"""
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_datagram_endpoint(lambda: UdpParameterInput(server), local_addr=(host, port))
+    logger.info(f"📡 UDP parameter input on udp://{host}:{port} (OSC / packed)")
+    return protocol
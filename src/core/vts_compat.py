@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+VTube Studio Compatibility - Public API subset for off-the-shelf face trackers
+
+Trackers and plugins written for the VTube Studio Public API can drive the
+sprite directly (``ws://127.0.0.1:8765/vts`` or a dedicated ``vts_port``)
+without an adapter process. Implemented requests:
+
+- APIStateRequest, AuthenticationTokenRequest, AuthenticationRequest
+- InjectParameterDataRequest ("set" / "add", per-value weight)
+- InputParameterListRequest, Live2DParameterListRequest, ParameterValueRequest
+- CurrentModelRequest
+
+Everything but the state and authentication requests needs an
+authenticated session (errorID 8 otherwise).
+
+Injected ids are either VTube Studio default input parameters (FaceAngleX,
+EyeOpenLeft, MouthSmile, ...), mapped onto the standard Live2D parameters
+with VTube Studio's default ranges, or Live2D parameter ids used as-is.
+
+One injection request is converted into one parameter batch, i.e. one staged
+frame update, however many values it carries.
+
+Weight and "add" mode blend against a base value: the parameter's latest
+value from any other writer. Each session remembers what it wrote, so a
+tracker re-sending the same "add" offset every frame does not accumulate.
+
+Event loop thread only.
+"""
+
+import json
+import secrets
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+VTS_API_NAME = "VTubeStudioPublicAPI"
+VTS_API_VERSION = "1.0"
+VTS_COMPAT_VERSION = "sherry-compat-1.0"
+
+MODE_SET = "set"
+MODE_ADD = "add"
+MODES = {MODE_SET, MODE_ADD, "default"}  # "default" is VTube Studio's name for "set"
+
+# VTube Studio ErrorID values
+ERROR_INTERNAL = 0
+ERROR_API_NAME_INVALID = 1
+ERROR_API_VERSION_INVALID = 2
+ERROR_REQUEST_TYPE_MISSING = 4
+ERROR_REQUEST_TYPE_UNKNOWN = 5
+ERROR_REQUEST_REQUIRES_AUTHENTICATION = 8
+ERROR_INJECT_NO_DATA = 450
+ERROR_INJECT_VALUE_INVALID = 451
+ERROR_INJECT_WEIGHT_INVALID = 452
+ERROR_INJECT_PARAM_NOT_FOUND = 453
+ERROR_INJECT_MODE_UNKNOWN = 455
+
+
+class VtsError(Exception):
+    """Request error reported to the client as an APIError response"""
+
+    def __init__(self, error_id: int, message: str):
+        super().__init__(message)
+        self.error_id = error_id
+
+
+class VtsInput(NamedTuple):
+    """VTube Studio default input parameter and the Live2D parameters it drives"""
+    name: str
+    min: float
+    max: float
+    default: float
+    targets: Tuple[Tuple[str, float, float], ...]  # (Live2D id, output min, output max)
+
+
+DEFAULT_INPUTS: List[VtsInput] = [
+    VtsInput("FaceAngleX", -30, 30, 0, (("ParamAngleX", -30, 30),)),
+    VtsInput("FaceAngleY", -30, 30, 0, (("ParamAngleY", -30, 30),)),
+    VtsInput("FaceAngleZ", -30, 30, 0, (("ParamAngleZ", -30, 30),)),
+    VtsInput("FacePositionX", -15, 15, 0, (("ParamBodyAngleX", -10, 10),)),
+    VtsInput("FacePositionY", -15, 15, 0, (("ParamBodyAngleY", -10, 10),)),
+    VtsInput("FacePositionZ", -10, 10, 0, (("ParamBodyAngleZ", -10, 10),)),
+    VtsInput("EyeOpenLeft", 0, 1, 1, (("ParamEyeLOpen", 0, 1),)),
+    VtsInput("EyeOpenRight", 0, 1, 1, (("ParamEyeROpen", 0, 1),)),
+    VtsInput("EyeLeftX", -1, 1, 0, (("ParamEyeBallX", -1, 1),)),
+    VtsInput("EyeLeftY", -1, 1, 0, (("ParamEyeBallY", -1, 1),)),
+    VtsInput("EyeRightX", -1, 1, 0, (("ParamEyeBallX", -1, 1),)),
+    VtsInput("EyeRightY", -1, 1, 0, (("ParamEyeBallY", -1, 1),)),
+    VtsInput("MouthOpen", 0, 1, 0, (("ParamMouthOpenY", 0, 1),)),
+    VtsInput("MouthSmile", 0, 1, 0.5, (("ParamMouthForm", -1, 1),)),
+    VtsInput("Brows", 0, 1, 0.5, (("ParamBrowLY", -1, 1), ("ParamBrowRY", -1, 1))),
+    VtsInput("BrowLeftY", 0, 1, 0.5, (("ParamBrowLY", -1, 1),)),
+    VtsInput("BrowRightY", 0, 1, 0.5, (("ParamBrowRY", -1, 1),)),
+    VtsInput("CheekPuff", 0, 1, 0, (("ParamCheek", 0, 1),)),
+]
+
+# 🚨 预编译映射：输入名 -> [(Live2D 参数, 输入下限, 输入上限, 输出下限, 缩放)]
+_MAPPINGS: Dict[str, Tuple[Tuple[str, float, float, float, float], ...]] = {
+    item.name: tuple(
+        (target, item.min, item.max, out_min, (out_max - out_min) / (item.max - item.min))
+        for target, out_min, out_max in item.targets
+    )
+    for item in DEFAULT_INPUTS
+}
+_INPUTS = {item.name: item for item in DEFAULT_INPUTS}
+_UNAUTHENTICATED_REQUESTS = {"APIStateRequest", "AuthenticationTokenRequest", "AuthenticationRequest"}
+
+
+class VtsSession:
+    """State of one VTube Studio API connection"""
+
+    def __init__(self):
+        self.authenticated = False
+        self.plugin_name = ""
+        # Live2D id -> (value this session wrote, base it was blended from)
+        self.written: Dict[str, Tuple[float, float]] = {}
+
+
+class VtsCompat:
+    """Handles VTube Studio API requests for one sprite (WebSocketServer)"""
+
+    def __init__(self, server):
+        self.server = server
+        self._token = secrets.token_hex(32)  # Any plugin may ask for it (local-only server)
+        self._input_values: Dict[str, float] = {}
+
+        self.requests = 0
+        self.injections = 0       # InjectParameterDataRequest messages
+        self.injected_values = 0  # parameterValues entries across all injections
+        self.errors = 0
+
+    def handle(self, session: VtsSession, message) -> dict:
+        """Response (dict) to one request (JSON text or dict)"""
+        self.requests += 1
+        request_id = None
+        try:
+            try:
+                request = message if isinstance(message, dict) else json.loads(message)
+                request_id = request.get("requestID")
+            except (ValueError, AttributeError):
+                raise VtsError(ERROR_INTERNAL, "Request is not a JSON object") from None
+            if request.get("apiName") != VTS_API_NAME:
+                raise VtsError(ERROR_API_NAME_INVALID, f"apiName must be {VTS_API_NAME}")
+            if request.get("apiVersion", VTS_API_VERSION) != VTS_API_VERSION:
+                raise VtsError(ERROR_API_VERSION_INVALID, f"apiVersion must be {VTS_API_VERSION}")
+            message_type = request.get("messageType")
+            if not message_type:
+                raise VtsError(ERROR_REQUEST_TYPE_MISSING, "messageType is missing")
+            handler = self._HANDLERS.get(message_type)
+            if handler is None:
+                raise VtsError(ERROR_REQUEST_TYPE_UNKNOWN, f"Unsupported messageType: {message_type}")
+            # 🚨 除状态与认证请求外，未认证的会话不能读写模型
+            if not session.authenticated and message_type not in _UNAUTHENTICATED_REQUESTS:
+                raise VtsError(ERROR_REQUEST_REQUIRES_AUTHENTICATION,
+                               f"{message_type} requires an authenticated session")
+            data = request.get("data") or {}
+            return self._response(request_id, message_type.replace("Request", "Response"),
+                                  handler(self, session, data))
+        except VtsError as e:
+            self.errors += 1
+            return self._response(request_id, "APIError", {"errorID": e.error_id, "message": str(e)})
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"VTS request failed: {e}")
+            return self._response(request_id, "APIError", {"errorID": ERROR_INTERNAL, "message": str(e)})
+
+    @staticmethod
+    def _response(request_id: Optional[str], message_type: str, data: dict) -> dict:
+        return {
+            "apiName": VTS_API_NAME,
+            "apiVersion": VTS_API_VERSION,
+            "timestamp": int(time.time() * 1000),
+            "messageType": message_type,
+            "requestID": request_id or "",
+            "data": data,
+        }
+
+    # === Session ===
+    def _api_state(self, session: VtsSession, data: dict) -> dict:
+        return {
+            "active": True,
+            "vTubeStudioVersion": VTS_COMPAT_VERSION,
+            "currentSessionAuthenticated": session.authenticated,
+        }
+
+    def _token_request(self, session: VtsSession, data: dict) -> dict:
+        session.plugin_name = str(data.get("pluginName", ""))
+        logger.info(f"🔑 VTS plugin token issued: {session.plugin_name or '(unnamed)'}")
+        return {"authenticationToken": self._token}
+
+    def _authenticate(self, session: VtsSession, data: dict) -> dict:
+        session.plugin_name = str(data.get("pluginName", session.plugin_name))
+        session.authenticated = data.get("authenticationToken") == self._token
+        return {
+            "authenticated": session.authenticated,
+            "reason": "Token valid" if session.authenticated else "Token invalid, request a new one",
+        }
+
+    # === Parameters ===
+    def _inject(self, session: VtsSession, data: dict) -> dict:
+        """🚨 一次注入请求 = 一次参数批量写入（一帧更新），含权重与 set/add 模式"""
+        entries = data.get("parameterValues")
+        if not isinstance(entries, list) or not entries:
+            raise VtsError(ERROR_INJECT_NO_DATA, "parameterValues must be a non-empty list")
+        mode = data.get("mode") or MODE_SET
+        if mode not in MODES:
+            raise VtsError(ERROR_INJECT_MODE_UNKNOWN, f"Unknown mode: {mode}")
+        add = mode == MODE_ADD
+
+        params: Dict[str, float] = {}
+        for entry in entries:
+            try:
+                param_id = entry["id"]
+                value = float(entry["value"])
+            except (KeyError, TypeError, ValueError):
+                raise VtsError(ERROR_INJECT_VALUE_INVALID, f"Invalid parameter value: {entry!r}") from None
+            if not param_id or not isinstance(param_id, str):
+                raise VtsError(ERROR_INJECT_PARAM_NOT_FOUND, f"Invalid parameter id: {param_id!r}")
+            try:
+                weight = float(entry.get("weight", 1.0))
+            except (TypeError, ValueError):
+                weight = -1.0
+            if not 0.0 <= weight <= 1.0:
+                raise VtsError(ERROR_INJECT_WEIGHT_INVALID, f"weight must be between 0 and 1: {entry!r}")
+
+            mapping = _MAPPINGS.get(param_id)
+            if mapping is None:
+                self._blend(session, params, param_id, value, weight, add)  # Live2D id as-is
+                continue
+            self._input_values[param_id] = value
+            for target, in_min, in_max, out_min, scale in mapping:
+                if add:
+                    converted = value * scale
+                else:
+                    converted = out_min + (min(max(value, in_min), in_max) - in_min) * scale
+                self._blend(session, params, target, converted, weight, add)
+
+        self.server._apply_parameter_batch(params)
+        self.injections += 1
+        self.injected_values += len(entries)
+        return {}
+
+    def _blend(self, session: VtsSession, params: Dict[str, float], param_id: str,
+               value: float, weight: float, add: bool):
+        if not add and weight >= 1.0:
+            params[param_id] = value
+            session.written[param_id] = (value, value)  # A full "set" becomes the new base
+            return
+        base = self._base(session, param_id)
+        result = base + value if add else base + (value - base) * weight
+        params[param_id] = result
+        session.written[param_id] = (result, base)
+
+    def _base(self, session: VtsSession, param_id: str) -> float:
+        """Latest value from other writers (our own last blend is subtracted out)"""
+        current = self.server.hub.get_parameter(param_id)
+        if current is None:
+            current = self.server.backend.get_parameter(param_id)
+        written = session.written.get(param_id)
+        if written is not None and written[0] == current:
+            return written[1]
+        return current
+
+    def _input_parameters(self, session: VtsSession, data: dict) -> dict:
+        return {
+            **self._model_info(),
+            "customParameters": [],
+            "defaultParameters": [
+                {
+                    "name": item.name,
+                    "addedBy": "VTube Studio",
+                    "value": self._input_values.get(item.name, item.default),
+                    "min": item.min,
+                    "max": item.max,
+                    "defaultValue": item.default,
+                }
+                for item in DEFAULT_INPUTS
+            ],
+        }
+
+    def _live2d_parameters(self, session: VtsSession, data: dict) -> dict:
+        return {
+            **self._model_info(),
+            "parameters": [
+                {
+                    "name": param["id"],
+                    "value": param["value"],
+                    "min": param["min"] if param["min"] is not None else 0.0,
+                    "max": param["max"] if param["max"] is not None else 0.0,
+                    "defaultValue": param["default"] if param["default"] is not None else 0.0,
+                }
+                for param in self.server.backend.describe_parameters()
+            ],
+        }
+
+    def _parameter_value(self, session: VtsSession, data: dict) -> dict:
+        name = data.get("name")
+        item = _INPUTS.get(name)
+        if item is not None:
+            return {"name": name, "addedBy": "VTube Studio",
+                    "value": self._input_values.get(name, item.default),
+                    "min": item.min, "max": item.max, "defaultValue": item.default}
+        for param in self.server.backend.describe_parameters():
+            if param["id"] == name:
+                return {"name": name, "addedBy": "Live2D", "value": param["value"],
+                        "min": param["min"] or 0.0, "max": param["max"] or 0.0,
+                        "defaultValue": param["default"] or 0.0}
+        raise VtsError(ERROR_INJECT_PARAM_NOT_FOUND, f"Unknown parameter: {name}")
+
+    def _current_model(self, session: VtsSession, data: dict) -> dict:
+        return {**self._model_info(), "vtsModelName": self.server.name, "live2DModelName": self.server.name}
+
+    def _model_info(self) -> dict:
+        return {"modelLoaded": True, "modelName": self.server.name, "modelID": self.server.name}
+
+    _HANDLERS = {
+        "APIStateRequest": _api_state,
+        "AuthenticationTokenRequest": _token_request,
+        "AuthenticationRequest": _authenticate,
+        "InjectParameterDataRequest": _inject,
+        "InputParameterListRequest": _input_parameters,
+        "Live2DParameterListRequest": _live2d_parameters,
+        "ParameterValueRequest": _parameter_value,
+        "CurrentModelRequest": _current_model,
+    }
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "injections": self.injections,
+            "injected_values": self.injected_values,
+            "errors": self.errors,
+        }
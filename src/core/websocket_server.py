@@ -5,16 +5,58 @@ Fixed for proper asyncio event loop handling on macOS
 """
 
 import asyncio
+import itertools
 import json
+import math
+import re
+import struct
 import threading
 import time
-from typing import Optional
+from typing import Dict, Optional
 
 import websockets
 from websockets.server import WebSocketServerProtocol
 from loguru import logger
-from src.core.lip_sync_websocket import LipSyncWebSocketBroadcaster# Import TTS Manager
+from src.core.lip_sync_websocket import LipSyncWebSocketBroadcaster
+from src.core import wire_format
+from src.core.command_lanes import CommandLanes, LaneFullError
+from src.core.fanout import BroadcastFanout, POLICY_COALESCE, TOPIC_METRICS, TOPICS, topic_for
+from src.core.event_hub import EventHub
+from src.core.thread_handoff import ThreadHandoff
+from src.core.local_transport import LocalConnection
+from src.core.metrics import MetricsRegistry, start_prometheus_endpoint
+from src.core.parameter_animator import EASING_EASE_OUT, EASINGS, MAX_DURATION
+from src.core.timeline import TimelineError, compile_timeline
+from src.core.sequencer import SequenceError, SequenceRun, Sequencer
+from src.core.session_log import (
+    BROADCAST_CONNECTION, ENDPOINT_SPRITE, ENDPOINT_STREAM, ENDPOINT_VTS, SessionRecorder,
+)
+from src.core.stream_endpoint import LatestWinsStream
+from src.core.tts_warmup import DEFAULT_WORKERS as DEFAULT_TTS_WARMUP_WORKERS, TTSWarmup
+from src.core.udp_input import UdpParameterInput, start_udp_input
+from src.core.vts_compat import VtsCompat, VtsSession
+from src.core.sprite_backend import QtSpriteBackend, SpriteBackend
+from src.core.wire_format import ParamCodec, WireFormatError
 
+# Message types recorded under their own metrics label (anything else is "unknown")
+COMMAND_TYPES = {
+    "expression", "motion", "parameter", "parameter_batch", "parameter_target", "look_at", "background",
+    "message", "speak", "get_status", "get_metrics", "window", "binary_negotiate",
+    "timeline_upload", "timeline_play", "timeline_stop", "sequence", "sequence_cancel",
+    "subscribe", "unsubscribe", "binary", "vts", "tts_warmup",
+}
+MAX_WARMUP_LINES = 2000
+
+# Sprite names usable in the /sprite/<name> route
+SPRITE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+DEFAULT_SPRITE = "sherry"
+# Last path segment of the latest-wins parameter stream (/sprite/stream, /sprite/<name>/stream)
+STREAM_ENDPOINT = "stream"
+# Last path segment of the VTube Studio compatible API (/vts, /sprite/<name>/vts)
+VTS_ENDPOINT = "vts"
+ENDPOINTS = {STREAM_ENDPOINT, VTS_ENDPOINT}
+
+# Import TTS Manager
 try:
     from src.core.tts_manager import TTSManager, get_tts_manager
     HAS_TTS = True
@@ -26,16 +68,60 @@ except ImportError:
 class WebSocketServer:
     """WebSocket server for controlling Sherry Sprite"""
 
-    def __init__(self, sprite_window, host: str = "127.0.0.1", port: int = 8765):
+    def __init__(self, sprite_window=None, host: str = "127.0.0.1", port: int = 8765,
+                 outbox_size: int = 64, slow_consumer_policy: str = POLICY_COALESCE,
+                 metrics_port: Optional[int] = None, metrics_interval: float = 5.0,
+                 backend: Optional[SpriteBackend] = None, record_path: Optional[str] = None,
+                 name: str = DEFAULT_SPRITE, udp_port: Optional[int] = None,
+                 vts_port: Optional[int] = None, tts_warmup_workers: int = DEFAULT_TTS_WARMUP_WORKERS,
+                 hosted: bool = False):
         self.sprite_window = sprite_window
+        # 🚨 多精灵：本实例是 /sprite 与 /sprite/<name> 的默认精灵；add_sprite() 添加的精灵共享
+        # 同一个 socket、事件循环线程和 TTS 管理器，各自拥有后端、事件中枢和命令宏
+        self.name = name
+        self.sprites: Dict[str, "WebSocketServer"] = {name: self}
+        self._host: Optional["WebSocketServer"] = None
+        self._metrics_task: Optional[asyncio.Task] = None  # Hosted sprites only
+        # 🚨 精灵后端：服务器只通过它驱动精灵（Qt 窗口，或无 Qt 的 NullSpriteBackend）
+        self.backend = backend if backend is not None else QtSpriteBackend(sprite_window)
         self.host = host
         self.port = port
+        self.metrics_port = metrics_port          # Prometheus 文本端点（None = 不启用）
+        self.metrics_interval = metrics_interval  # "metrics" 主题推送间隔（秒）
+        self.udp_port = udp_port                  # 🚨 动捕 UDP 输入端口（OSC / 打包帧，None = 不启用）
+        self.udp_input: Optional[UdpParameterInput] = None
+        self.vts_port = vts_port                  # 🚨 VTube Studio 兼容 API 的独立端口（如 8001，None = 只走 /vts 路径）
 
         self.server = None
         self.loop = None
         self.thread = None
-        self.clients = set()
         self._running = False
+
+        # 🚨 生命周期事件：socket 绑定完成即 ready；stop() 通过事件唤醒，不再 100ms 轮询
+        self._started = threading.Event()   # 启动结束（成功或失败）
+        self._ready = False
+        self._stop_event: Optional[asyncio.Event] = None
+
+        # 🚨 二进制协议：每个连接协商的参数索引表
+        self._codecs = {}
+        # 每个 /sprite 连接的命令通道（序列步骤在发起连接的通道里排队）
+        self._client_lanes = {}
+
+        # 🚨 /sprite/stream：只收参数流的连接（最新值优先，无响应）；关闭的连接计数并入 _stream_totals
+        self._streams = set()
+        self._stream_totals = {name: 0 for name in ("received", "coalesced", "rejected", "applied")}
+
+        # 🚨 VTube Studio 兼容层：现成的面部追踪软件直接注入参数，无需适配进程
+        self.vts = VtsCompat(self)
+        self._vts_sessions = 0
+
+        # 🚨 事件中枢：唯一持有客户端成员、主题订阅和最新状态缓存（仅在事件循环线程内访问）
+        # 广播扇出：每条消息只序列化一次，每个客户端独立有界队列
+        self.fanout = BroadcastFanout(maxsize=outbox_size, policy=slow_consumer_policy)
+        self.hub = EventHub(self.fanout)
+
+        # 🚨 跨线程投递：Qt / TTS 线程调用后立即返回，从不等待事件循环或网络 I/O
+        self.handoff = ThreadHandoff(maxsize=256)
         
         # 🚨 【触觉反馈】跨线程消息队列
         self._message_queue = asyncio.Queue()
@@ -47,51 +133,370 @@ class WebSocketServer:
                 logger.info("✅ WebSocket server: TTS manager initialized")
             except Exception as e:
                 logger.error(f"Failed to initialize TTS manager: {e}")
-        self.lip_sync = LipSyncWebSocketBroadcaster(self.tts_manager, self.clients, self.loop)
-        self.lip_sync.start()
+        # 🚨 台词预合成 / 口型广播只在宿主上创建：TTS 管理器是单例，add_sprite() 的精灵（hosted）
+        # 若各建一份，每句语音的口型帧会发给所有精灵的订阅者，信号处理器也随精灵数倍增
+        self.tts_warmup: Optional[TTSWarmup] = None
+        self.lip_sync: Optional[LipSyncWebSocketBroadcaster] = None
+        if not hosted:
+            self.tts_warmup = TTSWarmup(self.tts_manager, tts_warmup_workers) if self.tts_manager else None
+            self.lip_sync = LipSyncWebSocketBroadcaster(self.tts_manager, self.hub, self.handoff)
+            self.lip_sync.start()
+
+        # 🚨 命令宏：一条 sequence 消息在服务器事件循环上按绝对截止时间执行多个步骤
+        self.sequencer = Sequencer(self._dispatch, on_done=self._on_sequence_done)
+
+        # 🚨 会话录制：入站命令与出站事件写入二进制日志（可用 SessionReplayer 回放）
+        self.recorder: Optional[SessionRecorder] = None
+        self._connection_ids = {}
+        self._connection_endpoints: Dict[int, str] = {}  # connection id -> endpoint (for replay)
+        self._next_connection_id = itertools.count(1)
+        self.fanout.on_send = self._record_send
+        if record_path:
+            self.start_recording(record_path)
+
+        # 🚨 指标：计数器 / 仪表 / 每种消息类型与每个主题的延迟直方图（仅在事件循环线程内记录）
+        self.metrics = MetricsRegistry()
+        self._command_metrics = {}
+        self._setup_metrics()
         
     
+    def _setup_metrics(self):
+        """Register metrics; most are read from existing component counters at collection time"""
+        m = self.metrics
+        fanout, hub, handoff, lip_sync = self.fanout, self.hub, self.handoff, self.lip_sync
+
+        # Clients
+        m.gauge("sprite_connected_clients", "Currently connected clients", fn=lambda: len(hub))
+        m.counter("sprite_connections_total", "Client connections accepted", fn=lambda: hub.joined)
+        self._error_responses = m.counter("sprite_error_responses_total", "Error responses sent")
+
+        # Broadcast topics
+        publish_seconds = {}
+        for topic in TOPICS:
+            m.gauge("sprite_topic_subscribers", "Clients subscribed to a topic",
+                    fn=lambda t=topic: fanout.subscriber_count(t), topic=topic)
+            m.counter("sprite_published_total", "Broadcasts published per topic",
+                      fn=lambda t=topic: fanout.published_by_topic[t], topic=topic)
+            publish_seconds[topic] = m.histogram(
+                "sprite_publish_seconds", "Time to encode and queue one broadcast", topic=topic)
+
+        def on_publish(topic, message, seconds):
+            publish_seconds[topic].record(seconds)
+            if self.recorder:
+                self.recorder.outbound(BROADCAST_CONNECTION, message)
+
+        fanout.on_publish = on_publish
+
+        # Client outboxes
+        for name in ("sent", "dropped", "coalesced"):
+            m.counter(f"sprite_outbox_{name}_total", f"Outbound messages {name} across all clients",
+                      fn=lambda n=name: fanout.stats()[n])
+        m.gauge("sprite_outbox_depth", "Messages queued across all client outboxes",
+                fn=lambda: fanout.stats()["total_depth"])
+
+        # Cross-thread handoff
+        m.gauge("sprite_handoff_depth", "Events waiting to enter the event loop", fn=handoff.depth)
+        m.counter("sprite_handoff_dropped_total", "Cross-thread events dropped", fn=lambda: handoff.dropped)
+        handoff.on_latency = m.histogram(
+            "sprite_handoff_latency_seconds", "Cross-thread post to delivery latency").record
+
+        # Lip sync frames (received / rate_limited / unsubscribed / posted / dropped), host only
+        for outcome in lip_sync.stats() if lip_sync else ():
+            m.counter("sprite_lip_sync_frames_total", "Lip sync frames by outcome",
+                      fn=lambda o=outcome: lip_sync.stats()[o], outcome=outcome)
+
+        # Qt side: values staged for the render thread and how long they have waited
+        def table_value(attr, default=0):
+            table = self.backend.parameter_table
+            if table is None:
+                return default
+            value = getattr(table, attr)
+            return value() if callable(value) else value
+
+        m.gauge("sprite_staged_parameters", "Parameters waiting for the next rendered frame",
+                fn=lambda: table_value("pending_count"))
+        m.gauge("sprite_staged_age_seconds", "Age of the oldest value waiting for the render thread",
+                fn=lambda: table_value("pending_age", 0.0))
+        m.counter("sprite_staged_writes_total", "Parameter values staged",
+                  fn=lambda: table_value("writes"))
+        m.counter("sprite_staged_coalesced_total", "Staged values overwritten before a frame applied them",
+                  fn=lambda: table_value("coalesced"))
+        m.counter("sprite_frames_applied_total", "Rendered frames that applied staged values",
+                  fn=lambda: table_value("drains"))
+
+        # Latest-wins stream endpoint (received / coalesced / rejected / applied)
+        m.gauge("sprite_stream_connections", "Open /sprite/stream connections", fn=lambda: len(self._streams))
+        for outcome in self._stream_totals:
+            m.counter("sprite_stream_frames_total", "Stream endpoint frames by outcome",
+                      fn=lambda o=outcome: self.stream_stats()[o], outcome=outcome)
+
+        # VTube Studio compatible API
+        m.gauge("sprite_vts_sessions", "Open VTube Studio API connections", fn=lambda: self._vts_sessions)
+        for name in ("requests", "injections", "injected_values", "errors"):
+            m.counter(f"sprite_vts_{name}_total", f"VTube Studio API {name.replace('_', ' ')}",
+                      fn=lambda n=name: self.vts.stats()[n])
+
+        # UDP motion-capture input (host only; zero while disabled)
+        for outcome in ("received", "reordered", "invalid", "coalesced", "applied"):
+            m.counter("sprite_udp_packets_total", "UDP input datagrams by outcome",
+                      fn=lambda o=outcome: self.udp_input.stats()[o] if self.udp_input else 0, outcome=outcome)
+
+    def _record_command(self, msg_type: str, seconds: float):
+        """Count and time one processed message"""
+        entry = self._command_metrics.get(msg_type)
+        if entry is None:
+            label = msg_type if msg_type in COMMAND_TYPES else "unknown"
+            entry = (
+                self.metrics.counter("sprite_commands_total", "Messages processed per type", type=label),
+                self.metrics.histogram("sprite_command_seconds", "Message processing time per type", type=label),
+            )
+            if label == msg_type:
+                self._command_metrics[msg_type] = entry
+        entry[0].inc()
+        entry[1].record(seconds)
+
+    async def _publish_metrics_loop(self):
+        """Periodically push a metrics snapshot to "metrics" topic subscribers"""
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            if self.hub.subscriber_count(TOPIC_METRICS):
+                self.hub.publish({"type": "metrics", "data": self.metrics.snapshot()},
+                                 topic=TOPIC_METRICS, key="metrics")
+
+    def start_recording(self, path: str) -> SessionRecorder:
+        """Record every inbound command and outbound event to ``path`` (replaces any active recording)"""
+        recorder = SessionRecorder(path)
+        previous, self.recorder = self.recorder, recorder
+        for connection in list(self._connection_ids.values()):
+            recorder.connect(connection, self._connection_endpoints.get(connection, ENDPOINT_SPRITE))
+        if previous:
+            self._close_recorder(previous)
+        logger.info(f"📼 Recording session to {recorder.path}")
+        return recorder
+
+    def stop_recording(self):
+        """Stop recording; safe to call from any thread"""
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            self._close_recorder(recorder)
+
+    def _close_recorder(self, recorder: SessionRecorder):
+        # 日志只在事件循环线程写入：从其他线程停止时交给循环关闭
+        loop_running = self.loop is not None and self.loop.is_running()
+        if loop_running and threading.current_thread() is not self.thread and self.handoff.post(recorder.close):
+            return
+        recorder.close()
+
+    def _record_send(self, websocket, message):
+        if self.recorder:
+            self.recorder.outbound(self._connection_ids.get(websocket, 0), message)
+
+    def add_sprite(self, name: str, sprite_window=None, backend: Optional[SpriteBackend] = None) -> "WebSocketServer":
+        """Host another sprite on this server's socket and event loop, routed by ``/sprite/<name>``
+
+        Returns the sprite's own WebSocketServer (use it for broadcast_sync,
+        connect_local, ...). It is started and stopped together with this one.
+        """
+        if self._host is not None:
+            return self._host.add_sprite(name, sprite_window, backend)
+        if not SPRITE_NAME_PATTERN.match(name or ""):
+            raise ValueError(f"Invalid sprite name: {name!r}")
+        if name in ENDPOINTS:
+            raise ValueError(f"Reserved sprite name: {name}")
+        if name in self.sprites:
+            raise ValueError(f"Sprite already exists: {name}")
+
+        sprite = WebSocketServer(sprite_window, host=self.host, port=self.port,
+                                 outbox_size=self.fanout.maxsize, slow_consumer_policy=self.fanout.policy,
+                                 metrics_interval=self.metrics_interval, backend=backend, name=name,
+                                 hosted=True)
+        sprite._host = self
+        sprite.sprites = self.sprites  # Shared routing table
+        self.sprites[name] = sprite
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(sprite._attach, self.loop)
+        logger.info(f"🐱 Sprite added: {name} (ws://{self.host}:{self.port}/sprite/{name})")
+        return sprite
+
+    def _attach(self, loop: asyncio.AbstractEventLoop):
+        """Run a hosted sprite on the host's event loop (loop thread)"""
+        self.loop = loop
+        self.thread = self._host.thread
+        self.handoff.attach(loop)
+        self._metrics_task = loop.create_task(self._publish_metrics_loop())
+        self._ready = True
+        self._started.set()
+
+    def _detach(self):
+        self._ready = False
+        if self._metrics_task:
+            self._metrics_task.cancel()
+        self.sequencer.cancel()
+        self.stop_recording()
+
+    @staticmethod
+    def _request_path(websocket) -> str:
+        request = getattr(websocket, "request", None)
+        path = getattr(request, "path", None) or getattr(websocket, "path", None) or "/sprite"
+        return path.split("?", 1)[0]
+
+    def _route(self, path: str):
+        """(sprite, endpoint) serving a request path; sprite is None for an unknown /sprite/<name>
+
+        endpoint is None (request/response), STREAM_ENDPOINT or VTS_ENDPOINT.
+        """
+        parts = [part for part in path.split("/") if part]
+        endpoint = None
+        if parts and parts[-1] in ENDPOINTS and (parts[0] == "sprite" or len(parts) == 1):
+            endpoint = parts.pop()
+        if len(parts) >= 2 and parts[0] == "sprite":
+            return self.sprites.get(parts[1]), endpoint
+        return self, endpoint  # /sprite, /vts, / and anything else: the default sprite
+
+    async def _serve_connection(self, websocket: WebSocketServerProtocol, endpoint: Optional[str] = None):
+        """Socket entry point: dispatch to the sprite (and endpoint) named in the path"""
+        path = self._request_path(websocket)
+        sprite, routed = self._route(path)
+        if sprite is None:
+            logger.warning(f"Unknown sprite route: {path}")
+            await websocket.close(4004, "Unknown sprite")
+            return
+        endpoint = endpoint or routed
+        if endpoint == STREAM_ENDPOINT:
+            await sprite._handle_stream(websocket)
+        elif endpoint == VTS_ENDPOINT:
+            await sprite._handle_vts(websocket)
+        else:
+            await sprite._handle_client(websocket)
+
+    async def _serve_vts_connection(self, websocket: WebSocketServerProtocol):
+        """vts_port entry point: every path speaks the VTube Studio API"""
+        await self._serve_connection(websocket, VTS_ENDPOINT)
+
     def start(self):
         """Start WebSocket server in background thread"""
+        if self._host is not None:
+            raise RuntimeError(f"Sprite '{self.name}' runs on its host server; start the host instead")
+        self._running = True
         self.thread = threading.Thread(target=self._run_server, daemon=True)
         self.thread.start()
         logger.info(f"WebSocket server starting on ws://{self.host}:{self.port}/sprite")
 
-    def stop(self):
-        """Stop WebSocket server"""
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the socket is bound; False on timeout or startup failure (any thread)"""
+        return self._started.wait(timeout) and self._ready
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready
+
+    @property
+    def startup_failed(self) -> bool:
+        """Startup finished without a bound socket (e.g. port in use), or the server has stopped"""
+        return self._started.is_set() and not self._ready
+
+    def stop(self, timeout: float = 2.0):
+        """Stop WebSocket server (wakes the loop immediately, then joins the thread)"""
+        if self._host is not None:
+            return  # Hosted sprites stop with their host
         self._running = False
-        # Give it a moment to shut down gracefully
+        loop, stop_event = self.loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass  # Loop already closed
         if self.thread:
-            self.thread.join(timeout=2)
+            self.thread.join(timeout=timeout)
         logger.info("WebSocket server stopped")
 
+    def connect_local(self, client_loop: Optional[asyncio.AbstractEventLoop] = None) -> LocalConnection:
+        """🚨 进程内直连（同进程的大脑使用）：命令以 dict 直接入队，不经过 socket 和 JSON
+
+        Can be called from any thread; ``client_loop`` is the loop that will
+        read from the returned connection (defaults to the caller's running loop).
+        Raises ConnectionError if the server loop is not running yet.
+        """
+        if not self._ready or self.loop is None or not self.loop.is_running():
+            raise ConnectionError("WebSocket server is not running")
+        connection = LocalConnection(self.loop, client_loop or asyncio.get_running_loop())
+        asyncio.run_coroutine_threadsafe(self._handle_client(connection.peer), self.loop)
+        return connection
+
     def _run_server(self):
         """Run the WebSocket server"""
-        self._running = True
 
         async def run():
             # 🚨 保存事件循环引用（供线程安全广播使用）
             self.loop = asyncio.get_running_loop()
+            self.handoff.attach(self.loop)
+            self._stop_event = asyncio.Event()
+            if not self._running:
+                self._stop_event.set()  # stop() called before the loop started
+            metrics_task = metrics_server = vts_server = None
             
             try:
                 # Create server without subprotocols (simpler and more compatible)
                 self.server = await websockets.serve(
-                    self._handle_client,
+                    self._serve_connection,
                     self.host,
                     self.port,
                     ping_interval=20,
                     ping_timeout=10
                 )
 
+                if self.udp_port:
+                    try:
+                        self.udp_input = await start_udp_input(self, self.host, self.udp_port)
+                    except OSError as e:
+                        logger.error(f"UDP input failed to start: {e}")
+                if self.vts_port:
+                    try:
+                        vts_server = await websockets.serve(self._serve_vts_connection, self.host, self.vts_port,
+                                                            ping_interval=20, ping_timeout=10)
+                        logger.info(f"🎭 VTube Studio API on ws://{self.host}:{self.vts_port}")
+                    except OSError as e:
+                        logger.error(f"VTube Studio API failed to start: {e}")
+
+                # 🚨 socket 已绑定：立即通知等待方（大脑等）
+                for sprite in list(self.sprites.values()):
+                    if sprite is not self:
+                        sprite._attach(self.loop)
+                self._ready = True
+                self._started.set()
                 logger.info(f"✅ WebSocket server ready on ws://{self.host}:{self.port}")
 
-                # Keep running until stopped
-                while self._running:
-                    await asyncio.sleep(0.1)
+                # 指标推送与可选的 Prometheus 端点（同一事件循环）
+                metrics_task = asyncio.create_task(self._publish_metrics_loop())
+                if self.metrics_port:
+                    try:
+                        metrics_server = await start_prometheus_endpoint(
+                            self.metrics, self.host, self.metrics_port)
+                    except OSError as e:
+                        logger.error(f"Metrics endpoint failed to start: {e}")
+
+                # Keep running until stop() sets the event
+                await self._stop_event.wait()
 
             except Exception as e:
                 logger.error(f"WebSocket server error: {e}")
             finally:
+                self._ready = False
+                self._started.set()  # Wake waiters on startup failure too
+                self.sequencer.cancel()
+                for sprite in list(self.sprites.values()):
+                    if sprite is not self:
+                        sprite._detach()
+                self.stop_recording()
+                if metrics_task:
+                    metrics_task.cancel()
+                if metrics_server:
+                    metrics_server.close()
+                if self.udp_input:
+                    self.udp_input.close()
+                if vts_server:
+                    vts_server.close()
+                    await vts_server.wait_closed()
                 if self.server:
                     self.server.close()
                     await self.server.wait_closed()
@@ -102,32 +507,177 @@ class WebSocketServer:
         except Exception as e:
             logger.error(f"WebSocket server thread error: {e}")
 
+    def _open_connection(self, websocket, endpoint: str) -> int:
+        """Assign a session-log connection id (recorded with its endpoint)"""
+        connection = self._connection_ids[websocket] = next(self._next_connection_id)
+        self._connection_endpoints[connection] = endpoint
+        if self.recorder:
+            self.recorder.connect(connection, endpoint)
+        return connection
+
+    def _close_connection(self, websocket, connection: int):
+        self._connection_ids.pop(websocket, None)
+        self._connection_endpoints.pop(connection, None)
+        if self.recorder:
+            self.recorder.disconnect(connection)
+
     async def _handle_client(self, websocket: WebSocketServerProtocol):
         """Handle WebSocket client connection"""
         
         logger.info(f"Client connected: {websocket.remote_address}")
-        self.clients.add(websocket)
+        connection = self._open_connection(websocket, ENDPOINT_SPRITE)
+        self.hub.join(websocket)
+        
+        # 🚨 每个连接独立的 realtime / control / speech 通道，speak 不再阻塞参数流
+        lanes = CommandLanes(
+            lambda msg_type, msg_data: self._dispatch(websocket, msg_type, msg_data),
+            name=str(websocket.remote_address)
+        )
+        lanes.start()
+        self._client_lanes[websocket] = lanes
         
         try:
             async for message in websocket:
-                await self._process_message(websocket, message)
+                await self._process_message(websocket, message, lanes)
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"Client disconnected: {websocket.remote_address}")
         except Exception as e:
             logger.error(f"Client error: {e}")
         finally:
-            self.clients.discard(websocket)
+            self.hub.leave(websocket)
+            self._codecs.pop(websocket, None)
+            self.sequencer.cancel_owner(websocket)
+            self._client_lanes.pop(websocket, None)
+            self._close_connection(websocket, connection)
+            lanes.close()
+            if getattr(websocket, "is_local", False):
+                await websocket.close()
+
+    async def _handle_stream(self, websocket: WebSocketServerProtocol):
+        """🚨 最新值优先的参数流连接：不加入事件中枢、不回复；帧到达即合并，旧值被新值覆盖后直接丢弃"""
+        logger.info(f"Stream client connected: {websocket.remote_address}")
+        stream = LatestWinsStream()
+        self._streams.add(stream)
+        connection = self._open_connection(websocket, ENDPOINT_STREAM)
+        applier = asyncio.get_running_loop().create_task(self._apply_stream(stream))
+
+        try:
+            async for message in websocket:
+                if self.recorder:
+                    self.recorder.inbound(connection, message)
+                if not stream.merge(message) and stream.rejected == 1:
+                    logger.warning(f"Stream {websocket.remote_address} sent an unsupported frame (dropped, no reply)")
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"Stream client error: {e}")
+        finally:
+            applier.cancel()
+            self._flush_stream(stream)  # Values that arrived just before the close still count
+            self._streams.discard(stream)
+            for key, value in stream.stats().items():
+                self._stream_totals[key] += value
+            self._close_connection(websocket, connection)
+            logger.info(f"Stream client disconnected: {websocket.remote_address} {stream.stats()}")
+
+    async def _handle_vts(self, websocket: WebSocketServerProtocol):
+        """🚨 VTube Studio 兼容连接：每个请求一个响应；注入请求合并为一次参数批量写入"""
+        logger.info(f"🎭 VTS client connected: {websocket.remote_address}")
+        session = VtsSession()
+        self._vts_sessions += 1
+        connection = self._open_connection(websocket, ENDPOINT_VTS)
+
+        try:
+            async for message in websocket:
+                started = time.perf_counter()
+                if self.recorder:
+                    self.recorder.inbound(connection, message)
+                response = self.vts.handle(session, message)
+                await websocket.send(self._encode(websocket, response))
+                if self.recorder:
+                    self.recorder.outbound(connection, response)
+                self._record_command("vts", time.perf_counter() - started)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.error(f"VTS client error: {e}")
+        finally:
+            self._vts_sessions -= 1
+            self._close_connection(websocket, connection)
+            logger.info(f"🎭 VTS client disconnected: {websocket.remote_address} ({session.plugin_name or 'unnamed'})")
+
+    async def _apply_stream(self, stream: LatestWinsStream):
+        """Apply the merged update whenever the loop gets to it (one staging call per burst)"""
+        while True:
+            await stream.ready.wait()
+            self._flush_stream(stream)
 
-    async def _process_message(self, websocket: WebSocketServerProtocol, message: str):
-        """Process incoming WebSocket message"""
+    def _flush_stream(self, stream: LatestWinsStream):
+        params, look_at = stream.take()
+        if params:
+            self._apply_parameter_batch(params)
+        if look_at is not None:
+            self._apply_look_at(*look_at)
+
+    def stream_stats(self) -> dict:
+        """Stream endpoint counters across open and closed connections"""
+        totals = dict(self._stream_totals)
+        for stream in self._streams:
+            for key, value in stream.stats().items():
+                totals[key] += value
+        return totals
+
+    async def _process_message(self, websocket: WebSocketServerProtocol, message,
+                               lanes: Optional[CommandLanes] = None):
+        """Process incoming WebSocket message (inline, or routed to per-client lanes)"""
+
+        if self.recorder:
+            self.recorder.inbound(self._connection_ids.get(websocket, 0), message)
+
+        if isinstance(message, bytes):
+            await self._process_binary(websocket, message)
+            return
 
         try:
-            data = json.loads(message)
+            # 进程内客户端直接传 dict，跳过 JSON 解析
+            data = message if isinstance(message, dict) else json.loads(message)
             msg_type = data.get("type")
             msg_data = data.get("data", {})
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON: {e}")
+            await self._send_error(websocket, "Invalid JSON")
+            return
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            await self._send_error(websocket, str(e))
+            return
+        # 🚨 type 必须是字符串（列表等不可哈希值会让通道路由抛 TypeError 并断开连接）
+        if not isinstance(msg_type, str):
+            await self._send_error(websocket, "Message type must be a string")
+            return
+        if msg_data is None:
+            msg_data = {}
+        elif not isinstance(msg_data, dict):
+            await self._send_error(websocket, f"{msg_type}: data must be an object")
+            return
+
+        logger.debug(f"Received {msg_type}: {msg_data}")
+
+        if lanes is None:
+            await self._dispatch(websocket, msg_type, msg_data)
+            return
 
-            logger.debug(f"Received {msg_type}: {msg_data}")
+        try:
+            await lanes.submit(msg_type, msg_data)
+        except LaneFullError as e:
+            logger.warning(f"Dropping {msg_type} from {websocket.remote_address}: {e}")
+            await self._send_error(websocket, str(e))
+
+    async def _dispatch(self, websocket: WebSocketServerProtocol, msg_type: str, msg_data: dict):
+        """Dispatch a decoded message to its handler"""
 
+        started = time.perf_counter()
+        try:
             if msg_type == "expression":
                 await self._handle_expression(msg_data, websocket)
             elif msg_type == "motion":
@@ -136,6 +686,18 @@ class WebSocketServer:
                 await self._handle_parameter(msg_data, websocket)
             elif msg_type == "parameter_batch":
                 await self._handle_parameter_batch(msg_data, websocket)
+            elif msg_type == "parameter_target":
+                await self._handle_parameter_target(msg_data, websocket)
+            elif msg_type == "timeline_upload":
+                await self._handle_timeline_upload(msg_data, websocket)
+            elif msg_type == "timeline_play":
+                await self._handle_timeline_play(msg_data, websocket)
+            elif msg_type == "timeline_stop":
+                await self._handle_timeline_stop(msg_data, websocket)
+            elif msg_type == "sequence":
+                await self._handle_sequence(msg_data, websocket)
+            elif msg_type == "sequence_cancel":
+                await self._handle_sequence_cancel(msg_data, websocket)
             elif msg_type == "look_at":
                 await self._handle_look_at(msg_data, websocket)
             elif msg_type == "background":
@@ -144,53 +706,111 @@ class WebSocketServer:
                 await self._handle_message(msg_data, websocket)
             elif msg_type == "speak":
                 await self._handle_speak(msg_data, websocket)
+            elif msg_type == "tts_warmup":
+                await self._handle_tts_warmup(msg_data, websocket)
             elif msg_type == "get_status":
                 await self._handle_status(websocket)
+            elif msg_type == "get_metrics":
+                await self._send_response(websocket, "metrics", self.metrics.snapshot())
             elif msg_type == "window":
                 await self._handle_window(msg_data, websocket)
+            elif msg_type == "binary_negotiate":
+                await self._handle_binary_negotiate(msg_data, websocket)
+            elif msg_type == "subscribe":
+                await self._handle_subscribe(msg_data, websocket, subscribe=True)
+            elif msg_type == "unsubscribe":
+                await self._handle_subscribe(msg_data, websocket, subscribe=False)
             else:
                 await self._send_error(websocket, f"Unknown message type: {msg_type}")
 
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON: {e}")
-            await self._send_error(websocket, "Invalid JSON")
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             await self._send_error(websocket, str(e))
+        finally:
+            self._record_command(msg_type, time.perf_counter() - started)
+
+    async def _process_binary(self, websocket: WebSocketServerProtocol, frame: bytes):
+        """Process a binary frame (requires binary_negotiate first)"""
+        started = time.perf_counter()
+        try:
+            await self._apply_binary(websocket, frame)
+        finally:
+            self._record_command("binary", time.perf_counter() - started)
+
+    async def _apply_binary(self, websocket: WebSocketServerProtocol, frame: bytes):
+        codec = self._codecs.get(websocket)
+        if codec is None:
+            await self._send_error(websocket, "Binary frame received before binary_negotiate")
+            return
+
+        try:
+            kind = wire_format.frame_kind(frame)
+            if kind == wire_format.KIND_PARAMETER_BATCH:
+                self._apply_parameter_batch(codec.decode_parameter_batch(frame))
+            elif kind == wire_format.KIND_LOOK_AT:
+                self._apply_look_at(*wire_format.decode_look_at(frame))
+            else:
+                await self._send_error(websocket, f"Unsupported binary frame kind: {kind}")
+        except (WireFormatError, struct.error) as e:
+            logger.debug(f"Invalid binary frame: {e}")
+            await self._send_error(websocket, f"Invalid binary frame: {e}")
+
+    async def _handle_binary_negotiate(self, data: dict, websocket: WebSocketServerProtocol):
+        """协商二进制参数帧：客户端提供参数名顺序表，之后用索引发送"""
+        params = data.get("params", [])
+        if not isinstance(params, list) or not params:
+            await self._send_error(websocket, "binary_negotiate requires a non-empty 'params' list")
+            return
+
+        try:
+            self._codecs[websocket] = ParamCodec(params)
+        except WireFormatError as e:
+            await self._send_error(websocket, str(e))
+            return
+        self.hub.set_binary(websocket)
+
+        await self._send_response(websocket, "binary_negotiated", {
+            "version": wire_format.WIRE_VERSION,
+            "param_count": len(params)
+        })
+        logger.info(f"🔢 Binary wire format negotiated: {len(params)} params")
+
+    async def _handle_subscribe(self, data: dict, websocket: WebSocketServerProtocol, subscribe: bool):
+        """订阅/取消订阅服务器推送的主题 (lip_sync, touch, state, metrics)"""
+        topics = data.get("topics", [])
+        try:
+            if subscribe:
+                current = self.hub.subscribe(websocket, topics)
+            else:
+                current = self.hub.unsubscribe(websocket, topics)
+        except ValueError as e:
+            await self._send_error(websocket, str(e))
+            return
+
+        await self._send_response(websocket, "subscribed" if subscribe else "unsubscribed", {
+            "topics": sorted(current)
+        })
 
     async def _handle_expression(self, data: dict, websocket: WebSocketServerProtocol):
         """Handle expression change request"""
         name = data.get("name", "normal")
         logger.info(f"Handling expression request: {name}")
 
-        # Get the live2d view
-        live2d_view = self.sprite_window.live2d_view
+        # Check if the expression exists
+        available = self.backend.available_expressions()
         
-        # Check if the expression exists in live2d_view
-        actual_name = None
-        available = []
-        if live2d_view:
-            if hasattr(live2d_view, 'get_available_expressions'):
-                available = live2d_view.get_available_expressions()
-            
-            # 🚨 直接查找原始名称，不做映射
-            if hasattr(live2d_view, 'find_expression'):
-                actual_name = live2d_view.find_expression(name)
-                logger.info(f"find_expression('{name}') returned '{actual_name}'")
+        # 🚨 直接查找原始名称，不做映射
+        actual_name = self.backend.find_expression(name)
+        logger.info(f"find_expression('{name}') returned '{actual_name}'")
 
         if not actual_name:
             await self._send_error(websocket, f"Expression '{name}' not found. Available: {available[:10]}...")
             logger.warning(f"❌ Expression not found: {name}")
             return
 
-        # Call set_expression on sprite_window (thread-safe)
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "set_expression",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, name)
-        )
+        # Queued on the sprite's own thread (non-blocking)
+        self.backend.set_expression(name)
+        self.hub.update_state(expression=actual_name)
 
         await self._send_response(websocket, "expression_set", {
             "requested_name": name,
@@ -205,14 +825,7 @@ class WebSocketServer:
         index = data.get("index", 0)
         priority = data.get("priority", 2)
 
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "trigger_motion",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, group),
-            Q_ARG(int, index)
-        )
+        self.backend.trigger_motion(group, index)
 
         await self._send_response(websocket, "motion_triggered", {"group": group, "index": index})
         logger.info(f"Motion triggered: {group}[{index}]")
@@ -226,24 +839,16 @@ class WebSocketServer:
             await self._send_error(websocket, "Parameter ID is required")
             return
         
-        # Get the live2d view
-        live2d_view = self.sprite_window.live2d_view
-        if not live2d_view or not hasattr(live2d_view, 'set_parameter'):
-            await self._send_error(websocket, "Live2D view not available")
-            return
-        
         # 尝试获取当前值
-        current_value = live2d_view.get_parameter(param_id)
+        current_value = self.backend.get_parameter(param_id)
         
-        # 调用 set_parameter 方法
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "set_parameter",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, param_id),
-            Q_ARG(float, float(value))
-        )
+        # 🚨 写入暂存表，由渲染线程在下一帧应用（不再逐个排队 Qt 调用）
+        try:
+            self.backend.stage_parameters({param_id: float(value)})
+        except RuntimeError as e:
+            await self._send_error(websocket, str(e))
+            return
+        self.hub.update_parameters({param_id: float(value)})
         
         await self._send_response(websocket, "parameter_set", {
             "param_id": param_id,
@@ -254,64 +859,155 @@ class WebSocketServer:
 
     async def _handle_parameter_batch(self, data: dict, websocket: WebSocketServerProtocol):
         """批量设置参数 - 高效处理鼠标跟随"""
-        params = data.get("params", {})
+        self._apply_parameter_batch(data.get("params", {}))
         
+        # 降低日志频率，只在需要时输出
+        # logger.debug(f"✅ Parameters batch set: {len(params)} params")
+
+    def _apply_parameter_batch(self, params: dict):
+        """写入参数暂存表（JSON 与二进制帧共用）"""
         if not params:
             return
         
-        live2d_view = self.sprite_window.live2d_view
-        if not live2d_view or not hasattr(live2d_view, 'set_parameter'):
+        # 🚨 批量写入暂存表：无论消息频率多高，每帧只跨线程应用一次
+        # 先统一转成 float：状态缓存存的就是写入暂存表的值（快照与精灵显示一致）
+        values = {param_id: float(value) for param_id, value in params.items()}
+        try:
+            self.backend.stage_parameters(values)
+        except RuntimeError:
+            return  # Live2D view not available yet
+        self.hub.update_parameters(values)
+
+    async def _handle_parameter_target(self, data: dict, websocket: WebSocketServerProtocol):
+        """🚨 参数目标：客户端低频发送目标值，渲染线程每帧插值（无成功响应，出错才回复）"""
+        targets = data.get("params")
+        if targets is None and data.get("id"):
+            targets = {data["id"]: data.get("value", 0.0)}
+        if not targets:
+            await self._send_error(websocket, "parameter_target requires 'params' or 'id'")
             return
-        
-        # 批量设置参数
-        for param_id, value in params.items():
-            from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-            QMetaObject.invokeMethod(
-                self.sprite_window,
-                "set_parameter",
-                Qt.ConnectionType.QueuedConnection,
-                Q_ARG(str, param_id),
-                Q_ARG(float, float(value))
-            )
-        
-        # 降低日志频率，只在需要时输出
-        # logger.debug(f"✅ Parameters batch set: {len(params)} params")
+
+        easing = data.get("easing", EASING_EASE_OUT)
+        if easing not in EASINGS:
+            await self._send_error(websocket, f"Unknown easing: {easing} (expected one of {sorted(EASINGS)})")
+            return
+        try:
+            targets = {param_id: float(value) for param_id, value in targets.items()}
+            duration = float(data.get("duration", 300)) / 1000.0
+        except (TypeError, ValueError, AttributeError) as e:
+            await self._send_error(websocket, f"Invalid parameter_target: {e}")
+            return
+        # 🚨 拒绝 inf / NaN：duration=inf 会让参数永远停在起点，NaN 会直接写进参数表
+        if not math.isfinite(duration) or not all(math.isfinite(value) for value in targets.values()):
+            await self._send_error(websocket, "Invalid parameter_target: values and duration must be finite")
+            return
+        duration = min(max(0.0, duration), MAX_DURATION)
+
+        try:
+            self.backend.set_parameter_targets(targets, duration, easing)
+        except RuntimeError:
+            return  # Live2D view not available yet
+        self.hub.update_parameters(targets)
+
+    async def _handle_timeline_upload(self, data: dict, websocket: WebSocketServerProtocol):
+        """🚨 上传时间线：关键帧曲线编译一次，之后按名字触发"""
+        player = self.backend.timeline_player
+        if player is None:
+            await self._send_error(websocket, "Timelines not available")
+            return
+        try:
+            timeline = compile_timeline(data.get("name"), data.get("curves"), bool(data.get("loop", False)))
+            player.upload(timeline)
+        except TimelineError as e:
+            await self._send_error(websocket, str(e))
+            return
+        await self._send_response(websocket, "timeline_uploaded", timeline.describe())
+        logger.info(f"🎞️ Timeline uploaded: {timeline.name} ({timeline.keyframes} keyframes, {timeline.duration:.2f}s)")
+
+    async def _handle_timeline_play(self, data: dict, websocket: WebSocketServerProtocol):
+        """Start an uploaded timeline (evaluated by the render thread)"""
+        player = self.backend.timeline_player
+        if player is None:
+            await self._send_error(websocket, "Timelines not available")
+            return
+        loop = data.get("loop")
+        try:
+            timeline = player.play(data.get("name", ""), None if loop is None else bool(loop),
+                                   float(data.get("speed", 1.0)))
+        except (TimelineError, TypeError, ValueError) as e:
+            await self._send_error(websocket, str(e))
+            return
+        await self._send_response(websocket, "timeline_started", {
+            "name": timeline.name,
+            "duration": round(timeline.duration * 1000),
+        })
+
+    async def _handle_timeline_stop(self, data: dict, websocket: WebSocketServerProtocol):
+        """Stop one timeline (``name``) or all of them"""
+        player = self.backend.timeline_player
+        if player is None:
+            await self._send_error(websocket, "Timelines not available")
+            return
+        name = data.get("name")
+        player.stop(name)
+        await self._send_response(websocket, "timeline_stopped", {"name": name})
+
+    async def _handle_sequence(self, data: dict, websocket: WebSocketServerProtocol):
+        """🚨 命令宏：注册（register=true）或立即执行一段步骤脚本"""
+        name = data.get("name")
+        steps = data.get("steps")
+        try:
+            if data.get("register"):
+                count = self.sequencer.register(name, steps)
+                await self._send_response(websocket, "sequence_registered", {"name": name, "steps": count})
+                return
+            run = self.sequencer.start(name=name, steps=steps, owner=websocket,
+                                       lanes=self._client_lanes.get(websocket))
+        except SequenceError as e:
+            await self._send_error(websocket, str(e))
+            return
+        await self._send_response(websocket, "sequence_started", {
+            "id": run.id, "name": run.name, "steps": len(run.steps)
+        })
+        logger.info(f"🎬 Sequence started: {run.name or run.id} ({len(run.steps)} steps)")
+
+    async def _handle_sequence_cancel(self, data: dict, websocket: WebSocketServerProtocol):
+        """Cancel a running sequence by ``id`` or ``name`` (neither = all)"""
+        cancelled = self.sequencer.cancel(run_id=data.get("id"), name=data.get("name"))
+        await self._send_response(websocket, "sequence_cancelled", {"cancelled": cancelled})
+
+    def _on_sequence_done(self, run: SequenceRun):
+        """Completion event for the client that started the run"""
+        if run.owner is not None:
+            self.fanout.send_to(run.owner, {"type": "sequence_completed", "data": run.describe()})
+        logger.info(f"🎬 Sequence {run.name or run.id} {run.status} ({run.describe()['elapsed_ms']} ms)")
 
     async def _handle_look_at(self, data: dict, websocket: WebSocketServerProtocol):
         """Handle look_at request - 控制眼神看向指定位置"""
         x = data.get("x", 0.0)
         y = data.get("y", 0.0)
         
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "look_at",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(float, float(x)),
-            Q_ARG(float, float(y))
-        )
+        self._apply_look_at(x, y)
         
         await self._send_response(websocket, "looking_at", {"x": x, "y": y})
         logger.info(f"👀 Look at: ({x}, {y})")
 
+    def _apply_look_at(self, x: float, y: float):
+        """Queue a look_at on the sprite (JSON 与二进制帧共用)"""
+        self.backend.look_at(x, y)
+
     async def _handle_background(self, data: dict, websocket: WebSocketServerProtocol):
         """Handle background change request"""
         bg_type = data.get("type", "transparent")
         bg_path = data.get("path")
         
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        
         # 🚨 【修正】统一调用 set_background，并根据逻辑构造参数
         final_cmd = bg_type
         if bg_type == "image" and bg_path:
             final_cmd = f"image:{bg_path}"
         
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "set_background",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, final_cmd)
-        )
+        self.backend.set_background(final_cmd)
+        self.hub.update_state(background=final_cmd)
             
         await self._send_response(websocket, "background_set", {"type": final_cmd})
         logger.info(f"✅ Background request processed: {final_cmd}")
@@ -322,14 +1018,7 @@ class WebSocketServer:
         text = data.get("text", "")
         duration = data.get("duration", 5000)
 
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "show_message",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, text),
-            Q_ARG(int, duration)
-        )
+        self.backend.show_message(text, duration)
 
         await self._send_response(websocket, "message_shown", {"text": text})
         logger.info(f"Message shown: {text}")
@@ -345,14 +1034,7 @@ class WebSocketServer:
             return
 
         # Show message bubble
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-        QMetaObject.invokeMethod(
-            self.sprite_window,
-            "show_message",
-            Qt.ConnectionType.QueuedConnection,
-            Q_ARG(str, text),
-            Q_ARG(int, 5000)
-        )
+        self.backend.show_message(text, 5000)
 
         # Use TTS manager for speech
         if self.tts_manager and HAS_TTS:
@@ -363,9 +1045,16 @@ class WebSocketServer:
                     if provider in available:
                         self.tts_manager.set_provider(provider)
                         logger.info(f"🎙️ Switched TTS provider to: {provider}")
+                        warmup = (self._host or self).tts_warmup
+                        if warmup:
+                            warmup.restart()  # Cached lines of the old provider no longer match
 
                 # Generate and play speech
-                result = await self.tts_manager.speak(text, voice)
+                self.hub.update_state(speaking=True)
+                try:
+                    result = await self.tts_manager.speak(text, voice)
+                finally:
+                    self.hub.update_state(speaking=False)
 
                 if result.success:
                     await self._send_response(websocket, "speak_completed", {
@@ -397,24 +1086,51 @@ class WebSocketServer:
                 logger.warning(f"Fallback TTS failed: {e}")
                 await self._send_error(websocket, f"TTS unavailable: {str(e)}")
 
+    async def _handle_tts_warmup(self, data: dict, websocket: WebSocketServerProtocol):
+        """Queue known lines for background synthesis into the TTS cache"""
+        warmup = (self._host or self).tts_warmup
+        if warmup is None:
+            await self._send_error(websocket, "TTS warmup unavailable (no TTS manager)")
+            return
+        lines = data.get("lines")
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            await self._send_error(websocket, "tts_warmup needs 'lines': a list of strings")
+            return
+        if len(lines) > MAX_WARMUP_LINES:
+            await self._send_error(websocket, f"tts_warmup accepts at most {MAX_WARMUP_LINES} lines")
+            return
+        queued = warmup.start(lines)
+        await self._send_response(websocket, "tts_warmup_started", {"queued": queued, **warmup.stats()})
+
     async def _handle_status(self, websocket: WebSocketServerProtocol):
         """Handle status request"""
         try:
-            # Get available expressions from live2d view
-            expressions = []
-            if self.sprite_window.live2d_view and hasattr(self.sprite_window.live2d_view, 'get_available_expressions'):
-                expressions = self.sprite_window.live2d_view.get_available_expressions()
+            # Get available expressions from the sprite
+            expressions = self.backend.available_expressions()
+            x, y = self.backend.position()
 
             status = {
+                "sprite": self.name,
+                "sprites": sorted(self.sprites),
                 "state": "idle",
-                "expression": self.sprite_window.live2d_view.current_expression if self.sprite_window.live2d_view else "normal",
+                "expression": self.backend.current_expression,
                 "position": {
-                    "x": self.sprite_window.x(),
-                    "y": self.sprite_window.y()
+                    "x": x,
+                    "y": y
                 },
-                "connected_clients": len(self.clients),
+                "connected_clients": len(self.hub),
                 "available_expressions": expressions[:20],  # Return first 20
-                "total_expressions": len(expressions)
+                "total_expressions": len(expressions),
+                "outbound": self.hub.stats(),
+                "handoff": self.handoff.stats(),
+                "backend": self.backend.stats(),
+                "timelines": self.backend.timeline_player.names() if self.backend.timeline_player else [],
+                "sequences": {**self.sequencer.stats(), "names": self.sequencer.names()},
+                "stream": {**self.stream_stats(), "connections": len(self._streams)},
+                "udp": (self._host or self).udp_input.stats() if (self._host or self).udp_input else None,
+                "vts": {**self.vts.stats(), "sessions": self._vts_sessions},
+                "tts": {**self.tts_manager.stats(), "warmup": (self._host or self).tts_warmup.stats()}
+                       if self.tts_manager else None,
             }
             await self._send_response(websocket, "status", status)
         except Exception as e:
@@ -425,40 +1141,24 @@ class WebSocketServer:
         """Handle window control request"""
         action = data.get("action")
 
-        from PyQt6.QtCore import QMetaObject, Qt, Q_ARG
-
         try:
             if action == "move":
-                x = data.get("x", self.sprite_window.x())
-                y = data.get("y", self.sprite_window.y())
-                QMetaObject.invokeMethod(
-                    self.sprite_window,
-                    "set_position",
-                    Qt.ConnectionType.QueuedConnection,
-                    Q_ARG(int, x),
-                    Q_ARG(int, y)
-                )
+                current_x, current_y = self.backend.position()
+                x = data.get("x", current_x)
+                y = data.get("y", current_y)
+                self.backend.set_position(x, y)
             elif action == "opacity":
                 opacity = data.get("opacity", 1.0)
-                QMetaObject.invokeMethod(
-                    self.sprite_window,
-                    "set_opacity",
-                    Qt.ConnectionType.QueuedConnection,
-                    Q_ARG(float, opacity)
-                )
+                self.backend.set_opacity(opacity)
             elif action == "hide":
-                QMetaObject.invokeMethod(
-                    self.sprite_window,
-                    "hide",
-                    Qt.ConnectionType.QueuedConnection
-                )
+                self.backend.set_visible(False)
             elif action == "show":
-                QMetaObject.invokeMethod(
-                    self.sprite_window,
-                    "show",
-                    Qt.ConnectionType.QueuedConnection
-                )
+                self.backend.set_visible(True)
 
+            if action in ("hide", "show"):
+                self.hub.update_state(visible=(action == "show"))
+            elif action == "opacity":
+                self.hub.update_state(opacity=data.get("opacity", 1.0))
             await self._send_response(websocket, "window_updated", {"action": action})
         except Exception as e:
             logger.error(f"Window control error: {e}")
@@ -472,58 +1172,55 @@ class WebSocketServer:
                 "data": data,
                 "success": True
             }
-            await websocket.send(json.dumps(response))
+            await websocket.send(self._encode(websocket, response))
         except Exception as e:
             logger.error(f"Failed to send response: {e}")
+        if self.recorder:
+            self.recorder.outbound(self._connection_ids.get(websocket, 0), response)
 
     async def _send_error(self, websocket: WebSocketServerProtocol, error: str):
         """Send error response"""
+        self._error_responses.inc()
         try:
             response = {
                 "type": "error",
                 "data": {"message": error},
                 "success": False
             }
-            await websocket.send(json.dumps(response))
+            await websocket.send(self._encode(websocket, response))
         except Exception as e:
             logger.error(f"Failed to send error: {e}")
+        if self.recorder:
+            self.recorder.outbound(self._connection_ids.get(websocket, 0), response)
 
-    def broadcast_sync(self, msg_type: str, data: dict):
-        """🚨 【触觉反馈】线程安全的广播方法（供 Qt 线程调用）"""
-        if self.loop and self.loop.is_running():
-            # 使用 call_soon_threadsafe 将任务提交到 asyncio 事件循环
-            future = asyncio.run_coroutine_threadsafe(
-                self.broadcast(msg_type, data), 
-                self.loop
-            )
-            try:
-                future.result(timeout=1.0)  # 等待最多1秒
-            except Exception as e:
-                logger.debug(f"Broadcast sync error: {e}")
-        else:
-            logger.warning("WebSocket loop not running, cannot broadcast")
+    @staticmethod
+    def _encode(websocket, message: dict):
+        """JSON for network clients; in-process peers get the dict itself"""
+        return message if getattr(websocket, "is_local", False) else json.dumps(message)
 
-    async def broadcast(self, msg_type: str, data: dict):
-        """Broadcast message to all connected clients"""
-        if not self.clients:
-            logger.debug("No clients connected, skipping broadcast")
-            return
+    def broadcast_sync(self, msg_type: str, data: dict) -> bool:
+        """🚨 【触觉反馈】线程安全的广播方法（供 Qt 线程调用）
 
-        message = json.dumps({"type": msg_type, "data": data})
-        logger.info(f"📢 Broadcasting to {len(self.clients)} clients: {msg_type}")
-        disconnected = set()
+        Fire-and-forget: hands the event to the asyncio loop and returns
+        immediately. Returns False if the event was dropped (loop not running
+        or handoff queue full); drops and latency are counted in get_status.
+        """
+        if not self.handoff.post(self.publish, msg_type, data):
+            logger.warning(f"Broadcast dropped (loop not running or handoff full): {msg_type}")
+            return False
+        return True
 
-        for client in self.clients:
-            try:
-                await client.send(message)
-                logger.debug(f"Message sent to {client.remote_address}")
-            except websockets.exceptions.ConnectionClosed:
-                disconnected.add(client)
-            except Exception as e:
-                logger.error(f"Broadcast error: {e}")
-                disconnected.add(client)
+    async def broadcast(self, msg_type: str, data: dict, topic: Optional[str] = None):
+        """Broadcast message to clients subscribed to its topic (encoded once, queued per client)"""
+        self.publish(msg_type, data, topic)
+
+    def publish(self, msg_type: str, data: dict, topic: Optional[str] = None):
+        """Publish an event on the loop thread (non-blocking)"""
+        topic = topic or topic_for(msg_type)
+        subscribers = self.hub.subscriber_count(topic)
+        if not subscribers:
+            logger.debug(f"No subscribers for '{topic}', skipping broadcast")
+            return
 
-        # Clean up disconnected clients
-        if disconnected:
-            self.clients -= disconnected
-            logger.info(f"Cleaned up {len(disconnected)} disconnected clients")
+        logger.info(f"📢 Broadcasting to {subscribers} clients: {msg_type}")
+        self.hub.publish({"type": msg_type, "data": data}, topic=topic)
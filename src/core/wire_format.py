@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Wire Format - Compact binary frames for high-rate parameter streams
+
+The JSON protocol repeats full parameter names ("ParamEyeBallX") in every
+frame. A client can instead negotiate a per-connection parameter index table
+once and then send binary WebSocket frames of packed (uint16 index, float32
+value) pairs.
+
+Negotiation (JSON):
+    {"type": "binary_negotiate", "data": {"params": ["ParamAngleX", ...]}}
+
+Binary frame layout (little endian):
+    uint8  version (WIRE_VERSION)
+    uint8  kind    (KIND_*)
+    ...    payload
+
+    KIND_PARAMETER_BATCH: uint16 count, count * (uint16 index, float32 value)
+    KIND_LOOK_AT:         float32 x, float32 y
+    KIND_LIP_SYNC:        float32 value, float32 raw_value   (server -> client)
+    KIND_NAMED_PARAMETERS: uint32 seq, uint16 count,
+                          count * (uint8 name_len, name (UTF-8), float32 value)
+                          (UDP input: no negotiation, one datagram per frame)
+"""
+
+import struct
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+WIRE_VERSION = 1
+
+KIND_PARAMETER_BATCH = 1
+KIND_LOOK_AT = 2
+KIND_LIP_SYNC = 3
+KIND_NAMED_PARAMETERS = 4
+
+MAX_TABLE_SIZE = 0xFFFF
+
+_HEADER = struct.Struct("<BB")
+_BATCH_HEADER = struct.Struct("<BBH")
+_PAIR = struct.Struct("<Hf")
+_TWO_FLOATS = struct.Struct("<BBff")
+_NAMED_HEADER = struct.Struct("<BBIH")
+_FLOAT = struct.Struct("<f")
+
+
+class WireFormatError(ValueError):
+    """Raised for malformed or un-negotiated binary frames"""
+
+
+class ParamCodec:
+    """
+    Session-interned parameter index table and frame codec.
+
+    One instance per connection; both peers build it from the same ordered
+    list of parameter names sent in ``binary_negotiate``.
+    """
+
+    def __init__(self, params: Sequence[str]):
+        if len(params) > MAX_TABLE_SIZE:
+            raise WireFormatError(f"Parameter table too large: {len(params)} > {MAX_TABLE_SIZE}")
+        self.names: List[str] = [str(p) for p in params]
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+    def encode_parameter_batch(self, params: Mapping[str, float]) -> bytes:
+        """Encode a {param_id: value} dict; every name must be in the table"""
+        index = self.index
+        parts = [_BATCH_HEADER.pack(WIRE_VERSION, KIND_PARAMETER_BATCH, len(params))]
+        pack = _PAIR.pack
+        try:
+            for param_id, value in params.items():
+                parts.append(pack(index[param_id], value))
+        except KeyError as e:
+            raise WireFormatError(f"Parameter not in negotiated table: {e.args[0]}")
+        return b"".join(parts)
+
+    def decode_parameter_batch(self, frame: bytes) -> Dict[str, float]:
+        """Decode a KIND_PARAMETER_BATCH frame into a {param_id: value} dict"""
+        _, _, count = _BATCH_HEADER.unpack_from(frame)
+        body = memoryview(frame)[_BATCH_HEADER.size:]
+        if len(body) != count * _PAIR.size:
+            raise WireFormatError(f"Truncated parameter batch: expected {count} pairs")
+        names = self.names
+        try:
+            return {names[i]: v for i, v in _PAIR.iter_unpack(body)}
+        except IndexError:
+            raise WireFormatError("Parameter index out of negotiated table range")
+
+
+def frame_kind(frame: bytes) -> int:
+    """Validate the header and return the frame kind"""
+    if len(frame) < _HEADER.size:
+        raise WireFormatError("Binary frame too short")
+    version, kind = _HEADER.unpack_from(frame)
+    if version != WIRE_VERSION:
+        raise WireFormatError(f"Unsupported wire version: {version}")
+    return kind
+
+
+def encode_look_at(x: float, y: float) -> bytes:
+    return _TWO_FLOATS.pack(WIRE_VERSION, KIND_LOOK_AT, x, y)
+
+
+def decode_look_at(frame: bytes) -> Tuple[float, float]:
+    if len(frame) != _TWO_FLOATS.size:
+        raise WireFormatError("Malformed look_at frame")
+    _, _, x, y = _TWO_FLOATS.unpack(frame)
+    return x, y
+
+
+def encode_lip_sync(value: float, raw_value: float) -> bytes:
+    return _TWO_FLOATS.pack(WIRE_VERSION, KIND_LIP_SYNC, value, raw_value)
+
+
+def decode_lip_sync(frame: bytes) -> Tuple[float, float]:
+    if len(frame) != _TWO_FLOATS.size:
+        raise WireFormatError("Malformed lip_sync frame")
+    _, _, value, raw_value = _TWO_FLOATS.unpack(frame)
+    return value, raw_value
+
+
+def encode_named_parameters(seq: int, params: Mapping[str, float]) -> bytes:
+    """Self-describing parameter frame with a sequence number (UDP input)"""
+    parts = [_NAMED_HEADER.pack(WIRE_VERSION, KIND_NAMED_PARAMETERS, seq & 0xFFFFFFFF, len(params))]
+    for param_id, value in params.items():
+        name = param_id.encode()
+        if len(name) > 0xFF:
+            raise WireFormatError(f"Parameter name too long: {param_id}")
+        parts.append(bytes((len(name),)) + name + _FLOAT.pack(value))
+    return b"".join(parts)
+
+
+def decode_named_parameters(frame: bytes) -> Tuple[int, Dict[str, float]]:
+    """Decode a KIND_NAMED_PARAMETERS frame into (seq, {param_id: value})"""
+    if len(frame) < _NAMED_HEADER.size:
+        raise WireFormatError("Truncated named parameter frame")
+    _, _, seq, count = _NAMED_HEADER.unpack_from(frame)
+    params = {}
+    offset = _NAMED_HEADER.size
+    unpack_float = _FLOAT.unpack_from
+    try:
+        for _ in range(count):
+            end = offset + 1 + frame[offset]
+            params[frame[offset + 1:end].decode()] = unpack_float(frame, end)[0]
+            offset = end + _FLOAT.size
+    except (IndexError, struct.error, UnicodeDecodeError):
+        raise WireFormatError("Truncated named parameter frame") from None
+    if offset != len(frame):
+        raise WireFormatError("Trailing bytes after named parameter frame")
+    return seq, params
@@ -121,6 +121,13 @@ async def interactive_mode():
     print()
     
     async with websockets.connect(uri) as ws:
+        # Only read command responses: opt out of server-pushed events (touch, state)
+        await ws.send(json.dumps({
+            "type": "unsubscribe",
+            "data": {"topics": ["*"]}
+        }))
+        await ws.recv()
+
         while True:
             try:
                 cmd = input("Sherry> ").strip()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+TTS streaming benchmark - time to first sound, file pipeline vs streaming
+
+Replays a synthesis stream (a recorded edge-tts stream, or a generated WAV
+tone) with a simulated service latency and delivery rate, and measures when
+the first sample reaches the player:
+
+- file:   wait for the whole stream, write the file, analyze it, then play
+          (the EdgeTTS CLI path, minus its interpreter start and ffprobe)
+- stream: decode / analyze / play chunk by chunk (TTSManager streaming path)
+
+The sink is a NullSink (real-time, headless), so no audio device is needed.
+
+Usage:
+    python tools/benchmarks/bench_tts_stream.py [--latency 0.15] [--speed 4]
+    python tools/benchmarks/bench_tts_stream.py --replay stream.mp3      # needs ffmpeg
+    python tools/benchmarks/bench_tts_stream.py --record stream.mp3 --text "主人早安～"  # needs edge-tts
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from src.core.audio_sink import NullSink
+from src.core.tts_manager import AudioAnalyzer
+from src.core.tts_stream import (
+    EDGE_MP3_BITRATE, PCM_SAMPLE_RATE, RecordedStream, StreamingAmplitude,
+    decode_stream, edge_tts_chunks, record_stream,
+)
+
+CHUNK_BYTES = 4800  # 100 ms of 24 kHz 16-bit mono
+
+
+def tone_wav(seconds: float, rate: int = PCM_SAMPLE_RATE) -> bytes:
+    samples = b"".join(struct.pack("<h", int(8000 * math.sin(i * 2 * math.pi * 220 / rate) * (i // 2400 % 2)))
+                       for i in range(int(rate * seconds)))
+    return (b"RIFF" + struct.pack("<I", 36 + len(samples)) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", len(samples)) + samples)
+
+
+def make_stream(data: bytes, seconds: float, latency: float, speed: float) -> RecordedStream:
+    """Deliver ``seconds`` of audio ``speed`` times faster than real time after ``latency``"""
+    chunks = max(1, math.ceil(len(data) / CHUNK_BYTES))
+    return RecordedStream(data, CHUNK_BYTES, latency, seconds / speed / chunks)
+
+
+async def file_pipeline(stream: RecordedStream, suffix: str) -> float:
+    started = time.monotonic()
+    data = bytearray()
+    async for chunk in stream:
+        data += chunk
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    AudioAnalyzer().analyze_amplitude(path)
+    player = NullSink(realtime=False)
+    async for pcm in decode_stream(RecordedStream(path)):
+        await player.write(pcm)
+        break  # First sound
+    os.unlink(path)
+    return player.started_at - started
+
+
+async def stream_pipeline(stream: RecordedStream) -> float:
+    started = time.monotonic()
+    player = NullSink()
+    analyzer = None
+    async for pcm in decode_stream(stream):
+        analyzer = analyzer or StreamingAmplitude()
+        analyzer.feed(pcm)
+        await player.write(pcm)
+    return player.started_at - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="TTS time-to-first-sound benchmark")
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated service latency (s)")
+    parser.add_argument("--speed", type=float, default=4.0, help="Delivery rate vs real time")
+    parser.add_argument("--replay", help="Recorded stream to replay instead of generated tones")
+    parser.add_argument("--record", help="Record a live edge-tts stream to this file and exit")
+    parser.add_argument("--text", default="主人早安！今天也要元气满满哦～ 雪莉已经等您好久了呢。")
+    parser.add_argument("--voice", default="zh-CN-XiaoxiaoNeural")
+    args = parser.parse_args()
+
+    if args.record:
+        size = await record_stream(edge_tts_chunks(args.text, args.voice), args.record)
+        print(f"Recorded {size} bytes to {args.record}")
+        return
+
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            data = f.read()
+        seconds = len(data) * 8 / EDGE_MP3_BITRATE
+        cases = [(f"{os.path.basename(args.replay)} ({seconds:.1f}s)", data, seconds, ".mp3")]
+    else:
+        cases = [(f"{s:.0f}s sentence", tone_wav(s), s, ".wav") for s in (1.0, 3.0, 8.0)]
+
+    print(f"latency {args.latency * 1000:.0f} ms, delivery {args.speed:g}x real time\n")
+    print(f"{'case':<24}{'file ms':>10}{'stream ms':>12}")
+    for label, data, seconds, suffix in cases:
+        file_ms = await file_pipeline(make_stream(data, seconds, args.latency, args.speed), suffix) * 1000
+        stream_ms = await stream_pipeline(make_stream(data, seconds, args.latency, args.speed)) * 1000
+        print(f"{label:<24}{file_ms:>10.0f}{stream_ms:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Wire format benchmark - JSON vs binary parameter frames
+
+Measures encode + decode + dispatch cost per 1k frames through the real
+WebSocketServer._process_message path (NullSpriteBackend, no network),
+for the mouse-follow batch (4 params) and a full face-tracking batch (16 params).
+
+Usage:
+    python tools/benchmarks/bench_wire_format.py [--frames 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from loguru import logger
+
+from src.core.sprite_backend import NullSpriteBackend
+from src.core.wire_format import ParamCodec
+from src.core.websocket_server import WebSocketServer
+
+MOUSE_PARAMS = ["ParamAngleX", "ParamAngleY", "ParamEyeBallX", "ParamEyeBallY"]
+FACE_PARAMS = MOUSE_PARAMS + [
+    "ParamAngleZ", "ParamBodyAngleX", "ParamBodyAngleY", "ParamBodyAngleZ",
+    "ParamEyeLOpen", "ParamEyeROpen", "ParamMouthOpenY", "ParamMouthForm",
+    "ParamBrowLY", "ParamBrowRY", "ParamBrowLForm", "ParamBrowRForm",
+]
+
+
+class SinkSocket:
+    """Fake websocket that swallows responses"""
+    remote_address = ("bench", 0)
+
+    async def send(self, message):
+        pass
+
+
+def make_frames(names, n):
+    return [{name: round(random.uniform(-30, 30), 3) for name in names} for _ in range(n)]
+
+
+async def bench(server, names, frames, label):
+    table = server.backend.parameter_table
+    ws = SinkSocket()
+    codec = ParamCodec(names)
+    await server._handle_binary_negotiate({"params": names}, ws)
+
+    # JSON path
+    t0 = time.perf_counter()
+    json_bytes = 0
+    for params in frames:
+        message = json.dumps({"type": "parameter_batch", "data": {"params": params}})
+        json_bytes += len(message)
+        await server._process_message(ws, message)
+    json_s = time.perf_counter() - t0
+    table.drain()
+
+    # Binary path
+    t0 = time.perf_counter()
+    bin_bytes = 0
+    for params in frames:
+        frame = codec.encode_parameter_batch(params)
+        bin_bytes += len(frame)
+        await server._process_message(ws, frame)
+    bin_s = time.perf_counter() - t0
+    table.drain()
+
+    n = len(frames)
+    result = {
+        "batch": label,
+        "params_per_frame": len(names),
+        "json_us_per_1k": round(json_s / n * 1e9, 1),
+        "binary_us_per_1k": round(bin_s / n * 1e9, 1),
+        "speedup": round(json_s / bin_s, 2),
+        "json_bytes_per_frame": round(json_bytes / n, 1),
+        "binary_bytes_per_frame": round(bin_bytes / n, 1),
+    }
+    return result
+
+
+async def main(n_frames: int):
+    server = WebSocketServer(backend=NullSpriteBackend(max_calls=0))
+    results = []
+    for names, label in ((MOUSE_PARAMS, "mouse_follow"), (FACE_PARAMS, "face_tracking")):
+        frames = make_frames(names, n_frames)
+        results.append(await bench(server, names, frames, label))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs binary parameter frames")
+    parser.add_argument("--frames", type=int, default=20000, help="frames per run")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    asyncio.run(main(args.frames))
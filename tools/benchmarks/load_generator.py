@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Load generator - N simulated clients, end-to-end latency to the rendered frame
+
+Starts a WebSocketServer on a NullSpriteBackend with a simulated render
+thread, then connects N clients (same protocol as tests/test_client.py) that
+send ``parameter_batch`` at a fixed rate, mixed with occasional
+``expression`` / ``message`` / ``get_status`` commands.
+
+Every client writes its own parameter ids and uses a sequence number as the
+value, so each write can be matched to the frame that applied it:
+
+- apply latency: send -> first rendered frame containing that value
+- coalesced:     values overwritten before any frame applied them
+- command RTT:   send -> response, per command type
+- CPU:           server event loop + render threads (psutil per-thread times)
+- memory:        process RSS
+
+With ``--stream`` each client sends its parameter stream on a second
+connection to ``/sprite/stream`` (latest-wins, no responses) and keeps
+``/sprite`` for control commands only.
+
+Runs every (clients, rate) combination and prints one JSON document, so
+results can be tracked across versions.
+
+Usage:
+    python tools/benchmarks/load_generator.py --clients 1,10,50 --rates 15,30,60 --duration 10
+    python tools/benchmarks/load_generator.py --clients 50 --rates 60 --stream
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import psutil
+import websockets
+from loguru import logger
+
+from src.core.metrics import LatencyHistogram
+from src.core.sprite_backend import NullSpriteBackend
+from src.core.websocket_server import WebSocketServer
+from src.core.wire_format import ParamCodec
+
+PARAM_SUFFIXES = ("AngleX", "AngleY", "EyeBallX", "EyeBallY")
+
+# Control commands mixed into the parameter stream: (type, data, response type)
+CONTROL_COMMANDS = [
+    ("expression", {"name": "happy"}, "expression_set"),
+    ("message", {"text": "load test", "duration": 1000}, "message_shown"),
+    ("get_status", {}, "status"),
+]
+
+
+class SimulatedClient:
+    """One client: parameter stream at ``rate`` Hz plus occasional control commands"""
+
+    def __init__(self, index: int, uri: str, rate: float, control_interval: float, binary: bool,
+                 stream: bool = False):
+        self.index = index
+        self.uri = uri
+        self.stream = stream
+        self.rate = rate
+        self.control_interval = control_interval
+        self.binary = binary
+        self.params = [f"Load{index}{suffix}" for suffix in PARAM_SUFFIXES]
+        self.sent_at = {}          # seq -> send time
+        self.late = 0              # Ticks that started behind schedule
+        self.pending = defaultdict(deque)  # response type -> send times (FIFO)
+        self.rtt = defaultdict(LatencyHistogram)
+        self.errors = 0
+
+    async def run(self, stop_at: float):
+        async with websockets.connect(self.uri, max_queue=None) as ws:
+            await ws.send(json.dumps({"type": "unsubscribe", "data": {"topics": ["*"]}}))
+            await ws.recv()
+            param_ws = await websockets.connect(f"{self.uri}/stream") if self.stream else ws
+            codec = None
+            if self.binary:
+                await param_ws.send(json.dumps({"type": "binary_negotiate", "data": {"params": self.params}}))
+                if not self.stream:
+                    await ws.recv()  # The stream endpoint never replies
+                codec = ParamCodec(self.params)
+
+            reader = asyncio.create_task(self._read(ws))
+            try:
+                await self._send_loop(ws, param_ws, codec, stop_at)
+                await asyncio.sleep(0.5)  # Let the last responses arrive
+            finally:
+                reader.cancel()
+                if param_ws is not ws:
+                    await param_ws.close()
+
+    async def _send_loop(self, ws, param_ws, codec, stop_at: float):
+        interval = 1.0 / self.rate
+        next_tick = time.perf_counter()
+        next_control = time.perf_counter() + random.uniform(0, self.control_interval)
+        seq = 0
+        while time.perf_counter() < stop_at:
+            seq += 1
+            params = {name: float(seq) for name in self.params}
+            self.sent_at[seq] = time.time()
+            if codec:
+                await param_ws.send(codec.encode_parameter_batch(params))
+            else:
+                await param_ws.send(json.dumps({"type": "parameter_batch", "data": {"params": params}}))
+
+            now = time.perf_counter()
+            if now >= next_control:
+                msg_type, data, response_type = random.choice(CONTROL_COMMANDS)
+                self.pending[response_type].append(time.perf_counter())
+                await ws.send(json.dumps({"type": msg_type, "data": data}))
+                next_control = now + self.control_interval
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.late += 1
+                next_tick = time.perf_counter()
+
+    async def _read(self, ws):
+        async for message in ws:
+            received = time.perf_counter()
+            if isinstance(message, bytes):
+                continue
+            response = json.loads(message)
+            response_type = response.get("type")
+            if response_type == "error":
+                self.errors += 1
+            elif self.pending[response_type]:
+                self.rtt[response_type].record(received - self.pending[response_type].popleft())
+
+
+def server_thread_ids(server: WebSocketServer, backend: NullSpriteBackend) -> set:
+    ids = set()
+    for thread in (server.thread, backend._render_thread):
+        if thread is not None and thread.native_id is not None:
+            ids.add(thread.native_id)
+    return ids
+
+
+def thread_cpu_seconds(process: psutil.Process, ids: set) -> float:
+    try:
+        return sum(t.user_time + t.system_time for t in process.threads() if t.id in ids)
+    except (psutil.AccessDenied, NotImplementedError):
+        return 0.0
+
+
+def collect_apply_latency(clients, backend: NullSpriteBackend) -> dict:
+    """Match rendered frames back to the writes they applied"""
+    owner = {}
+    for client in clients:
+        owner[client.params[0]] = client
+
+    latency = LatencyHistogram()
+    applied = set()
+    for call in backend.calls_of("frame"):
+        staged = call.args[0]
+        for name, value in staged.items():
+            client = owner.get(name)
+            if client is None:
+                continue
+            key = (client.index, int(value))
+            if key in applied:
+                continue
+            sent_at = client.sent_at.get(int(value))
+            if sent_at is not None:
+                applied.add(key)
+                latency.record(call.timestamp - sent_at)
+
+    sent = sum(len(c.sent_at) for c in clients)
+    return {
+        "sent": sent,
+        "applied": len(applied),
+        "coalesced": sent - len(applied),
+        "latency": latency.summary(),
+    }
+
+
+async def run_clients(clients, duration: float):
+    stop_at = time.perf_counter() + duration
+    await asyncio.gather(*(client.run(stop_at) for client in clients))
+
+
+def run_scenario(n_clients: int, rate: float, args, port: int) -> dict:
+    backend = NullSpriteBackend(fps=args.fps, max_calls=None)
+    server = WebSocketServer(backend=backend, port=port)
+    server.start()
+    if not server.wait_ready(5):
+        raise RuntimeError(f"Server did not start on port {port}")
+
+    process = psutil.Process()
+    ids = server_thread_ids(server, backend)
+    uri = f"ws://127.0.0.1:{port}/sprite"
+    clients = [SimulatedClient(i, uri, rate, args.control_interval, args.binary, args.stream)
+               for i in range(n_clients)]
+
+    rss_before = process.memory_info().rss
+    cpu_before = thread_cpu_seconds(process, ids)
+    process_cpu_before = sum(process.cpu_times()[:2])
+    wall_before = time.perf_counter()
+
+    asyncio.run(run_clients(clients, args.duration))
+
+    wall = time.perf_counter() - wall_before
+    server_cpu = thread_cpu_seconds(process, ids) - cpu_before
+    process_cpu = sum(process.cpu_times()[:2]) - process_cpu_before
+    rss_after = process.memory_info().rss
+    server_metrics = server.metrics.snapshot()["metrics"]
+
+    server.stop()
+    backend.stop()
+
+    result = {
+        "clients": n_clients,
+        "rate_hz": rate,
+        "duration_s": round(wall, 2),
+        **collect_apply_latency(clients, backend),
+        "late_ticks": sum(c.late for c in clients),
+        "errors": sum(c.errors for c in clients),
+        "server_cpu_percent": round(server_cpu / wall * 100, 1),
+        "process_cpu_percent": round(process_cpu / wall * 100, 1),
+        "rss_mb": round(rss_after / 2**20, 1),
+        "rss_growth_mb": round((rss_after - rss_before) / 2**20, 1),
+        "frames": backend.frames,
+        "outbox_dropped": server_metrics["sprite_outbox_dropped_total"]["series"][0]["value"],
+    }
+    if args.stream:
+        result["stream"] = server.stream_stats()
+    merged = defaultdict(LatencyHistogram)
+    for client in clients:
+        for response_type, histogram in client.rtt.items():
+            merged[response_type].merge(histogram)
+    result["command_rtt"] = {name: h.summary() for name, h in merged.items()}
+    return result
+
+
+def parse_list(value: str, cast):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-client load generator (null backend)")
+    parser.add_argument("--clients", default="1,10,50", help="comma-separated client counts")
+    parser.add_argument("--rates", default="15,30,60", help="comma-separated parameter_batch rates (Hz)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--fps", type=float, default=60.0, help="simulated render rate")
+    parser.add_argument("--control-interval", type=float, default=1.0,
+                        help="seconds between control commands per client")
+    parser.add_argument("--binary", action="store_true", help="send binary parameter frames")
+    parser.add_argument("--stream", action="store_true",
+                        help="send parameters on /sprite/stream (latest-wins), control on /sprite")
+    parser.add_argument("--port", type=int, default=18780)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    scenarios = []
+    port = args.port
+    for n_clients in parse_list(args.clients, int):
+        for rate in parse_list(args.rates, float):
+            print(f"▶ {n_clients} clients @ {rate:g} Hz ...", file=sys.stderr)
+            scenarios.append(run_scenario(n_clients, rate, args, port))
+            port += 1
+
+    report = {
+        "benchmark": "load_generator",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "transport": "binary" if args.binary else "json",
+        "endpoint": "stream" if args.stream else "sprite",
+        "fps": args.fps,
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
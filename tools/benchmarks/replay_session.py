@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded session log against a headless server
+
+Session logs are written by WebSocketServer when recording is enabled
+(``SHERRY_RECORD=~/.sherry/session.slog`` for the app, or
+``server.start_recording(path)``). This script feeds the inbound commands of
+a log into a WebSocketServer on a NullSpriteBackend at 1x, Nx or maximum
+speed and prints one JSON document: throughput, schedule lag, per-type
+processing latency, and replayed vs recorded response counts.
+
+Usage:
+    python tools/benchmarks/replay_session.py session.slog [--speed 1|4|max] [--repeat 3]
+    python tools/benchmarks/replay_session.py session.slog --dump
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from loguru import logger
+
+from src.core.session_log import EVENT_CONNECT, EVENT_DISCONNECT, EVENT_INBOUND, SessionReplayer, read_log
+from src.core.sprite_backend import NullSpriteBackend
+from src.core.websocket_server import WebSocketServer
+
+EVENT_NAMES = {EVENT_INBOUND: "in", EVENT_CONNECT: "connect", EVENT_DISCONNECT: "disconnect"}
+
+
+def dump(path: str):
+    """Print one line per record"""
+    for record in read_log(path):
+        payload = record.payload
+        if record.event == EVENT_CONNECT:
+            payload = payload or "sprite"  # Endpoint (empty in older logs)
+        elif record.event == EVENT_DISCONNECT:
+            payload = ""
+        elif isinstance(payload, bytes):
+            payload = f"<binary {len(payload)} bytes>"
+        elif len(payload) > 120:
+            payload = payload[:117] + "..."
+        print(f"{record.t:10.4f}  #{record.connection:<4} {EVENT_NAMES.get(record.event, 'out'):<10} {payload}")
+
+
+def command_latency(server: WebSocketServer) -> dict:
+    metric = server.metrics.snapshot()["metrics"].get("sprite_command_seconds", {})
+    return {series.pop("labels")["type"]: series for series in metric.get("series", [])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a session log on a headless server")
+    parser.add_argument("log", help="session log written by WebSocketServer recording")
+    parser.add_argument("--speed", default="max", help="1 = recorded pace, N = N times faster, max = no waiting")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the log this many times")
+    parser.add_argument("--fps", type=float, help="simulated render rate (default: apply writes immediately)")
+    parser.add_argument("--speak", action="store_true", help="replay speak commands too (needs TTS / audio)")
+    parser.add_argument("--dump", action="store_true", help="print the log instead of replaying it")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.dump:
+        dump(args.log)
+        return
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    speed = None if args.speed == "max" else float(args.speed)
+    backend = NullSpriteBackend(fps=args.fps)
+    server = WebSocketServer(backend=backend)
+    replayer = SessionReplayer(args.log)
+    skip = () if args.speak else ("speak",)
+
+    async def run():
+        return [await replayer.replay(server, speed=speed, skip_types=skip) for _ in range(args.repeat)]
+
+    runs = asyncio.run(run())
+    backend.stop()
+
+    report = {
+        "benchmark": "replay_session",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+        "command_latency": command_latency(server),
+        "backend": backend.stats(),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
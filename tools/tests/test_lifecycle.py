@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试服务器 / 大脑生命周期：冷启动到第一句问候的耗时，以及关闭耗时
+
+Runs the WebSocketServer and the embedded SpriteBrain headless
+(NullSpriteBackend, speak answered without audio) and measures:
+
+- cold start: server.start() -> first greeting ``speak`` command received
+- shutdown:   brain.stop() + server.stop() -> both threads finished
+
+Usage:
+    python tools/tests/test_lifecycle.py [--runs 5] [--websocket] [--port 18765]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from loguru import logger
+
+from src.brain.sprite_brain import SpriteBrain
+from src.core.sprite_backend import NullSpriteBackend
+from src.core.websocket_server import WebSocketServer
+
+
+def run_once(port: int, use_websocket: bool) -> dict:
+    server = WebSocketServer(backend=NullSpriteBackend(), port=port, tts_warmup_workers=0)
+    greeted = threading.Event()
+
+    dispatch = server._dispatch
+
+    async def headless_dispatch(websocket, msg_type, msg_data):
+        if msg_type == "speak":
+            # 不播放音频，直接应答
+            greeted.set()
+            await server._send_response(websocket, "speak_completed", {"text": msg_data.get("text", "")})
+            return
+        await dispatch(websocket, msg_type, msg_data)
+
+    server._dispatch = headless_dispatch
+
+    if use_websocket:
+        brain = SpriteBrain(ws_uri=f"ws://127.0.0.1:{port}/sprite")
+    else:
+        brain = SpriteBrain(local_server=server)
+    brain_thread = threading.Thread(target=lambda: asyncio.run(brain.start()), daemon=True)
+
+    # 冷启动：与 app.py 相同的顺序（服务器、大脑几乎同时启动）
+    t0 = time.perf_counter()
+    server.start()
+    brain_thread.start()
+    if not greeted.wait(timeout=30):
+        raise RuntimeError("No greeting within 30 s")
+    cold_start = time.perf_counter() - t0
+
+    # 关闭
+    t1 = time.perf_counter()
+    brain.stop()
+    server.stop()
+    brain_thread.join(timeout=5)
+    shutdown = time.perf_counter() - t1
+    if brain_thread.is_alive() or server.thread.is_alive():
+        raise RuntimeError("Threads still alive after shutdown")
+
+    return {"cold_start_ms": cold_start * 1000, "shutdown_ms": shutdown * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start-to-greeting and shutdown time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=18765)
+    parser.add_argument("--websocket", action="store_true", help="brain connects over loopback WebSocket")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    runs = [run_once(args.port + i, args.websocket) for i in range(args.runs)]
+    result = {"transport": "websocket" if args.websocket else "local", "runs": len(runs)}
+    for key in ("cold_start_ms", "shutdown_ms"):
+        values = [r[key] for r in runs]
+        result[key] = {
+            "median": round(statistics.median(values), 1),
+            "max": round(max(values), 1),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
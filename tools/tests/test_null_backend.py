@@ -0,0 +1,785 @@
+#!/usr/bin/env python3
+"""
+无头回归测试：WebSocket 控制面 + NullSpriteBackend（无需 Qt / OpenGL / live2d-py）
+
+Starts a WebSocketServer on a NullSpriteBackend, sends every command over a
+real WebSocket connection and checks what reached the backend (and when).
+Exits non-zero on the first failed check.
+
+Usage:
+    python tools/tests/test_null_backend.py [--port 18766]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import math
+import socket
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import websockets
+from loguru import logger
+
+from src.core.audio_sink import FileSink, NullSink
+from src.core.sprite_backend import NullSpriteBackend
+from src.core.tts_manager import BaseTTSProvider, TTSResult
+from src.core.tts_stream import RecordedStream
+from src.core.udp_input import encode_osc, encode_osc_bundle
+from src.core.websocket_server import WebSocketServer
+from src.core.wire_format import ParamCodec, encode_named_parameters
+
+failures = 0
+
+
+def check(condition: bool, label: str):
+    global failures
+    if condition:
+        print(f"✅ {label}")
+    else:
+        failures += 1
+        print(f"❌ {label}")
+
+
+async def request(ws, msg_type: str, data: dict) -> dict:
+    """Send a command and return its response"""
+    await ws.send(json.dumps({"type": msg_type, "data": data}))
+    return json.loads(await ws.recv())
+
+
+async def run_multi_sprite(server: WebSocketServer, backend: NullSpriteBackend, kuro: NullSpriteBackend):
+    """Two sprites on one socket: each route reaches only its own backend"""
+    for path, expected, own, other in (("/sprite/kuro", "kuro", kuro, backend), ("/sprite", "sherry", backend, kuro)):
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}{path}") as ws:
+            await request(ws, "unsubscribe", {"topics": ["*"]})
+            await request(ws, "parameter", {"id": "ParamRoute", "value": 1.0})
+            status = await request(ws, "get_status", {})
+            check(status["data"]["sprite"] == expected, f"{path} 路由到 {expected}")
+            check(own.get_parameter("ParamRoute") == 1.0 and other.get_parameter("ParamRoute") == 0.0,
+                  f"{path} 只写入自己的后端")
+        own.values.pop("ParamRoute", None)
+
+    hosted = server.sprites["kuro"]
+    tts = server.tts_manager
+    check(hosted.tts_warmup is None and hosted.lip_sync is None
+          and (tts is None or tts.receivers(tts.lip_sync_frame) == 1), "托管精灵不重复创建预合成任务和口型广播")
+
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite/nobody") as ws:
+            await ws.recv()
+        check(False, "未知精灵被拒绝")
+    except websockets.exceptions.ConnectionClosed as e:
+        check(e.rcvd is not None and e.rcvd.code == 4004, "未知精灵被拒绝")
+
+
+async def run_stream(server: WebSocketServer, backend: NullSpriteBackend, kuro: NullSpriteBackend):
+    """/sprite/stream: bursts are merged (latest wins), nothing is ever sent back"""
+    before = server.stream_stats()
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite/stream") as stream:
+        for i in range(200):
+            await stream.send(json.dumps({"type": "parameter_batch", "data": {"params": {"ParamStream": float(i)}}}))
+        await stream.send(json.dumps({"type": "expression", "data": {"name": "sad"}}))
+        await stream.send(json.dumps({"type": "binary_negotiate", "data": {"params": ["ParamStreamBin"]}}))
+        await stream.send(ParamCodec(["ParamStreamBin"]).encode_parameter_batch({"ParamStreamBin": 2.5}))
+        await stream.send(json.dumps({"type": "look_at", "data": {"x": 0.25, "y": 0.75}}))
+        try:
+            await asyncio.wait_for(stream.recv(), 0.3)
+            check(False, "stream 端点不回复")
+        except asyncio.TimeoutError:
+            check(True, "stream 端点不回复")
+
+    await asyncio.sleep(0.05)
+    stats = server.stream_stats()
+    check(backend.get_parameter("ParamStream") == 199.0, "stream 最终值为最新值")
+    check(backend.get_parameter("ParamStreamBin") == 2.5, "stream 二进制帧")
+    check(backend.calls_of("look_at")[-1].args == (0.25, 0.75), "stream look_at")
+    check(backend.current_expression != "sad", "stream 不执行控制命令")
+    check(stats["rejected"] - before["rejected"] == 1, "stream 拒绝非参数帧")
+    check(stats["received"] - before["received"] == 204, "stream 接收计数")
+    writes = [c for c in backend.calls_of("stage_parameters") if "ParamStream" in c.args[0]]
+    check(len(writes) < 200 and stats["applied"] - before["applied"] <= len(writes) + 2,
+          f"stream 突发合并（200 帧 → {len(writes)} 次写入）")
+
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite/kuro/stream") as stream:
+        await stream.send(json.dumps({"type": "parameter", "data": {"id": "ParamStreamKuro", "value": 4.0}}))
+    await asyncio.sleep(0.05)
+    check(kuro.get_parameter("ParamStreamKuro") == 4.0 and backend.get_parameter("ParamStreamKuro") == 0.0,
+          "/sprite/kuro/stream 路由到 kuro")
+
+
+async def run_udp(server: WebSocketServer, backend: NullSpriteBackend, kuro: NullSpriteBackend):
+    """UDP input: packed and OSC datagrams, reordered ones dropped by sequence number"""
+    target = ("127.0.0.1", server.udp_port)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(encode_named_parameters(10, {"ParamUdp": 1.0}), target)
+        sock.sendto(encode_named_parameters(9, {"ParamUdp": 99.0}), target)  # Late: dropped
+        sock.sendto(encode_osc_bundle(encode_osc("/sprite/seq", 11),
+                                      encode_osc("/sprite/params", "ParamUdpOsc", 2.0, "ParamUdp", 3.0),
+                                      encode_osc("/sprite/look_at", 0.5, 0.25)), target)
+        sock.sendto(encode_osc("/sprite/kuro/param/ParamUdpKuro", 4.0), target)
+        sock.sendto(b"not a parameter frame", target)
+        sock.sendto(encode_osc_bundle(encode_osc("/sprite/seq", float("inf")),
+                                      encode_osc("/sprite/param/ParamUdp", 50.0)), target)
+        nested = encode_osc("/sprite/param/ParamUdp", 60.0)
+        for _ in range(2000):
+            nested = encode_osc_bundle(nested)
+        sock.sendto(nested, target)
+        await asyncio.sleep(0.2)
+
+    stats = server.udp_input.stats()
+    check(backend.get_parameter("ParamUdp") == 3.0, "UDP 打包帧 + OSC 参数")
+    check(backend.get_parameter("ParamUdpOsc") == 2.0, "UDP OSC /params")
+    check(backend.calls_of("look_at")[-1].args == (0.5, 0.25), "UDP OSC look_at")
+    check(kuro.get_parameter("ParamUdpKuro") == 4.0, "UDP OSC /sprite/kuro 路由")
+    check(stats["reordered"] == 1 and stats["invalid"] == 3, f"UDP 乱序、无效包、inf 序号与深层嵌套 bundle 丢弃 {stats}")
+
+
+async def vts_request(ws, message_type: str, data: dict) -> dict:
+    await ws.send(json.dumps({"apiName": "VTubeStudioPublicAPI", "apiVersion": "1.0",
+                              "requestID": message_type, "messageType": message_type, "data": data}))
+    return json.loads(await ws.recv())
+
+
+async def run_vts(server: WebSocketServer, backend: NullSpriteBackend):
+    """VTube Studio API: auth, batched injection with weight / add mode, parameter lists"""
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/vts") as ws:
+        before = len(backend.calls_of("stage_parameters"))
+        error = await vts_request(ws, "InjectParameterDataRequest", {"parameterValues": [
+            {"id": "FaceAngleX", "value": 15.0}]})
+        check(error["messageType"] == "APIError" and error["data"]["errorID"] == 8
+              and len(backend.calls_of("stage_parameters")) == before, "VTS 未认证注入被拒绝")
+
+        token = (await vts_request(ws, "AuthenticationTokenRequest", {"pluginName": "test"}))["data"]
+        auth = await vts_request(ws, "AuthenticationRequest", {"pluginName": "test", **token})
+        check(auth["data"]["authenticated"] is True, "VTS 认证")
+
+        before = len(backend.calls_of("stage_parameters"))
+        response = await vts_request(ws, "InjectParameterDataRequest", {"faceFound": True, "parameterValues": [
+            {"id": "FaceAngleX", "value": 15.0},
+            {"id": "MouthSmile", "value": 1.0},
+            {"id": "ParamVtsDirect", "value": 0.25},
+        ]})
+        check(response["messageType"] == "InjectParameterDataResponse", "VTS 注入响应")
+        check(len(backend.calls_of("stage_parameters")) == before + 1, "VTS 一次注入 = 一次批量写入")
+        check(backend.get_parameter("ParamAngleX") == 15.0 and backend.get_parameter("ParamMouthForm") == 1.0
+              and backend.get_parameter("ParamVtsDirect") == 0.25, "VTS 输入参数映射到 Live2D 参数")
+
+        backend.stage_parameters({"ParamVtsBlend": 10.0})
+        server.hub.update_parameters({"ParamVtsBlend": 10.0})
+        await vts_request(ws, "InjectParameterDataRequest", {"parameterValues": [
+            {"id": "ParamVtsBlend", "value": 0.0, "weight": 0.25}]})
+        check(backend.get_parameter("ParamVtsBlend") == 7.5, "VTS weight 混合")
+        for _ in range(3):
+            await vts_request(ws, "InjectParameterDataRequest", {"mode": "add", "parameterValues": [
+                {"id": "ParamVtsBlend", "value": 1.0}]})
+        check(backend.get_parameter("ParamVtsBlend") == 11.0, "VTS add 模式不累加")
+
+        error = await vts_request(ws, "InjectParameterDataRequest", {"mode": "mix", "parameterValues": [
+            {"id": "FaceAngleX", "value": 1.0}]})
+        check(error["messageType"] == "APIError", "VTS 未知模式报错")
+
+        inputs = await vts_request(ws, "InputParameterListRequest", {})
+        names = {p["name"]: p for p in inputs["data"]["defaultParameters"]}
+        check(names["FaceAngleX"]["value"] == 15.0, "VTS 输入参数列表")
+        live2d = await vts_request(ws, "Live2DParameterListRequest", {})
+        params = {p["name"]: p for p in live2d["data"]["parameters"]}
+        check(params.get("ParamAngleX", {}).get("max") == 30.0 and params["ParamAngleX"]["value"] == 15.0,
+              "VTS Live2D 参数列表")
+
+
+async def run(server: WebSocketServer, backend: NullSpriteBackend):
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+
+        response = await request(ws, "expression", {"name": "happy"})
+        check(response["type"] == "expression_set", "expression 响应")
+        check(backend.current_expression == "happy", "expression 到达后端")
+
+        response = await request(ws, "expression", {"name": "no_such_face"})
+        check(response["type"] == "error", "未知表情返回错误")
+
+        await ws.send(json.dumps({"type": ["expression"], "data": {}}))
+        response = json.loads(await ws.recv())
+        await ws.send(json.dumps({"type": "expression", "data": ["happy"]}))
+        response2 = json.loads(await ws.recv())
+        check(response["type"] == response2["type"] == "error", "非字符串 type / 非对象 data 返回错误，不断开连接")
+
+        await request(ws, "motion", {"group": "Tap", "index": 1})
+        check(backend.calls_of("trigger_motion")[-1].args == ("Tap", 1), "motion 参数")
+
+        await request(ws, "parameter", {"id": "ParamAngleX", "value": 12.5})
+        check(backend.get_parameter("ParamAngleX") == 12.5, "parameter 写入")
+
+        await ws.send(json.dumps({"type": "parameter_batch",
+                                  "data": {"params": {"ParamAngleY": -3.0, "ParamEyeBallX": 0.5}}}))
+        await request(ws, "binary_negotiate", {"params": ["ParamAngleZ"]})
+        sent_at = time.time()
+        await ws.send(ParamCodec(["ParamAngleZ"]).encode_parameter_batch({"ParamAngleZ": 7.0}))
+        await request(ws, "get_status", {})  # Round trip: earlier frames are processed by now
+        check(backend.get_parameter("ParamAngleY") == -3.0, "parameter_batch 写入")
+        check(backend.get_parameter("ParamAngleZ") == 7.0, "二进制参数帧写入")
+        stage = [c for c in backend.calls_of("stage_parameters") if "ParamAngleZ" in c.args[0]][-1]
+        check(stage.timestamp >= sent_at, "调用带时间戳")
+
+        await request(ws, "look_at", {"x": 0.5, "y": -0.5})
+        check(backend.calls_of("look_at")[-1].args == (0.5, -0.5), "look_at")
+
+        await request(ws, "message", {"text": "喵～", "duration": 1000})
+        check(backend.calls_of("show_message")[-1].args == ("喵～", 1000), "message 气泡")
+
+        await request(ws, "background", {"type": "purple"})
+        check(backend.background == "purple", "background")
+
+        await request(ws, "window", {"action": "move", "x": 10, "y": 20})
+        await request(ws, "window", {"action": "opacity", "opacity": 0.5})
+        await request(ws, "window", {"action": "hide"})
+        check(backend.position() == (10, 20) and backend.opacity == 0.5 and not backend.visible, "window 控制")
+
+        # 上传后不等响应立即播放：两者同在 realtime 通道，按到达顺序处理
+        curves = {"ParamAngleX": [[0, 0], [200, 10]]}
+        for i in range(10):
+            await ws.send(json.dumps({"type": "timeline_upload", "data": {"name": f"nod{i}", "curves": curves}}))
+            await ws.send(json.dumps({"type": "timeline_play", "data": {"name": f"nod{i}"}}))
+        replies = [json.loads(await ws.recv())["type"] for _ in range(20)]
+        check(replies == ["timeline_uploaded", "timeline_started"] * 10, "timeline_upload 后立即 timeline_play")
+        response = await request(ws, "timeline_upload", {"name": "bad", "curves": {"ParamAngleX": [[0, 0], ["nan", 1]]}})
+        check(response["type"] == "error", "timeline 拒绝 NaN / inf 关键帧")
+        await request(ws, "timeline_stop", {})
+
+        bad = [{"params": {"ParamAngleX": math.nan}}, {"id": "ParamAngleX", "value": 1.0, "duration": math.inf}]
+        replies = [(await request(ws, "parameter_target", data))["type"] for data in bad]
+        await ws.send(json.dumps({"type": "parameter_target", "data": {"id": "ParamAngleX", "value": 1.0, "duration": 1e12}}))
+        await request(ws, "get_status", {})
+        target = backend.calls_of("set_parameter_targets")
+        check(replies == ["error", "error"] and len(target) == 1 and target[0].args[1] == 60.0,
+              "parameter_target 拒绝 NaN / inf，duration 有上限")
+
+        status = await request(ws, "get_status", {})
+        check(status["data"]["expression"] == "happy", "get_status 表情")
+        check(status["data"]["backend"]["calls"].get("set_expression") == 1, "get_status 后端统计")
+
+
+async def run_sequences(server: WebSocketServer, backend: NullSpriteBackend):
+    """Sequences: waits are validated, steps run on the sending connection's lanes"""
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        waits = [math.inf, math.nan, 400_000]
+        replies = [(await request(ws, "sequence", {"steps": [{"type": "wait", "data": {"ms": ms}}] * 2}))["type"]
+                   for ms in waits]
+        check(replies == ["error"] * 3 and server.sequencer.stats()["running"] == 0,
+              "sequence 拒绝 inf / NaN 等待和超长总时长")
+
+    from src.core.sequencer import MAX_RUNS_PER_OWNER
+
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        steps = [{"type": "wait", "data": {"ms": 5000}}]
+        replies = [(await request(ws, "sequence", {"steps": steps}))["type"] for _ in range(MAX_RUNS_PER_OWNER + 1)]
+        running = server.sequencer.stats()["running"]
+    await asyncio.sleep(0.1)
+    check(replies[-1] == "error" and running == MAX_RUNS_PER_OWNER and server.sequencer.stats()["running"] == 0,
+          "每个客户端的序列数有上限，断开时取消其序列")
+
+    # speak 步骤进入发起连接的 speech 通道：排在之前的 speak 之后、之后的 speak 之前
+    spoken = []
+
+    class OrderProvider(FakeTTSProvider):
+        async def speak(self, text: str, voice_id=None) -> TTSResult:
+            spoken.append(text)
+            return await super().speak(text, voice_id)
+
+    tts = server.tts_manager
+    tts.current_provider = OrderProvider(delay=0.05)
+    tts.stream_player_factory = lambda: NullSink(buffer_ahead=0.0)
+    cache, tts.cache = tts.cache, None  # Keep the cache checks later on independent of these lines
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+            await request(ws, "unsubscribe", {"topics": ["*"]})
+            await ws.send(json.dumps({"type": "speak", "data": {"text": "序列顺序一"}}))
+            await request(ws, "sequence", {"steps": [{"type": "speak", "data": {"text": "序列顺序二"}}]})
+            await ws.send(json.dumps({"type": "speak", "data": {"text": "序列顺序三"}}))
+            events = sorted([json.loads(await ws.recv())["type"] for _ in range(3)])
+    finally:
+        tts.stream_player_factory = None
+        tts.cache = cache
+    check(spoken == ["序列顺序一", "序列顺序二", "序列顺序三"]
+          and events == ["sequence_completed", "speak_completed", "speak_completed"],
+          f"序列 speak 步骤与连接的 speak 按顺序播放 {spoken}")
+
+
+def tone_wav(seconds: float = 1.0, rate: int = 24000) -> bytes:
+    """440 Hz mono 16-bit WAV"""
+    samples = b"".join(struct.pack("<h", int(8000 * math.sin(i * 2 * math.pi * 440 / rate)))
+                       for i in range(int(rate * seconds)))
+    return (b"RIFF" + struct.pack("<I", 36 + len(samples)) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, rate, rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", len(samples)) + samples)
+
+
+class FakeTTSProvider(BaseTTSProvider):
+    """Writes a 1 s 440 Hz WAV after a simulated network delay"""
+
+    def __init__(self, delay: float = 0.2):
+        super().__init__("fake")
+        self.delay = delay
+        self.calls = 0
+        self.rates: list = []      # Sample rate of each next synthesized WAV (24 kHz once empty)
+        self.reported_rate = None  # Rate claimed in TTSResult (like ElevenLabs' 44100 for MP3)
+
+    def is_available(self) -> bool:
+        return True
+
+    async def speak(self, text: str, voice_id=None) -> TTSResult:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        rate = self.rates.pop(0) if self.rates else 24000
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        with os.fdopen(fd, "wb") as f:
+            f.write(tone_wav(rate=rate))
+        return TTSResult(path, text, 1000.0, self.reported_rate or rate, True)
+
+
+class RecordedStreamProvider(FakeTTSProvider):
+    """Streams a recorded 3 s WAV: first chunk after 150 ms, then 4x faster than real time"""
+
+    def __init__(self):
+        super().__init__()
+        self.recording = tone_wav(3.0)
+        self.streams = 0
+
+    def supports_streaming(self) -> bool:
+        return True
+
+    def stream(self, text: str, voice_id=None):
+        self.streams += 1
+        return RecordedStream(self.recording, chunk_size=4800, first_chunk_delay=0.15, chunk_interval=0.025)
+
+
+async def run_session_replay(server: WebSocketServer):
+    """Session log: /sprite/stream and VTS connections are replayed through their own handlers"""
+    from src.core.session_log import SessionReplayer
+
+    fd, path = tempfile.mkstemp(suffix=".slog")
+    os.close(fd)
+    server.start_recording(path)
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite/stream") as stream:
+        await stream.send(json.dumps({"type": "binary_negotiate", "data": {"params": ["ParamReplayBin"]}}))
+        await stream.send(ParamCodec(["ParamReplayBin"]).encode_parameter_batch({"ParamReplayBin": 3.0}))
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/vts") as ws:
+        token = (await vts_request(ws, "AuthenticationTokenRequest", {"pluginName": "replay"}))["data"]
+        await vts_request(ws, "AuthenticationRequest", {"pluginName": "replay", **token})
+        await vts_request(ws, "InjectParameterDataRequest", {"parameterValues": [{"id": "ParamReplayVts", "value": 0.5}]})
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "parameter", {"id": "ParamReplayCmd", "value": 2.0})
+    await asyncio.sleep(0.05)
+    server.stop_recording()
+    await asyncio.sleep(0.1)  # The recorder is closed on the server's loop
+
+    replay_backend = NullSpriteBackend()
+    replay_server = WebSocketServer(backend=replay_backend, tts_warmup_workers=0)
+    report = await SessionReplayer(path).replay(replay_server, speed=None)
+    os.unlink(path)
+    check(replay_backend.get_parameter("ParamReplayBin") == 3.0, "回放 /sprite/stream 二进制帧")
+    check(replay_backend.get_parameter("ParamReplayVts") == 0.5
+          and report["responses"].get("InjectParameterDataResponse") == 1, "回放 VTS 请求")
+    check(replay_backend.get_parameter("ParamReplayCmd") == 2.0 and "error" not in report["responses"]
+          and "APIError" not in report["responses"], f"回放无错误响应 {report['responses']}")
+    replay_backend.stop()
+
+
+async def run_tts_cache(server: WebSocketServer):
+    """TTS cache: a repeated line skips synthesis, concurrent identical requests share one"""
+    tts = server.tts_manager
+    provider = FakeTTSProvider()
+    tts.current_provider = provider
+
+    results = await asyncio.gather(*(tts.synthesize("主人，欢迎回来～") for _ in range(3)))
+    check(provider.calls == 1 and all(r.success for r, _ in results), "并发相同请求只合成一次")
+    check(len(results[0][1]) == 30 and results[0][1][0] > 0, "口型包络随缓存一起返回")
+
+    started = time.perf_counter()
+    result, amplitudes = await tts.synthesize("主人，欢迎回来～")
+    hit_ms = (time.perf_counter() - started) * 1000
+    check(provider.calls == 1 and amplitudes == results[0][1], f"重复台词命中缓存 ({hit_ms:.1f} ms)")
+    check(os.path.dirname(result.audio_path) == str(tts.cache.root), "缓存的音频不在临时文件中")
+
+    await tts.synthesize("主人，欢迎回来～", voice_id="another-voice")
+    check(provider.calls == 2, "不同音色不共用缓存")
+
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        cache = (await request(ws, "get_status", {}))["data"]["tts"]["cache"]
+        check(cache["hits"] >= 1 and cache["shared"] == 2 and cache["entries"] == 2, "get_status → tts.cache")
+
+    # 缓存目录指向已有目录：启动清理只删缓存自己的残留文件
+    from src.core.tts_cache import TTSCache
+    with tempfile.TemporaryDirectory() as shared_dir:
+        user_files = ["notes.txt", "config.json", "photo.wav"]
+        for name in user_files + ["0123456789abcdef0123456789abcdef.wav", "0123456789abcdef0123456789abcdef.json.tmp"]:
+            with open(os.path.join(shared_dir, name), "w") as f:
+                f.write("{")
+        TTSCache(shared_dir)
+        check(sorted(os.listdir(shared_dir)) == sorted(user_files), "缓存启动清理不删除目录中的其他文件")
+
+
+async def run_tts_warmup(server: WebSocketServer):
+    """tts_warmup: known lines are synthesized in the background, cached ones are skipped"""
+    tts = server.tts_manager
+    provider = tts.current_provider
+    lines = ["早安，主人！", "被主人摸头了...好幸福...", "主人，欢迎回来～", "早安，主人！"]
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        calls = provider.calls
+        response = await request(ws, "tts_warmup", {"lines": lines})
+        check(response["type"] == "tts_warmup_started" and response["data"]["queued"] == 4, "tts_warmup 分句、去重入队")
+
+        await asyncio.sleep(0.05)  # Let the workers pick up the first lines
+        shared = tts.cache.shared
+        result = await tts.synthesize("早安，主人！")  # First line: shares the warmup's in-flight synthesis
+        shared = tts.cache.shared - shared
+        for _ in range(50):
+            warmup = (await request(ws, "get_status", {}))["data"]["tts"]["warmup"]
+            if warmup["state"] == "done":
+                break
+            await asyncio.sleep(0.05)
+        check(warmup["state"] == "done" and warmup["synthesized"] == 3 and warmup["cached"] == 1,
+              f"预合成完成 ({warmup['elapsed_s']} s, {warmup['workers']} workers)")
+        check(result[0].success and shared == 1 and provider.calls - calls == 3, "实时请求共享预合成中的同一句")
+
+        provider.calls = 0
+        started = time.perf_counter()
+        await tts.synthesize("被主人摸头了...")
+        check(provider.calls == 0 and time.perf_counter() - started < 0.05, "预合成的触摸台词直接命中")
+
+        response = await request(ws, "tts_warmup", {"lines": "not a list"})
+        check(response["type"] == "error", "tts_warmup 参数校验")
+
+    # Restart while a line is in flight: a live request sharing it takes over
+    warmup = server.tts_warmup
+    warmup.start(["重启测试～"])
+    await asyncio.sleep(0.05)
+    live = asyncio.ensure_future(tts.synthesize("重启测试～"))
+    await asyncio.sleep(0.01)
+    warmup.cancel()
+    result, _ = await live
+    check(result.success, "预合成被取消时共享请求接手合成")
+
+
+async def run_tts_stream(server: WebSocketServer):
+    """Streamed speech: first sound after the first chunk, envelope and cache filled after the stream"""
+    tts = server.tts_manager
+    provider = RecordedStreamProvider()
+    tts.current_provider = provider
+    players = []
+    tts.stream_player_factory = lambda: players.append(NullSink()) or players[-1]
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+            await request(ws, "unsubscribe", {"topics": ["*"]})
+            started = time.monotonic()
+            response = await request(ws, "speak", {"text": "流式测试：第一块音频到达就开口～"})
+            total = time.monotonic() - started
+            first_sound = players[0].started_at - started
+            check(response["type"] == "speak_completed" and provider.streams == 1, "流式 speak 完成")
+            check(first_sound < 0.3, f"首块即出声 ({first_sound * 1000:.0f} ms，整句 {total * 1000:.0f} ms)")
+            check(players[0].bytes_written == 3 * 24000 * 2 and players[0].underruns == 0,
+                  "PCM 完整播放、无断流")
+            check(len(tts._amplitude_data) == 90 and tts._amplitude_data[0] > 0, "流式口型包络 (30 fps)")
+
+            status = (await request(ws, "get_status", {}))["data"]["tts"]["streaming"]
+            check(status["streams"] == 1 and status["last_first_sound_ms"] < 300, "get_status → tts.streaming")
+            check(tts._is_cached("流式测试：第一块音频到达就开口～", None), "流式结果写入缓存")
+    finally:
+        tts.stream_player_factory = None
+
+
+async def run_sentence_pipeline(server: WebSocketServer):
+    """Long text: sentence N+1 is synthesized while N plays, one continuous envelope"""
+    from src.core.tts_stream import split_sentences
+
+    check(split_sentences("早安，主人！今天也要元气满满哦～ 喵呜！☀️") == ["早安，主人！", "今天也要元气满满哦～ 喵呜！☀️"],
+          "分句：中文标点，短句并入上一句")
+    check(split_sentences("Hello there. This is v1.5! Ok?") == ["Hello there.", "This is v1.5! Ok?"], "分句：英文标点")
+
+    tts = server.tts_manager
+    provider = FakeTTSProvider(delay=0.2)  # 1 s of audio per sentence
+    tts.current_provider = provider
+    players = []
+    tts.stream_player_factory = lambda: players.append(NullSink()) or players[-1]
+    try:
+        started = time.monotonic()
+        result = await tts.speak("第一句话说完了。第二句话也说完了！第三句呢？")
+        total = time.monotonic() - started
+        first_sound = players[0].started_at - started
+        check(result.success and provider.calls == 3, "三句分别合成")
+        check(first_sound < 0.35, f"首句就绪即出声 ({first_sound * 1000:.0f} ms，整段 {total * 1000:.0f} ms)")
+        check(players[0].underruns == 0 and players[0].bytes_written == 3 * 24000 * 2, "句间无断流（下一句在播放中合成）")
+        check(len(tts._amplitude_data) == 90 and min(tts._amplitude_data) > 0, "口型包络跨句连续")
+
+        # 第二句 16 kHz、provider 报告 44.1 kHz：按解码出的采样率播放，不同采样率的句子重采样
+        provider.rates, provider.reported_rate = [24000, 16000], 44100
+        players.clear()
+        result = await tts.speak("采样率测试第一句。采样率测试第二句！")
+        check(result.success and players[0].sample_rate == 24000 and players[0].bytes_written == 2 * 24000 * 2
+              and len(tts._amplitude_data) == 60, "句间采样率不同时重采样到同一条流")
+    finally:
+        tts.stream_player_factory = None
+
+
+async def run_audio_sink(server: WebSocketServer):
+    """In-process sink: files play from memory, lip sync frames follow the sink's playback position"""
+    import wave
+
+    tts = server.tts_manager
+    tts.current_provider = FakeTTSProvider(delay=0.05)
+    sinks = []
+    tts.stream_player_factory = lambda: sinks.append(NullSink()) or sinks[-1]
+    mouth = []
+    tts.lip_sync_frame.connect(mouth.append)
+    try:
+        speaking = asyncio.ensure_future(tts.speak("播放时钟测试"))
+        ticks = []
+        for _ in range(3):  # 定时器严重滞后：0.5 s 内只触发 3 次
+            await asyncio.sleep(0.17)
+            tts._on_playback_frame()
+            ticks.append((tts._current_frame, sinks[0].position() if sinks else 0.0))
+        result = await speaking
+        frame, position = ticks[-1]
+        check(result.success and len(sinks) == 1 and sinks[0].bytes_written == 24000 * 2, "文件经进程内 sink 播放")
+        check(frame >= 9 and abs(frame - position * 30) <= 1,
+              f"口型帧按播放位置取 (第 {frame} 帧 @ {position:.2f} s，定时器只触发 3 次)")
+        check(1.0 in mouth and mouth[-1] == 0.0 and tts._playback_clock is None, "播放结束闭嘴、时钟释放")
+
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        tts.stream_player_factory = lambda: FileSink(path, realtime=False)
+        await tts.speak("播放时钟测试")  # Cached: played straight from the cache file
+        with wave.open(path, "rb") as f:
+            recorded = f.readframes(f.getnframes())
+            check(f.getframerate() == 24000 and recorded == tone_wav()[44:], "FileSink 写出完整 PCM")
+        os.unlink(path)
+
+        class BusyDeviceSink(NullSink):
+            """Device that cannot be opened (PortAudioError is not an OSError)"""
+            async def start(self, sample_rate: int = 24000):
+                raise RuntimeError("Device unavailable [PaErrorCode -9985]")
+
+        tts.stream_player_factory = BusyDeviceSink
+        played = []
+        tts._play_file = lambda path: played.append(path) or asyncio.sleep(0)  # Instance override
+        try:
+            result = await tts.speak("播放时钟测试")
+        finally:
+            del tts._play_file
+        check(result.success and len(played) == 1 and not tts.is_speaking(), "声卡打不开时退回播放进程")
+
+        class UnpluggedSink(NullSink):
+            """Device that disappears after a few writes"""
+            async def write(self, pcm: bytes):
+                if self.bytes_written >= 3 * 4800:
+                    raise RuntimeError("Stream is stopped [PaErrorCode -9983]")
+                await super().write(pcm)
+
+        played.clear()
+        tts._play_file = lambda path: played.append(path) or asyncio.sleep(0)
+        try:
+            tts.current_provider = RecordedStreamProvider()
+            tts.stream_player_factory = BusyDeviceSink
+            opened = await tts.speak("流式：声卡打不开")
+            tts.stream_player_factory = UnpluggedSink
+            unplugged = await tts.speak("流式：播放中拔掉声卡")
+            check(opened.success and unplugged.success and len(played) == 2 and not tts.is_speaking()
+                  and tts._is_cached("流式：播放中拔掉声卡", None), "流式播放声卡失败时收完整句、退回播放进程")
+
+            played.clear()
+            tts.current_provider = FakeTTSProvider(delay=0.01)
+            result = await tts.speak("第一句先走声卡。第二句时声卡没了！第三句也走播放进程。")
+            check(result.success and len(played) == 2 and not tts.is_speaking(), "分句播放中声卡失败，余下句子退回播放进程")
+        finally:
+            del tts._play_file
+    finally:
+        tts.lip_sync_frame.disconnect(mouth.append)
+        tts.stream_player_factory = None
+
+
+async def run_device_sink():
+    """DeviceSink waits are woken by the PortAudio callback and give up when the device stops"""
+    import threading
+    from types import SimpleNamespace
+    from src.core.audio_sink import DeviceSink, SinkStalledError
+
+    class FakeDeviceSink(DeviceSink):
+        """PortAudio stand-in: a thread runs the callback in 10 ms blocks until it is 'unplugged'"""
+        def _open(self, sample_rate: int):
+            self.unplugged = threading.Event()
+
+            def device():
+                outdata = bytearray(240 * 2)
+                while not self.unplugged.wait(0.01):
+                    self._callback(outdata, 240, SimpleNamespace(outputBufferDacTime=0.0, currentTime=0.0), None)
+            threading.Thread(target=device, daemon=True).start()
+            return SimpleNamespace(stop=self.unplugged.set, close=lambda: None)
+
+    sink = FakeDeviceSink()
+    await sink.start(24000)
+    started = time.monotonic()
+    for _ in range(5):
+        await sink.write(b"\x00" * 4800)  # 0.1 s each
+    await sink.finish()
+    elapsed = time.monotonic() - started
+    check(0.4 <= elapsed < 1.0 and not sink._buffer, f"DeviceSink 由回调唤醒写入/排空 ({elapsed * 1000:.0f} ms)")
+
+    sink.unplugged.set()
+    started = time.monotonic()
+    try:
+        await sink.write(b"\x00" * 24000)  # 0.5 s with nothing taking it
+        stalled = False
+    except SinkStalledError:
+        stalled = True
+    elapsed = time.monotonic() - started
+    await sink.close()
+    check(stalled and elapsed < 1.5, f"设备停止回调时写入超时报错而不是卡死 ({elapsed * 1000:.0f} ms)")
+
+
+async def run_parameter_cache(server: WebSocketServer):
+    """The hub's last-value parameter cache is capped: random ids cannot grow it without bound"""
+    from src.core.event_hub import MAX_CACHED_PARAMETERS
+
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        params = {f"ParamFlood{i}": 1.0 for i in range(MAX_CACHED_PARAMETERS + 100)}
+        await ws.send(json.dumps({"type": "parameter_batch", "data": {"params": params}}))
+        await request(ws, "parameter", {"id": "ParamAngleX", "value": -7.0})
+        stats = (await request(ws, "get_status", {}))["data"]["outbound"]
+    check(stats["cached_parameters"] == MAX_CACHED_PARAMETERS and stats["parameters_dropped"] > 0
+          and server.hub.get_parameter("ParamAngleX") == -7.0, f"参数缓存有上限，已知 id 照常更新 {stats['parameters_dropped']}")
+
+    async with websockets.connect(f"ws://127.0.0.1:{server.port}/sprite") as ws:
+        await request(ws, "unsubscribe", {"topics": ["*"]})
+        await ws.send(json.dumps({"type": "parameter_batch", "data": {"params": {"ParamAngleX": "0.25"}}}))
+        await request(ws, "get_status", {})
+    cached = server.hub.get_parameter("ParamAngleX")
+    check(type(cached) is float and cached == 0.25, "状态缓存存的是写入暂存表的 float 值")
+
+
+def run_parameter_table():
+    """stage_many applies a batch entirely or not at all"""
+    from src.core.parameter_table import ParameterTable
+
+    table = ParameterTable()
+    try:
+        table.stage_many({"ParamAngleX": 1.0, "ParamAngleY": "bad"})
+    except ValueError:
+        pass
+    check(table.pending_count() == 0 and table.writes == 0, "批量暂存含非法值时整批不生效")
+
+
+async def run_local_backpressure():
+    """A local sender waits on a full inbox and the reader's loop wakes it (no polling)"""
+    import threading
+    from websockets.exceptions import ConnectionClosedOK
+    from src.core.local_transport import LocalConnection
+
+    reader_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=reader_loop.run_forever, daemon=True)
+    thread.start()
+    connection = LocalConnection(reader_loop, asyncio.get_running_loop(), maxsize=8)
+    inbox = connection._server_inbox
+    received = []
+
+    async def read(count):
+        for _ in range(count):
+            received.append(await connection.peer.__anext__())
+            await asyncio.sleep(0.001)
+
+    try:
+        reading = asyncio.run_coroutine_threadsafe(read(200), reader_loop)
+        deepest = 0
+        for i in range(200):
+            await connection.send({"seq": i})
+            deepest = max(deepest, inbox.pending())
+        await asyncio.wrap_future(reading)
+        check([m["seq"] for m in received] == list(range(200)) and deepest <= 8 and inbox.handoff.dropped == 0,
+              f"本地连接背压：按序送达、不丢失，积压上限 {deepest}")
+
+        for i in range(8):
+            await connection.send({"seq": i})
+        blocked = asyncio.create_task(connection.send({"seq": 8}))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        reader_loop.call_soon_threadsafe(connection.close)
+        try:
+            await asyncio.wait_for(blocked, 1.0)
+            closed = False
+        except ConnectionClosedOK:
+            closed = True
+        check(closed and time.monotonic() - started < 0.5, "连接关闭时唤醒被背压阻塞的发送方")
+    finally:
+        reader_loop.call_soon_threadsafe(reader_loop.stop)
+        thread.join(1.0)
+        reader_loop.close()
+
+
+def run_headless_import():
+    """The headless server must import without Qt (PyQt6 blocked in a child interpreter)"""
+    import subprocess
+
+    root = os.path.join(os.path.dirname(__file__), "..", "..")
+    code = "import sys; sys.modules['PyQt6'] = None; import src.core.websocket_server"
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, timeout=60)
+    check(result.returncode == 0, "无 Qt 环境可导入 websocket_server" + (f": {result.stderr.strip().splitlines()[-1]}"
+                                                                   if result.returncode else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless control-plane regression test")
+    parser.add_argument("--port", type=int, default=18766)
+    parser.add_argument("--udp-port", type=int, default=18767)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    cache_dir = tempfile.TemporaryDirectory()
+    os.environ["SHERRY_TTS_CACHE_DIR"] = cache_dir.name
+
+    backend = NullSpriteBackend(expressions=["happy", "sad", "angry", "blush"],
+                                parameters={"ParamAngleX": (-30.0, 30.0, 0.0), "ParamMouthForm": (-1.0, 1.0, 0.0)})
+    server = WebSocketServer(backend=backend, port=args.port, udp_port=args.udp_port)
+    kuro = NullSpriteBackend()
+    server.add_sprite("kuro", backend=kuro)
+    server.start()
+    if not server.wait_ready(5):
+        print("❌ server did not start")
+        sys.exit(1)
+    try:
+        run_headless_import()
+        run_parameter_table()
+        asyncio.run(run_local_backpressure())
+        asyncio.run(run(server, backend))
+        asyncio.run(run_sequences(server, backend))
+        asyncio.run(run_multi_sprite(server, backend, kuro))
+        asyncio.run(run_stream(server, backend, kuro))
+        asyncio.run(run_udp(server, backend, kuro))
+        asyncio.run(run_vts(server, backend))
+        asyncio.run(run_session_replay(server))
+        asyncio.run(run_tts_cache(server))
+        asyncio.run(run_tts_warmup(server))
+        asyncio.run(run_tts_stream(server))
+        asyncio.run(run_sentence_pipeline(server))
+        asyncio.run(run_audio_sink(server))
+        asyncio.run(run_device_sink())
+        asyncio.run(run_parameter_cache(server))
+    finally:
+        server.stop()
+        cache_dir.cleanup()
+
+    print(f"\n{'✅ All checks passed' if not failures else f'❌ {failures} check(s) failed'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()